@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_delete_userprofile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('ADMIN', 'Admin'), ('RESTAURANT', 'Restaurant'), ('NGO', 'Ngo'), ('EVENTPLANNER', 'Event Planner')], db_index=True, default='RESTAURANT', max_length=50),
+        ),
+    ]
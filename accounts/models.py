@@ -8,7 +8,7 @@ class User(AbstractUser):
         NGO = "NGO", "Ngo"
         EVENTPLANNER = "EVENTPLANNER", "Event Planner"
 
-    role = models.CharField(max_length=50, choices=Role.choices, default=Role.RESTAURANT)
+    role = models.CharField(max_length=50, choices=Role.choices, default=Role.RESTAURANT, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -78,44 +78,39 @@ def delete_account(request):
             return render(request, 'accounts/delete_account_confirm.html')
         
         user = request.user
-        
+
         # Use transaction to ensure all deletions happen or none
         with transaction.atomic():
             # Delete all food donations by this user
             FoodDonation.objects.filter(donor=user).delete()
-            
+
             # Delete all food requests by this user
             FoodRequest.objects.filter(requester=user).delete()
-            
+
             # Delete all collaborations involving this user
             Collaboration.objects.filter(donor=user).delete()
             Collaboration.objects.filter(ngo=user).delete()
-            
+
             # Delete analysis data
             Analysis.objects.filter(user=user).delete()
-            
+
             # Delete profile data
-            try:
-                if user.role == User.Role.RESTAURANT:
-                    RestaurantProfile.objects.filter(user=user).delete()
-                elif user.role == User.Role.NGO:
-                    NGOProfile.objects.filter(user=user).delete()
-                elif user.role == User.Role.EVENTPLANNER:
-                    EventPlannerProfile.objects.filter(user=user).delete()
-            except:
-                pass
-            
-            # Try to delete old UserProfile if it exists
-            try:
-                UserProfile.objects.filter(user=user).delete()
-            except:
-                pass
-            
+            if user.role == User.Role.RESTAURANT:
+                RestaurantProfile.objects.filter(user=user).delete()
+            elif user.role == User.Role.NGO:
+                NGOProfile.objects.filter(user=user).delete()
+            elif user.role == User.Role.EVENTPLANNER:
+                EventPlannerProfile.objects.filter(user=user).delete()
+
+            # Delete old UserProfile if it exists
+            UserProfile.objects.filter(user=user).delete()
+
             # Finally delete the user
             user.delete()
-            
-            messages.success(request, 'Your account and all data have been permanently deleted.')
-            return redirect('home')
+        logout(request)
+
+        messages.success(request, 'Your account and all data have been permanently deleted.')
+        return redirect('home')
     
     return render(request, 'accounts/delete_account_confirm.html')
 
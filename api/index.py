@@ -1,12 +1,20 @@
 """
 Vercel serverless function wrapper for Django application.
 This file allows Django to run on Vercel's serverless infrastructure.
+
+handler() turns the request dict of the Python runtime into a WSGI call
+of the Django application, and the response into the dict it expects
+back. Bodies stay bytes throughout: base64 encoded request bodies are
+decoded, and responses that are not UTF-8 text (images, gzip...) are
+returned base64 encoded instead of being mangled into text.
 """
+import base64
 import os
 import sys
 import traceback
-from pathlib import Path
 from io import BytesIO
+from pathlib import Path
+from urllib.parse import unquote_to_bytes, urlencode
 
 # Add the project root to Python path
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -14,13 +22,16 @@ sys.path.insert(0, str(BASE_DIR))
 
 # Set Django settings module BEFORE any Django imports
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grace_bites_project.settings')
+# Import the admin.py modules on the first admin request, not on cold start
+os.environ.setdefault('DEFER_ADMIN', 'True')
+# No worker process runs on Vercel, so tasks run in the function, after the
+# response is built but before it is returned (see TASKS_RUN_INLINE)
+os.environ.setdefault('TASKS_RUN_INLINE', 'True')
 
 # Import Django components
 from django.core.wsgi import get_wsgi_application
-from django.core.handlers.wsgi import WSGIRequest
-from django.http import HttpResponse
 
-# Initialize Django application (lazy initialization)
+# Django application, created by warm_up() when this module is imported
 _django_app = None
 
 def get_django_app():
@@ -46,132 +57,158 @@ def get_django_app():
             raise
     return _django_app
 
+def warm_up():
+    """
+    Initialize Django, and load what its first request would (URLs,
+    templates, database driver), while the instance starts.
+    """
+    try:
+        get_django_app()
+    except Exception:
+        # Already logged; the first request retries and reports it
+        return
+    try:
+        from grace_bites_project.warmup import warm_up as warm_up_django
+        warm_up_django()
+    except Exception:
+        # Requests needing whatever failed will report it
+        traceback.print_exc()
+
+# Response types returned as text when their body is valid UTF-8; any
+# other body is returned base64 encoded
+TEXT_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml',
+)
+
+# WSGI environ entries that are the same for every request
+BASE_ENVIRON = {
+    'SCRIPT_NAME': '',
+    'SERVER_PROTOCOL': 'HTTP/1.1',
+    'wsgi.version': (1, 0),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': False,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+
+def _get(request, name, default):
+    # Vercel passes a dict; keep accepting objects with the same attributes
+    if isinstance(request, dict):
+        return request.get(name, default)
+    return getattr(request, name, default)
+
+def build_environ(request):
+    """
+    WSGI environ of a request dict:
+    - request['method']: HTTP method string
+    - request['path']: URL path, possibly with the query string
+    - request['headers']: dict of headers (lowercase names)
+    - request['body']: request body, as str, bytes or None
+    - request['encoding'] == 'base64' or request['isBase64Encoded']: body is base64
+    - request['query']: dict of query parameters, when not in the path
+    """
+    path, _, query_string = (_get(request, 'path', '/') or '/').partition('?')
+    if not query_string:
+        query = _get(request, 'query', None)
+        if query:
+            query_string = urlencode(query, doseq=True)
+    headers = _get(request, 'headers', None) or {}
+
+    body = _get(request, 'body', None) or b''
+    if isinstance(body, str):
+        if _get(request, 'isBase64Encoded', False) or _get(request, 'encoding', None) == 'base64':
+            body = base64.b64decode(body)
+        else:
+            body = body.encode('utf-8')
+
+    environ = BASE_ENVIRON.copy()
+    environ['REQUEST_METHOD'] = _get(request, 'method', 'GET') or 'GET'
+    # WSGI servers pass the path percent-decoded, as latin-1 characters
+    environ['PATH_INFO'] = unquote_to_bytes(path).decode('latin-1') if '%' in path else path
+    environ['QUERY_STRING'] = query_string
+    environ['CONTENT_LENGTH'] = str(len(body))
+    # BytesIO shares the bytes object until written to, so this is no copy
+    environ['wsgi.input'] = BytesIO(body)
+    for name, value in headers.items():
+        if not isinstance(value, str):
+            value = ', '.join(value)
+        key = name.upper().replace('-', '_')
+        if key == 'CONTENT_TYPE':
+            environ[key] = value
+        elif key != 'CONTENT_LENGTH':
+            environ['HTTP_' + key] = value
+    host = environ.get('HTTP_HOST', 'localhost')
+    environ['SERVER_NAME'] = host.partition(':')[0]
+    environ['SERVER_PORT'] = environ.get('HTTP_X_FORWARDED_PORT', '443')
+    environ['wsgi.url_scheme'] = environ.get('HTTP_X_FORWARDED_PROTO', 'https')
+    return environ
+
+def encode_body(body, headers):
+    """(body, is_base64) for a response body of bytes"""
+    content_type = headers.get('Content-Type', '')
+    if 'Content-Encoding' not in headers and content_type.startswith(TEXT_TYPES):
+        try:
+            return body.decode('utf-8'), False
+        except UnicodeDecodeError:
+            pass
+    return base64.b64encode(body).decode('ascii'), True
+
 def handler(request):
     """
     Handle incoming HTTP requests for Vercel serverless functions.
-    
-    Vercel's Python runtime (@vercel/python) passes request as a dict with:
-    - request['method']: HTTP method string
-    - request['path']: URL path string
-    - request['headers']: dict of headers
-    - request['body']: request body (string)
-    - request['query']: dict of query parameters (optional)
-    
-    Returns a dict with:
+
+    Takes a request dict as described in build_environ(), and returns a
+    dict with:
     - statusCode: HTTP status code (int)
     - headers: dict of response headers
+    - multiValueHeaders: headers sent more than once (e.g. Set-Cookie), if any
     - body: response body as string
+    - isBase64Encoded: whether the body is base64 encoded bytes
     """
     try:
-        # Log request for debugging (remove in production)
-        print(f"Request received: {type(request)}", file=sys.stderr)
-        if isinstance(request, dict):
-            print(f"Request keys: {list(request.keys())}", file=sys.stderr)
-        
-        # Get Django app (with error handling)
         django_app = get_django_app()
-        
-        # Extract request data - Vercel Python runtime uses dict format
-        if isinstance(request, dict):
-            method = request.get('method', 'GET')
-            path = request.get('path', '/')
-            headers = request.get('headers', {})
-            body = request.get('body', '')
-            query = request.get('query', {})
-        elif hasattr(request, 'method'):
-            # Fallback for object format
-            method = request.method
-            path = getattr(request, 'path', '/')
-            headers = getattr(request, 'headers', {})
-            body = getattr(request, 'body', '')
-            query = getattr(request, 'query', {})
-        else:
-            # Last resort - try to access as dict
-            method = request.get('method', 'GET') if hasattr(request, 'get') else 'GET'
-            path = request.get('path', '/') if hasattr(request, 'get') else '/'
-            headers = request.get('headers', {}) if hasattr(request, 'get') else {}
-            body = request.get('body', '') if hasattr(request, 'get') else ''
-            query = request.get('query', {}) if hasattr(request, 'get') else {}
-        
-        # Convert headers to dict if needed
-        if not isinstance(headers, dict):
-            headers = dict(headers) if hasattr(headers, 'items') else {}
-        
-        # Build query string
-        query_string = ''
-        if query:
-            from urllib.parse import urlencode
-            query_string = urlencode(query)
-        
-        # Prepare request body
-        if isinstance(body, str):
-            body_bytes = body.encode('utf-8')
-        elif body is None:
-            body_bytes = b''
-        else:
-            body_bytes = body
-        
-        # Create WSGI environment dictionary
-        environ = {
-            'REQUEST_METHOD': method,
-            'PATH_INFO': path,
-            'QUERY_STRING': query_string,
-            'CONTENT_TYPE': headers.get('content-type', ''),
-            'CONTENT_LENGTH': str(len(body_bytes)),
-            'wsgi.version': (1, 0),
-            'wsgi.url_scheme': headers.get('x-forwarded-proto', 'https'),
-            'wsgi.errors': sys.stderr,
-            'wsgi.multithread': False,
-            'wsgi.multiprocess': True,
-            'wsgi.run_once': False,
-            'SERVER_NAME': headers.get('host', 'localhost'),
-            'SERVER_PORT': headers.get('x-forwarded-port', '443'),
-            'wsgi.input': BytesIO(body_bytes),
-        }
-        
-        # Add HTTP headers to environ (Django expects HTTP_ prefix)
-        for key, value in headers.items():
-            # Convert header name to HTTP_ format
-            header_key = f'HTTP_{key.upper().replace("-", "_")}'
-            environ[header_key] = str(value)
-        
-        # Add special headers
-        if 'host' in headers:
-            environ['HTTP_HOST'] = headers['host']
-        if 'x-forwarded-for' in headers:
-            environ['HTTP_X_FORWARDED_FOR'] = headers['x-forwarded-for']
-        if 'x-forwarded-proto' in headers:
-            environ['HTTP_X_FORWARDED_PROTO'] = headers['x-forwarded-proto']
-        
-        # Create Django WSGI request
-        django_request = WSGIRequest(environ)
-        
-        # Process request through Django
-        response = django_app(django_request)
-        
-        # Convert Django response to Vercel format
-        response_headers = {}
-        for key, value in response.headers.items():
-            response_headers[key] = str(value)
-        
-        # Handle response body
-        if isinstance(response.content, bytes):
-            response_body = response.content.decode('utf-8', errors='replace')
-        else:
-            response_body = str(response.content)
-        
-        return {
-            'statusCode': response.status_code,
-            'headers': response_headers,
-            'body': response_body
+        response_start = []
+
+        def start_response(status, headers, exc_info=None):
+            response_start[:] = [status, headers]
+            return chunks.append
+
+        chunks = []
+        result = django_app(build_environ(request), start_response)
+        try:
+            # Also drains streaming responses
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        # A single chunk (any non-streaming response) is used as it is
+        body = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+        status, header_list = response_start
+        headers, repeated = {}, {}
+        for name, value in header_list:
+            if name in headers:
+                repeated.setdefault(name, [headers[name]]).append(value)
+            headers[name] = value
+        body, is_base64 = encode_body(body, headers)
+
+        response = {
+            'statusCode': int(status[:3]),
+            'headers': headers,
+            'body': body,
+            'isBase64Encoded': is_base64,
         }
-        
+        if repeated:
+            response['multiValueHeaders'] = repeated
+        return response
+
     except Exception as e:
         # Return error response
         error_trace = traceback.format_exc()
         error_msg = f"Function invocation failed: {str(e)}\n{error_trace}"
         print(error_msg, file=sys.stderr)
-        
+
         # Return a proper error response
         return {
             'statusCode': 500,
@@ -197,3 +234,5 @@ def handler(request):
             """
         }
 
+# Eager initialization at import, see warm_up()
+warm_up()
@@ -0,0 +1,14 @@
+"""
+Benchmarks for the Grace Bites views.
+
+Run them from the project root; results are printed and saved as JSON so
+that runs before and after a change can be compared:
+
+    python -m benchmarks views --sizes 1000 10000 50000
+    python -m benchmarks templates --sizes 1000 10000
+    python -m benchmarks coldstart --profile 20
+    python -m benchmarks compare benchmarks/results/before.json benchmarks/results/after.json
+
+Every run works on a fresh test database filled by the seed_scale
+management command, the real database is never touched.
+"""
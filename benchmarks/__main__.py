@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grace_bites_project.settings')
+    import django
+    django.setup()
+
+
+def run_views(args):
+    setup_django()
+    import django
+    from django.db import connection
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment, teardown_databases,
+        teardown_test_environment,
+    )
+
+    from .views import run
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        # Measure the views, not the sampling middleware
+        with override_settings(REQUEST_TIMING_SAMPLE_RATE=0):
+            runs = run(args.sizes, args.iterations, args.warmup, args.seed, args.only)
+        vendor = connection.vendor
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    results = {
+        'benchmark': 'views',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': vendor,
+        'iterations': args.iterations,
+        'runs': runs,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"views-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output}")
+
+
+def run_templates(args):
+    setup_django()
+    import django
+    from django.template import engines
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment, teardown_databases,
+        teardown_test_environment,
+    )
+
+    from .templates import run
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with override_settings(REQUEST_TIMING_SAMPLE_RATE=0):
+            runs = run(args.sizes, args.iterations, args.warmup, args.seed, args.only)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    loaders = engines.all()[0].engine.loaders
+    results = {
+        'benchmark': 'templates',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        # Only the cached loader keeps templates compiled between renders
+        'loaders': [loader if isinstance(loader, str) else loader[0] for loader in loaders],
+        'iterations': args.iterations,
+        'runs': runs,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"templates-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output}")
+
+
+def run_adapter(args):
+    setup_django()
+    import django
+
+    from .adapter import DEFAULT_ADAPTER, run
+
+    adapter = Path(args.adapter) if args.adapter else DEFAULT_ADAPTER
+    print(f"Measuring {adapter}...")
+    results = {
+        'benchmark': 'adapter',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'adapter': str(adapter),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'iterations': args.iterations,
+        'runs': run(adapter, args.iterations, args.warmup, args.only),
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"adapter-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output}")
+
+
+def run_coldstart(args):
+    setup_django()
+    import django
+
+    from .coldstart import DEFAULT_ADAPTER, run
+
+    adapter = Path(args.adapter) if args.adapter else DEFAULT_ADAPTER
+    print(f"Starting {adapter} {args.runs} times...")
+    runs, slowest = run(adapter, args.runs, args.path, args.profile)
+    results = {
+        'benchmark': 'coldstart',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'adapter': str(adapter),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'path': args.path,
+        'runs': runs,
+        'slowest_imports': slowest,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"coldstart-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output}")
+
+
+def compare(args):
+    """Print the change of every metric between two result files"""
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    metrics = ('first_render_ms', 'p50_ms', 'p90_ms', 'cached_p50_ms', 'queries', 'peak_memory_kb')
+    # Adapter results have a single run, without a dataset size
+    previous_runs = {run.get('size'): run for run in before['runs']}
+    for run in after['runs']:
+        previous = previous_runs.get(run.get('size'))
+        if previous is None:
+            continue
+        size = f"Size {run['size']}: " if 'size' in run else ''
+        print(f"{size}{before.get('revision')} -> {after.get('revision')}")
+        for name, result in run['views'].items():
+            old = previous['views'].get(name)
+            if old is None:
+                continue
+            changes = []
+            for metric in metrics:
+                if old.get(metric) is None or result.get(metric) is None:
+                    continue
+                delta = (result[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+                changes.append(f"{metric} {old[metric]:g} -> {result[metric]:g} ({delta:+.0f}%)")
+            print(f"  {name:<30} " + ', '.join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    views = commands.add_parser('views', help="Benchmark the dashboards, feeds and collaboration actions")
+    views.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                       help="Numbers of seeded donations, one run each (default: 1000 10000)")
+    views.add_argument('--iterations', type=int, default=20, help="Timed requests per view (default: 20)")
+    views.add_argument('--warmup', type=int, default=2, help="Untimed requests per view first (default: 2)")
+    views.add_argument('--seed', type=int, default=0, help="seed_scale random seed (default: 0)")
+    views.add_argument('--only', nargs='+', help="Only benchmark these views")
+    views.add_argument('--output', help="Result file (default: benchmarks/results/views-<timestamp>.json)")
+    views.set_defaults(handler=run_views)
+
+    templates = commands.add_parser('templates', help="Benchmark the rendering of the dashboard templates")
+    templates.add_argument('--sizes', type=int, nargs='+', default=[1000],
+                           help="Numbers of seeded donations, one run each (default: 1000)")
+    templates.add_argument('--iterations', type=int, default=50, help="Timed renders per template (default: 50)")
+    templates.add_argument('--warmup', type=int, default=5, help="Untimed renders per template first (default: 5)")
+    templates.add_argument('--seed', type=int, default=0, help="seed_scale random seed (default: 0)")
+    templates.add_argument('--only', nargs='+', help="Only benchmark these dashboards")
+    templates.add_argument('--output', help="Result file (default: benchmarks/results/templates-<timestamp>.json)")
+    templates.set_defaults(handler=run_templates)
+
+    adapter = commands.add_parser('adapter', help="Benchmark the per-request overhead of the Vercel handler")
+    adapter.add_argument('--adapter', help="Adapter module to measure (default: api/index.py)")
+    adapter.add_argument('--iterations', type=int, default=2000, help="Timed calls per case (default: 2000)")
+    adapter.add_argument('--warmup', type=int, default=50, help="Untimed calls per case first (default: 50)")
+    adapter.add_argument('--only', nargs='+', help="Only benchmark these cases")
+    adapter.add_argument('--output', help="Result file (default: benchmarks/results/adapter-<timestamp>.json)")
+    adapter.set_defaults(handler=run_adapter)
+
+    coldstart = commands.add_parser('coldstart', help="Benchmark the startup of a new Vercel instance")
+    coldstart.add_argument('--adapter', help="Adapter module to start (default: api/index.py)")
+    coldstart.add_argument('--runs', type=int, default=10, help="Processes started (default: 10)")
+    coldstart.add_argument('--path', default='/accounts/login/',
+                           help="Path of the first request, which may not need tables (default: /accounts/login/)")
+    coldstart.add_argument('--profile', type=int, default=0, metavar='N', help="List the N slowest imports")
+    coldstart.add_argument('--output', help="Result file (default: benchmarks/results/coldstart-<timestamp>.json)")
+    coldstart.set_defaults(handler=run_coldstart)
+
+    diff = commands.add_parser('compare', help="Compare two result files")
+    diff.add_argument('before')
+    diff.add_argument('after')
+    diff.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'iterations', 2) < 2 or getattr(args, 'runs', 2) < 2:
+        parser.error("--iterations and --runs must be at least 2")
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    main()
@@ -0,0 +1,167 @@
+"""
+Adapter benchmark: the per-invocation overhead of the Vercel handler in
+api/index.py, i.e. everything but Django itself. The handler is given a
+stub application that answers at once with a canned response, and every
+request is timed from the request dict to the returned response dict.
+
+Adapters of earlier revisions can be measured too:
+
+    git show <revision>:api/index.py > /tmp/index_before.py
+    python -m benchmarks adapter --adapter /tmp/index_before.py
+"""
+import base64
+import importlib.util
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import redirect_stderr
+from pathlib import Path
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .views import percentile
+
+DEFAULT_ADAPTER = Path(__file__).resolve().parent.parent / 'api' / 'index.py'
+
+HEADERS = {
+    'host': 'gracebites.vercel.app',
+    'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'accept-encoding': 'gzip, deflate, br',
+    'accept-language': 'en-GB,en;q=0.9',
+    'cookie': 'sessionid=0123456789abcdefghijklmnopqrstuv; theme=dark',
+    'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)',
+    'x-forwarded-for': '203.0.113.7',
+    'x-forwarded-proto': 'https',
+    'x-vercel-id': 'bom1::iad1::abcde-1700000000000-0123456789ab',
+}
+
+
+class Case:
+    """A request dict, and the response the stub application returns for it"""
+
+    def __init__(self, name, request, content=b'', content_type='text/html; charset=utf-8', chunks=None):
+        self.name = name
+        self.request = request
+        self.content = content
+        self.content_type = content_type
+        self.chunks = chunks
+
+    def response(self):
+        if self.chunks:
+            size = len(self.content) // self.chunks
+            parts = (self.content[i:i + size] for i in range(0, len(self.content), size))
+            return StreamingHttpResponse(parts, content_type=self.content_type)
+        return HttpResponse(self.content, content_type=self.content_type)
+
+
+def request(path, method='GET', body=None, **extra):
+    return {'method': method, 'path': path, 'headers': dict(HEADERS), 'body': body, **extra}
+
+
+CASES = [
+    Case('html_page', request('/ngo/dashboard/'), b'<p>Grace Bites</p>' * 2000),
+    Case(
+        'query_string',
+        request('/ngo/donations/', query={'sort': 'distance', 'radius': '10', 'page_size': '50'}),
+        b'<p>Grace Bites</p>' * 2000,
+    ),
+    Case(
+        'form_post_base64',
+        request(
+            '/accounts/login/', method='POST', encoding='base64',
+            body=base64.b64encode(b'username=ngo_0&password=secret&next=%2F' * 10).decode(),
+        ),
+        b'',
+    ),
+    # Random bytes are not valid UTF-8, like images and gzip bodies
+    Case('image_200kb', request('/media/donation_images/rice.480w.webp'), bytes(range(256)) * 800, 'image/webp'),
+    Case(
+        'streamed_export_1mb', request('/export/donations/'),
+        b'1,2024-01-01,rice,5 kg,Mumbai\n' * 34000, 'text/csv', chunks=16,
+    ),
+]
+
+
+class StubApplication:
+    """
+    Answers every call with the response of the current case, under both
+    the WSGI convention and the request -> response one used by the
+    adapter before it was rewritten.
+    """
+
+    def __init__(self):
+        self.case = None
+
+    def __call__(self, environ, start_response=None):
+        response = self.case.response()
+        if start_response is None:
+            return response
+        headers = [*response.items(), *(('Set-Cookie', c.output(header='')) for c in response.cookies.values())]
+        start_response(f'{response.status_code} {response.reason_phrase}', headers)
+        # Not the response itself, whose close() would fire request_finished
+        return iter(response)
+
+
+def load_adapter(path):
+    spec = importlib.util.spec_from_file_location(f'vercel_adapter_{abs(hash(str(path)))}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(adapter, app, case, iterations, warmup):
+    app.case = case
+    for _ in range(warmup):
+        adapter.handler(case.request)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = adapter.handler(case.request)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        adapter.handler(case.request)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    body = response['body']
+    if response.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'status': [response['statusCode']],
+        # Whether the body made it through unchanged
+        'intact': response['statusCode'] == 200 and body == case.content,
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'p50_ms': round(percentile(timings, 0.5), 4),
+        'p90_ms': round(percentile(timings, 0.9), 4),
+        'p99_ms': round(percentile(timings, 0.99), 4),
+        'max_ms': round(timings[-1], 4),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(adapter_path=None, iterations=2000, warmup=50, only=None, out=print):
+    """Benchmark the handler of `adapter_path` on every case, returns the results"""
+    adapter = load_adapter(adapter_path or DEFAULT_ADAPTER)
+    app = StubApplication()
+    adapter._django_app = app
+    views = {}
+    for case in CASES:
+        if only and case.name not in only:
+            continue
+        # Whatever the adapter logs is part of its cost, but not worth reading
+        with open(os.devnull, 'w') as devnull, redirect_stderr(devnull):
+            views[case.name] = result = measure(adapter, app, case, iterations, warmup)
+        out(
+            f"  {case.name:<22} p50 {result['p50_ms'] * 1000:>8.1f} us  p90 {result['p90_ms'] * 1000:>8.1f} us  "
+            f"{result['peak_memory_kb']:>9.1f} KB  {'intact' if result['intact'] else 'CHANGED'}"
+        )
+    return [{'views': views}]
@@ -0,0 +1,127 @@
+"""
+Cold start benchmark: how long a new serverless instance takes to answer
+its first request. Every sample is a fresh Python process that imports
+the Vercel handler (api/index.py) and sends it one request, timing
+
+- import: loading the module, including any initialization it does
+- first_request: the first call of the handler
+- total: both, i.e. the time to first byte once the interpreter is up
+
+The processes use an in-memory SQLite database, so the page requested
+must not need any table (the login page doesn't). With --profile, the
+modules that took longest to import (python -X importtime) are listed.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from .views import percentile
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_ADAPTER = BASE_DIR / 'api' / 'index.py'
+
+CHILD = '''
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('index', {adapter!r})
+index = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(index)
+imported = time.perf_counter()
+response = index.handler({{'method': 'GET', 'path': {path!r}, 'headers': {{'host': 'localhost'}}}})
+done = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - imported) * 1000,
+    'total_ms': (done - start) * 1000,
+    'status': response['statusCode'],
+}}))
+'''
+
+PHASES = ('import_ms', 'first_request_ms', 'total_ms')
+
+# "import time: self [us] | cumulative | name", nested imports indented
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def child_env():
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': 'sqlite://:memory:',
+        'PYTHONPATH': str(BASE_DIR),
+    })
+    return env
+
+
+def sample(adapter, path, importtime=False):
+    """One cold start in a new process: its timings, and the -X importtime report if asked"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD.format(adapter=str(adapter), path=path)]
+    result = subprocess.run(command, capture_output=True, text=True, env=child_env(), cwd=BASE_DIR)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode or not lines:
+        raise RuntimeError(f"Cold start failed:\n{result.stderr[-2000:]}")
+    # The handler may print before the timings line
+    return json.loads(lines[-1]), result.stderr
+
+
+def import_profile(report, top):
+    """The `top` slowest imports of a -X importtime report, by cumulative time"""
+    imports = []
+    for line in report.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            imports.append({
+                'module': match.group(4),
+                'depth': len(match.group(3)) // 2,
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+            })
+    imports.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return imports[:top]
+
+
+def run(adapter_path=None, samples=10, path='/accounts/login/', profile=0, out=print):
+    """Time `samples` cold starts, returns the results (and the import profile)"""
+    adapter = adapter_path or DEFAULT_ADAPTER
+    # Untimed, so that every sample finds compiled bytecode like a deployment does
+    sample(adapter, path)
+
+    timings = {phase: [] for phase in PHASES}
+    statuses = set()
+    for _ in range(samples):
+        result, _ = sample(adapter, path)
+        statuses.add(result['status'])
+        for phase in PHASES:
+            timings[phase].append(result[phase])
+
+    views = {}
+    for phase in PHASES:
+        values = sorted(timings[phase])
+        name = phase[:-3]
+        views[name] = {
+            'iterations': samples,
+            'status': sorted(statuses),
+            'mean_ms': round(statistics.fmean(values), 2),
+            'p50_ms': round(percentile(values, 0.5), 2),
+            'p90_ms': round(percentile(values, 0.9), 2),
+            'max_ms': round(values[-1], 2),
+        }
+        out(f"  {name:<15} p50 {views[name]['p50_ms']:>8.1f} ms  p90 {views[name]['p90_ms']:>8.1f} ms")
+
+    slowest = []
+    if profile:
+        _, report = sample(adapter, path, importtime=True)
+        slowest = import_profile(report, profile)
+        out(f"  Slowest imports (cumulative, self):")
+        for entry in slowest:
+            out(
+                f"    {entry['cumulative_ms']:>8.1f} ms {entry['self_ms']:>7.1f} ms  "
+                f"{'  ' * entry['depth']}{entry['module']}"
+            )
+    return [{'views': views}], slowest
@@ -0,0 +1,76 @@
+"""
+The views exercised by the view benchmark. Each scenario names the seeded
+user it runs as and returns the request to make, creating whatever rows a
+state-changing view consumes before timing starts.
+"""
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Collaboration, FoodDonation
+
+# The busiest seeded user of each role (seed_scale draws activity from a
+# Zipf distribution, so index 0 has the most donations and requests)
+RESTAURANT = 'restaurant_0'
+NGO = 'ngo_0'
+EVENTPLANNER = 'eventplanner_0'
+
+
+class Scenario:
+    method = 'get'
+
+    def __init__(self, name, user, url_name, data=None):
+        self.name = name
+        self.user = user
+        self.url_name = url_name
+        self.data = data
+
+    def prepare(self, user, count):
+        """Return `count` (url, data) pairs, one per timed request"""
+        return [(reverse(self.url_name), self.data)] * count
+
+
+class AcceptDonationRequest(Scenario):
+    method = 'post'
+
+    def prepare(self, user, count):
+        ngo = User.objects.filter(role=User.Role.NGO).first()
+        donations = list(FoodDonation.objects.open().filter(donor=user)[:count])
+        targets = [
+            Collaboration.objects.create(
+                donor=user, ngo=ngo, food_donation=donations[i % len(donations)], status='PENDING',
+            )
+            for i in range(count)
+        ]
+        return [(reverse(self.url_name, args=[c.id]), {}) for c in targets]
+
+
+class CompleteDonation(Scenario):
+    method = 'post'
+
+    def prepare(self, user, count):
+        donation = FoodDonation.objects.exclude(donor=user).order_by('-posted_at').first()
+        targets = [
+            Collaboration.objects.create(
+                donor=donation.donor, ngo=user, food_donation=donation, status='ACTIVE',
+                collaboration_date=timezone.now(),
+            )
+            for _ in range(count)
+        ]
+        return [(reverse(self.url_name, args=[c.id]), {'people_served': 40}) for c in targets]
+
+
+SCENARIOS = [
+    Scenario('restaurant_dashboard', RESTAURANT, 'restaurant_dashboard'),
+    Scenario('ngo_dashboard', NGO, 'ngo_dashboard'),
+    Scenario('eventplanner_dashboard', EVENTPLANNER, 'eventplanner_dashboard'),
+    Scenario('view_all_requests', RESTAURANT, 'view_all_requests'),
+    Scenario('view_all_ngos', RESTAURANT, 'view_all_ngos'),
+    Scenario('view_all_eventplanners', RESTAURANT, 'view_all_eventplanners'),
+    Scenario('view_all_donations', NGO, 'view_all_donations'),
+    Scenario('view_all_restaurants', NGO, 'view_all_restaurants'),
+    Scenario('view_all_requests_from_event', EVENTPLANNER, 'view_all_requests_from_event'),
+    Scenario('view_all_ngos_from_event', EVENTPLANNER, 'view_all_ngos_from_event'),
+    AcceptDonationRequest('accept_donation_request', RESTAURANT, 'accept_donation_request'),
+    CompleteDonation('complete_donation', NGO, 'complete_donation'),
+]
@@ -0,0 +1,116 @@
+"""
+Template benchmark: the render time of each dashboard template alone,
+apart from the queries of its view. The context of every dashboard is
+captured once from a real request against a seeded dataset, then the
+template is rendered with it over and over, recording
+
+- first_render_ms: the first render with an empty template cache, i.e.
+  including the parsing of the template, its parent and its includes
+- p50_ms, p90_ms...: later renders, every {% cached_fragment %} rendered
+- cached_p50_ms: later renders, the fragments read from the cache
+- queries: queries run by the render itself (lazy context values)
+"""
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.template import engines
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+
+from .scenarios import SCENARIOS
+from .views import PREFIX, percentile, seed
+
+DASHBOARDS = {
+    'restaurant_dashboard': 'dashboards/restaurant_dashboard.html',
+    'ngo_dashboard': 'dashboards/ngo_dashboard.html',
+    'eventplanner_dashboard': 'dashboards/eventplanner_dashboard.html',
+}
+
+
+def capture(scenario):
+    """The context and request the view of `scenario` renders its template with"""
+    user = User.objects.get(username=f'{PREFIX}_{scenario.user}')
+    client = Client()
+    client.force_login(user)
+    url, data = scenario.prepare(user, 1)[0]
+    # Rendering every fragment evaluates every lazy section of the context
+    with override_settings(FRAGMENT_CACHE_ENABLED=False):
+        response = client.get(url, data)
+    # The first context is that of the dashboard, the others its includes'
+    return response.context[0].flatten(), response.wsgi_request
+
+
+def reset_template_cache(engine):
+    for loader in engine.engine.template_loaders:
+        if hasattr(loader, 'reset'):
+            loader.reset()
+
+
+def timed_renders(template, context, request, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        template.render(context, request)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings
+
+
+def measure(engine, template_name, context, request, iterations, warmup):
+    # Every render renders all fragments
+    with override_settings(FRAGMENT_CACHE_ENABLED=False):
+        reset_template_cache(engine)
+        start = time.perf_counter()
+        template = engine.get_template(template_name)
+        content = template.render(context, request)
+        first_render = (time.perf_counter() - start) * 1000
+
+        timed_renders(template, context, request, warmup)
+        with CaptureQueriesContext(connection) as captured:
+            template.render(context, request)
+        timings = timed_renders(template, context, request, iterations)
+
+    with override_settings(FRAGMENT_CACHE_ENABLED=True):
+        cache.clear()
+        template.render(context, request)
+        cached = timed_renders(template, context, request, iterations)
+
+    return {
+        'iterations': iterations,
+        'first_render_ms': round(first_render, 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p90_ms': round(percentile(timings, 0.9), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(timings[-1], 2),
+        'cached_p50_ms': round(percentile(cached, 0.5), 2),
+        'queries': len(captured),
+        'size_kb': round(len(content.encode()) / 1024, 1),
+    }
+
+
+def run(sizes, iterations=50, warmup=5, seed_value=0, only=None, out=print):
+    """Benchmark every dashboard template at every dataset size, returns the results"""
+    engine = engines.all()[0]
+    scenarios = {scenario.name: scenario for scenario in SCENARIOS}
+    runs = []
+    for size in sizes:
+        out(f"Seeding {size} donations...")
+        counts = seed(size, seed_value)
+        views = {}
+        for name, template_name in DASHBOARDS.items():
+            if only and name not in only:
+                continue
+            context, request = capture(scenarios[name])
+            views[name] = result = measure(engine, template_name, context, request, iterations, warmup)
+            out(
+                f"  {name:<25} first {result['first_render_ms']:>7.1f} ms  p50 {result['p50_ms']:>7.1f} ms  "
+                f"p90 {result['p90_ms']:>7.1f} ms  cached p50 {result['cached_p50_ms']:>6.1f} ms  "
+                f"{result['queries']:>3} queries  {result['size_kb']:>7.1f} KB"
+            )
+        runs.append({'size': size, 'rows': counts, 'views': views})
+    return runs
@@ -0,0 +1,116 @@
+"""
+View benchmark: drive the dashboards, feeds and collaboration actions
+through the Django test client against seeded datasets of increasing size
+and record latency percentiles, query counts and peak memory per view.
+"""
+import io
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from core.models import Collaboration, FoodDonation, FoodRequest
+
+from .scenarios import SCENARIOS
+
+PREFIX = 'bench'
+
+
+def seed(size, seed=0):
+    """Fill the (test) database with a dataset of `size` donations"""
+    call_command('flush', interactive=False, verbosity=0)
+    call_command(
+        'seed_scale',
+        prefix=PREFIX,
+        seed=seed,
+        restaurants=max(size // 100, 5),
+        ngos=max(size // 250, 3),
+        eventplanners=max(size // 500, 2),
+        donations=size,
+        requests=size * 2 // 5,
+        collaborations=size * 3 // 10,
+        logins=size,
+        stdout=io.StringIO(),
+    )
+    return {
+        'users': User.objects.count(),
+        'donations': FoodDonation.objects.count(),
+        'requests': FoodRequest.objects.count(),
+        'collaborations': Collaboration.objects.count(),
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolated percentile of an ascending list"""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure(scenario, iterations, warmup):
+    """Time `iterations` requests of a scenario, plus one traced for memory"""
+    user = User.objects.get(username=f'{PREFIX}_{scenario.user}')
+    client = Client()
+    client.force_login(user)
+    requests = scenario.prepare(user, warmup + iterations + 1)
+    send = getattr(client, scenario.method)
+
+    for url, data in requests[:warmup]:
+        send(url, data)
+
+    timings, queries, statuses = [], [], set()
+    for url, data in requests[warmup:warmup + iterations]:
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send(url, data)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    # tracemalloc slows everything down, so memory is measured separately
+    url, data = requests[-1]
+    tracemalloc.start()
+    try:
+        send(url, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'status': sorted(statuses),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p90_ms': round(percentile(timings, 0.9), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(timings[-1], 2),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(sizes, iterations=20, warmup=2, seed_value=0, only=None, out=print):
+    """Benchmark every scenario at every dataset size, returns the results"""
+    runs = []
+    for size in sizes:
+        out(f"Seeding {size} donations...")
+        counts = seed(size, seed_value)
+        views = {}
+        for scenario in SCENARIOS:
+            if only and scenario.name not in only:
+                continue
+            views[scenario.name] = result = measure(scenario, iterations, warmup)
+            out(
+                f"  {scenario.name:<30} p50 {result['p50_ms']:>8.1f} ms  p90 {result['p90_ms']:>8.1f} ms  "
+                f"p99 {result['p99_ms']:>8.1f} ms  {result['queries']:>5} queries  "
+                f"{result['peak_memory_kb']:>9.1f} KB"
+            )
+        runs.append({'size': size, 'rows': counts, 'views': views})
+    return runs
@@ -0,0 +1,131 @@
+"""
+Conditional GET for the feeds and detail pages.
+
+Each page has a fingerprint: row counts and newest timestamps from one
+aggregate query, including the latest updated_at so that edits show, plus
+the fragment versions (core.fragments) of the scopes it shows, which catch
+changes outside those rows (profiles, collaborations). The ETag hashes the
+fingerprint with the user and the full path, so If-None-Match /
+If-Modified-Since are answered with a 304 before the view runs its
+queries or renders anything.
+
+The versions live in the cache and only reach every process when it is
+shared (FRAGMENT_CACHE_ENABLED). Without one, pages whose fingerprint needs
+them are always rendered in full.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import fragments
+from .fragments import user_scope
+from .models import FoodDonation, FoodRequest
+
+
+def _latest(*timestamps):
+    timestamps = [t for t in timestamps if t is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _fingerprint(scopes, aggregates):
+    """
+    (ETag parts, Last-Modified) from scope versions and an aggregate row,
+    or (None, None) when it needs versions that aren't shared
+    """
+    if scopes and not settings.FRAGMENT_CACHE_ENABLED:
+        return None, None
+    versions = fragments.get_versions(scopes)
+    parts = [f'{scope}={versions[scope]}' for scope in scopes]
+    parts += [f'{name}={value.isoformat() if hasattr(value, "isoformat") else value}'
+              for name, value in sorted(aggregates.items())]
+    last_modified = _latest(fragments.last_changed(scopes), *(
+        value for value in aggregates.values() if hasattr(value, 'isoformat')
+    ))
+    return parts, last_modified
+
+
+def _donation_aggregates(queryset):
+    now = timezone.now()
+    return queryset.aggregate(
+        open_count=Count('id', filter=Q(expiry_date__gt=now)),
+        newest=Max('posted_at', filter=Q(expiry_date__gt=now)),
+        updated=Max('updated_at', filter=Q(expiry_date__gt=now)),
+        # Expiry removes rows from the page without any write
+        last_expired=Max('expiry_date', filter=Q(expiry_date__lte=now)),
+    )
+
+
+def donation_feed_fingerprint(request):
+    # ?sort=distance depends on the viewer's profile, hence their scope
+    scopes = [user_scope(request.user.pk)] if request.GET.get('sort') == 'distance' else []
+    return _fingerprint(scopes, _donation_aggregates(FoodDonation.objects.filter(is_available=True)))
+
+
+def request_feed_fingerprint(request):
+    now = timezone.now()
+    return _fingerprint([], FoodRequest.objects.filter(status='PENDING').aggregate(
+        open_count=Count('id', filter=Q(required_timing__gt=now)),
+        newest=Max('requested_at', filter=Q(required_timing__gt=now)),
+        updated=Max('updated_at', filter=Q(required_timing__gt=now)),
+        last_expired=Max('required_timing', filter=Q(required_timing__lte=now)),
+    ))
+
+
+def restaurant_details_fingerprint(request, restaurant_id):
+    return _fingerprint(
+        [user_scope(restaurant_id), user_scope(request.user.pk)],
+        _donation_aggregates(FoodDonation.objects.filter(donor_id=restaurant_id, is_available=True)),
+    )
+
+
+def ngo_details_fingerprint(request, ngo_id):
+    return _fingerprint(
+        [user_scope(ngo_id), user_scope(request.user.pk)],
+        FoodRequest.objects.filter(requester_id=ngo_id).aggregate(
+            count=Count('id'), newest=Max('requested_at'), updated=Max('updated_at'),
+        ),
+    )
+
+
+def conditional_page(fingerprint):
+    """
+    Serve a view with an ETag and Last-Modified derived from
+    `fingerprint(request, *args, **kwargs)`, answering matching
+    conditional requests with 304 Not Modified.
+    """
+    def get(request, *args, **kwargs):
+        if not hasattr(request, '_page_fingerprint'):
+            # Queued messages are only shown by a full render
+            if len(messages.get_messages(request)):
+                request._page_fingerprint = None, None
+            else:
+                request._page_fingerprint = fingerprint(request, *args, **kwargs)
+        return request._page_fingerprint
+
+    def etag(request, *args, **kwargs):
+        parts, _ = get(request, *args, **kwargs)
+        if parts is None:
+            return None
+        raw = '|'.join([str(request.user.pk), request.get_full_path(), *parts])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return get(request, *args, **kwargs)[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Pages are per user and must be revalidated on every load
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+
+User = get_user_model()
+
+# Reverse one-to-one accessor of the role-specific profile for each role
+ROLE_PROFILE_FIELDS = {
+    User.Role.RESTAURANT: 'restaurant_profile',
+    User.Role.NGO: 'ngo_profile',
+    User.Role.EVENTPLANNER: 'eventplanner_profile',
+}
+
+# Legacy UserProfile accessor, used when no role profile exists
+LEGACY_PROFILE_FIELD = 'userprofile'
+
+
+def _resolve_profile(user, profile_field):
+    """Return the role profile of a user, falling back to the legacy UserProfile"""
+    for field in (profile_field, LEGACY_PROFILE_FIELD):
+        if field is None:
+            continue
+        try:
+            return getattr(user, field)
+        except ObjectDoesNotExist:
+            continue
+    return None
+
+
+def directory_queryset(role):
+    """Users of a role with their role profile and legacy profile joined in"""
+    related = [LEGACY_PROFILE_FIELD]
+    profile_field = ROLE_PROFILE_FIELDS.get(role)
+    if profile_field:
+        related.insert(0, profile_field)
+    return User.objects.filter(role=role).select_related(*related).order_by('id')
+
+
+def get_directory(role, users=None):
+    """
+    Build the directory listing for a role as a list of
+    {'user': ..., 'profile': ...} entries.
+
+    Profiles are resolved with a single joined query instead of one or two
+    lookups per user. `users` may be a pre-filtered or sliced
+    directory_queryset().
+    """
+    if users is None:
+        users = directory_queryset(role)
+    profile_field = ROLE_PROFILE_FIELDS.get(role)
+    return [
+        {'user': user, 'profile': _resolve_profile(user, profile_field)}
+        for user in users
+    ]
+
+
+def get_profile(user):
+    """Return the role profile of a single user, or the legacy UserProfile"""
+    return _resolve_profile(user, ROLE_PROFILE_FIELDS.get(user.role))
@@ -0,0 +1,204 @@
+"""
+Live updates for the dashboards over Server-Sent Events.
+
+Signals (and the expiry sweeper) append ChangeEvent rows for new and
+withdrawn donations and collaboration status changes. Each process runs a
+single Broadcaster that polls the table every EVENTS_POLL_INTERVAL while
+at least one stream is open, and hands new rows to the queue of every
+stream whose user may see them. The number of clients does not change the
+number of queries.
+
+Events carry their row id as the SSE id, so a reconnecting EventSource
+sends Last-Event-ID and is first replayed what it missed.
+
+Ids are allocated when a row is inserted, not when it commits, so on
+PostgreSQL an event can become visible after one with a higher id. Every
+id cursor (the broadcaster's, a stream's, a poll's) therefore stops
+before a gap in the ids until EVENTS_COMMIT_WINDOW_SECONDS have passed,
+after which the missing row is taken to have been rolled back or pruned.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeEvent
+
+# Most events sent to a reconnecting stream, and most rows read per poll
+REPLAY_LIMIT = 500
+POLL_BATCH = 500
+
+# Delay (ms) before browsers reconnect a stream closed by the server
+RECONNECT_MS = 3000
+
+
+def record(kind, data, role='', user_ids=()):
+    """
+    Append an event once the current transaction commits, so that rolled
+    back changes are never announced. Its id may still commit after a
+    higher one, see settled().
+    """
+    event = ChangeEvent(
+        kind=kind, data=data, audience_role=role or '', user_ids=[i for i in user_ids if i is not None],
+    )
+    transaction.on_commit(event.save)
+
+
+def donation_data(donation):
+    return {
+        'id': donation.id,
+        'food_type': donation.food_type,
+        'quantity': donation.quantity,
+        'location': donation.location,
+        'expiry_date': donation.expiry_date,
+        'donor_id': donation.donor_id,
+    }
+
+
+def is_visible(event, user):
+    return event.audience_role == user.role or user.id in event.user_ids
+
+
+def format_event(event):
+    data = json.dumps(event.data, cls=DjangoJSONEncoder)
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {data}\n\n'
+
+
+def settled(events, after_id):
+    """
+    The leading `events` (ascending ids, all above `after_id`) that no row
+    still to commit can precede: up to the first gap in the ids that is
+    younger than EVENTS_COMMIT_WINDOW_SECONDS.
+    """
+    window_start = timezone.now() - timedelta(seconds=settings.EVENTS_COMMIT_WINDOW_SECONDS)
+    ready, expected = [], after_id + 1
+    for event in events:
+        if event.id != expected and event.created_at > window_start:
+            break
+        ready.append(event)
+        expected = event.id + 1
+    return ready
+
+
+def latest_id():
+    return ChangeEvent.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def poll_once(user, last_id):
+    """
+    SSE body answering one poll without ASGI: the events since `last_id`,
+    or just the current position for a first request (sync ORM).
+    """
+    lines = [f'retry: {settings.EVENTS_WSGI_RETRY_MS}\n\n']
+    if last_id is None:
+        # An id-only event sets the cursor sent back as Last-Event-ID
+        lines.append(f'id: {latest_id()}\n\n')
+        return ''.join(lines)
+    events = settled(ChangeEvent.objects.filter(id__gt=last_id).order_by('id')[:REPLAY_LIMIT], last_id)
+    visible = [event for event in events if is_visible(event, user)]
+    lines.extend(format_event(event) for event in visible)
+    if events and events[-1] not in visible:
+        # Move the cursor past the trailing events this user may not see
+        lines.append(f'id: {events[-1].id}\n\n')
+    return ''.join(lines)
+
+
+class Broadcaster:
+    """One poll of the change log per process, fanned out to every open stream"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = None
+        self.poller = None
+
+    async def subscribe(self):
+        """
+        Queue receiving every event after the returned position, which is
+        that of the latest event when the stream subscribes.
+        """
+        loop = asyncio.get_running_loop()
+        if self.poller is not None and self.poller.get_loop() is not loop:
+            # Left over from a closed event loop (e.g. between tests)
+            self.__init__()
+        if self.last_id is None:
+            latest = await ChangeEvent.objects.aaggregate(latest=Max('id'))
+            self.last_id = latest['latest'] or 0
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self.poller is None or self.poller.done():
+            self.poller = loop.create_task(self.poll())
+        return queue, self.last_id
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def poll(self):
+        while self.subscribers:
+            events = settled([
+                event async for event in
+                ChangeEvent.objects.filter(id__gt=self.last_id).order_by('id')[:POLL_BATCH]
+            ], self.last_id)
+            for event in events:
+                for queue in list(self.subscribers):
+                    queue.put_nowait(event)
+            if events:
+                self.last_id = events[-1].id
+            if len(events) < POLL_BATCH:
+                await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+        # Picked up from the latest row again by the next subscriber
+        self.last_id = None
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(user, last_id=None):
+    """
+    SSE body for `user`: the events missed since `last_id`, then live ones,
+    with heartbeats while idle, until EVENTS_MAX_STREAM_SECONDS have passed.
+    """
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + settings.EVENTS_MAX_STREAM_SECONDS
+    # Subscribe before replaying so nothing recorded in between is lost
+    queue, position = await broadcaster.subscribe()
+    try:
+        yield f'retry: {RECONNECT_MS}\n\n'
+        if last_id is None:
+            # An id-only event sets the cursor sent back as Last-Event-ID
+            yield f'id: {position}\n\n'
+            sent_up_to = position
+        else:
+            # Up to where the broadcaster takes over, waiting for any row
+            # still committing before it
+            sent_up_to = last_id
+            while True:
+                fetched = [
+                    event async for event in
+                    ChangeEvent.objects.filter(id__gt=sent_up_to, id__lte=position).order_by('id')[:REPLAY_LIMIT]
+                ]
+                events = settled(fetched, sent_up_to)
+                for event in events:
+                    if is_visible(event, user):
+                        yield format_event(event)
+                if events:
+                    sent_up_to = events[-1].id
+                if len(events) == len(fetched):
+                    break
+                await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+        while (remaining := closes_at - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), min(settings.EVENTS_HEARTBEAT_SECONDS, remaining),
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event.id > sent_up_to and is_visible(event, user):
+                yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(queue)
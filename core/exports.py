@@ -0,0 +1,152 @@
+"""
+Streaming exports of donation, request and collaboration history.
+
+Rows are read as values_list() tuples with .iterator(chunk_size=...), and
+written out one chunk at a time as CSV or NDJSON. Memory stays constant
+whatever the size of the export, and the first bytes go out before the
+last rows are read, so long exports don't hit request timeouts. Used by
+the export_history view and management command.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Collaboration, FoodDonation, FoodRequest
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Dataset:
+    def __init__(self, model, date_field, columns, owner_filter):
+        self.model = model
+        self.date_field = date_field
+        # (header, lookup or expression) pairs
+        self.columns = columns
+        # Rows of a user, given the user
+        self.owner_filter = owner_filter
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def queryset(self, user=None, since=None, until=None):
+        """
+        Tuples of the export, oldest first. `since` and `until` are dates,
+        both inclusive.
+        """
+        queryset = self.model.objects.all()
+        if user is not None:
+            queryset = queryset.filter(self.owner_filter(user))
+        if since is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': start_of_day(since)})
+        if until is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': start_of_day(until + timedelta(days=1))})
+        expressions = {header: spec for header, spec in self.columns if not isinstance(spec, str)}
+        if expressions:
+            queryset = queryset.annotate(**expressions)
+        fields = [spec if isinstance(spec, str) else header for header, spec in self.columns]
+        return queryset.order_by(self.date_field, 'id').values_list(*fields)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _collaboration_owner(user):
+    # NGOs receive, everyone else donates; one indexed side per role
+    if user.role == 'NGO':
+        return Q(ngo=user)
+    return Q(donor=user)
+
+
+DATASETS = {
+    'collaborations': Dataset(Collaboration, 'collaboration_date', [
+        ('id', 'id'),
+        ('status', 'status'),
+        ('donor', 'donor__username'),
+        ('ngo', 'ngo__username'),
+        ('food_donation_id', 'food_donation_id'),
+        ('food_request_id', 'food_request_id'),
+        ('food_type', Coalesce('food_donation__food_type', 'food_request__food_type')),
+        ('people_served', 'people_served'),
+        ('notes', 'notes'),
+        ('collaboration_date', 'collaboration_date'),
+        ('completion_date', 'completion_date'),
+    ], _collaboration_owner),
+    'donations': Dataset(FoodDonation, 'posted_at', [
+        ('id', 'id'),
+        ('donor', 'donor__username'),
+        ('food_type', 'food_type'),
+        ('quantity', 'quantity'),
+        ('description', 'description'),
+        ('location', 'location'),
+        ('expiry_date', 'expiry_date'),
+        ('posted_at', 'posted_at'),
+        ('is_accepted', 'is_accepted'),
+        ('is_available', 'is_available'),
+    ], lambda user: Q(donor=user)),
+    'requests': Dataset(FoodRequest, 'requested_at', [
+        ('id', 'id'),
+        ('requester', 'requester__username'),
+        ('food_type', 'food_type'),
+        ('quantity_required', 'quantity_required'),
+        ('description', 'description'),
+        ('location', 'location'),
+        ('required_timing', 'required_timing'),
+        ('requested_at', 'requested_at'),
+        ('status', 'status'),
+        ('is_fulfilled', 'is_fulfilled'),
+    ], lambda user: Q(requester=user)),
+}
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_csv(dataset, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset.headers)
+    yield buffer.getvalue()
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_isoformat(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(dataset, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    headers = dataset.headers
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield ''.join(encoder.encode(dict(zip(headers, row))) + '\n' for row in chunk)
+
+
+def stream_export(name, fmt, user=None, since=None, until=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generator of the text of an export, `name` in DATASETS and `fmt` in FORMATS"""
+    dataset = DATASETS[name]
+    queryset = dataset.queryset(user=user, since=since, until=until)
+    stream = stream_csv if fmt == 'csv' else stream_ndjson
+    return stream(dataset, queryset, chunk_size)
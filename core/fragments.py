@@ -0,0 +1,130 @@
+"""
+Version counters for cached template fragments.
+
+Dashboard sections are cached with the {% cached_fragment %} tag under keys
+that embed the current version of every scope they depend on: the viewing
+user's own scope ("user:<id>") and global ones such as "directory". Signals
+in core.signals bump a scope whenever a row it covers changes, so stale
+fragments are never read again and simply expire.
+
+The same versions back the ETags of the feeds and detail pages, see
+core.conditional. Versions live in the default cache, which must be shared
+(e.g. Redis) for invalidation to reach every instance; without one
+(FRAGMENT_CACHE_ENABLED off) fragments are always rendered.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'fragment:version:{}'
+FRAGMENT_KEY = 'fragment:{}:{}'
+STALE_KEY = 'fragment:stale:{}'
+LOCK_KEY = 'fragment:lock:{}'
+CHANGED_KEY = 'fragment:changed:{}'
+
+# Scope of every user directory (profile cards) shown on the dashboards
+DIRECTORY = 'directory'
+# Scopes of the open donation and request feeds
+DONATIONS = 'donations'
+REQUESTS = 'requests'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def _initial_version():
+    # Not 1: after an eviction the counter must not restart at a version
+    # whose fragments may still be cached
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Map of scope to its current version"""
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in found}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+        found[key] = version
+    return {scope: found[key] for key, scope in keys.items()}
+
+
+def bump(*scopes):
+    """Invalidate every fragment depending on one of `scopes`"""
+    scopes = set(scopes)
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({CHANGED_KEY.format(scope): now for scope in scopes}, None)
+
+
+def last_changed(scopes):
+    """When any of `scopes` was last bumped, or None if not known"""
+    changed = cache.get_many([CHANGED_KEY.format(scope) for scope in scopes]).values()
+    if not changed:
+        return None
+    return datetime.fromtimestamp(max(changed), tz=timezone.utc)
+
+
+def bump_users(*user_ids):
+    bump(*(user_scope(user_id) for user_id in user_ids if user_id is not None))
+
+
+def for_user(name, scopes, user):
+    """Name and scopes of a fragment as cached for `user`, "user" standing for their scope"""
+    if 'user' not in scopes:
+        return name, list(scopes)
+    # Per-user fragments are keyed (and kept stale) per user
+    return f'{name}:{user.pk}', [user_scope(user.pk) if scope == 'user' else scope for scope in scopes]
+
+
+def fragment_key(name, scopes, versions):
+    return FRAGMENT_KEY.format(name, ':'.join(str(versions[scope]) for scope in scopes))
+
+
+def cached(fragments):
+    """Which of the (name, scopes) `fragments` are currently cached"""
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return set()
+    versions = get_versions({scope for _, scopes in fragments for scope in scopes})
+    keys = {fragment_key(name, scopes, versions): (name, tuple(scopes)) for name, scopes in fragments}
+    return {keys[key] for key in cache.get_many(keys)}
+
+
+def get_or_render(name, scopes, render):
+    """
+    Cached output of a fragment, calling `render()` on a miss.
+
+    Only one request re-renders a missed fragment at a time. The others
+    serve the last rendered copy if there is one, or render without
+    storing it, rather than all recomputing the same queries at once.
+    """
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return render()
+    key = fragment_key(name, scopes, get_versions(scopes))
+    content = cache.get(key)
+    if content is not None:
+        return content
+
+    lock_key = LOCK_KEY.format(name)
+    if not cache.add(lock_key, 1, settings.FRAGMENT_CACHE_LOCK_SECONDS):
+        stale = cache.get(STALE_KEY.format(name))
+        return stale if stale is not None else render()
+
+    try:
+        content = render()
+        cache.set_many({
+            key: content,
+            STALE_KEY.format(name): content,
+        }, settings.FRAGMENT_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return content
@@ -0,0 +1,172 @@
+"""
+Offline geocoding and a grid index for "nearby" lookups.
+
+Free-text locations and addresses are geocoded once at save time against
+the bundled gazetteer in core/data/gazetteer.csv. Geocoded rows also store
+the id of the grid cell they fall in, so a radius query only has to look at
+the rows in the handful of cells around the search point.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import Q
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+# Grid cells are CELL_SIZE degrees on each side (about 11 km of latitude)
+CELL_SIZE = 0.1
+GRID_COLUMNS = int(round(360 / CELL_SIZE))
+
+# Radius queries covering more cells than this use a bounding box instead
+MAX_QUERY_CELLS = 400
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Longest place name in the gazetteer, in words
+MAX_NAME_WORDS = 3
+
+COORDINATES_RE = re.compile(r'^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$')
+WORD_RE = re.compile(r'[a-z]+')
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """Map of normalized place name to (latitude, longitude)"""
+    places = {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+        rows = csv.DictReader(line for line in f if not line.startswith('#'))
+        for row in rows:
+            places[' '.join(WORD_RE.findall(row['name'].lower()))] = (
+                float(row['latitude']), float(row['longitude'])
+            )
+    return places
+
+
+def geocode(text):
+    """
+    Resolve a free-text location to (latitude, longitude), or None.
+
+    Explicit "lat, lon" pairs are used as-is. Otherwise the most specific
+    gazetteer name found in the text wins, scanning from the end, since
+    addresses usually end with the city.
+    """
+    if not text:
+        return None
+    match = COORDINATES_RE.match(text)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+        return None
+
+    places = load_gazetteer()
+    words = WORD_RE.findall(text.lower())
+    for end in range(len(words), 0, -1):
+        for size in range(min(MAX_NAME_WORDS, end), 0, -1):
+            point = places.get(' '.join(words[end - size:end]))
+            if point:
+                return point
+    return None
+
+
+def cell_for(latitude, longitude):
+    """Id of the grid cell containing a point"""
+    row = int(math.floor((latitude + 90) / CELL_SIZE))
+    column = int(math.floor((longitude + 180) / CELL_SIZE)) % GRID_COLUMNS
+    return row * GRID_COLUMNS + column
+
+
+def spans(latitude, radius_km):
+    """Half height and width, in degrees, of the box around a circle"""
+    lat_span = radius_km / KM_PER_DEGREE
+    lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return lat_span, lon_span
+
+
+def cells_within(latitude, longitude, radius_km):
+    """
+    Ids of the grid cells overlapping a circle, or None when there are more
+    than MAX_QUERY_CELLS of them.
+    """
+    lat_span, lon_span = spans(latitude, radius_km)
+    first_row = int(math.floor((max(latitude - lat_span, -90) + 90) / CELL_SIZE))
+    last_row = int(math.floor((min(latitude + lat_span, 90) + 90) / CELL_SIZE))
+    first_column = int(math.floor((longitude - lon_span + 180) / CELL_SIZE))
+    last_column = int(math.floor((longitude + lon_span + 180) / CELL_SIZE))
+    columns = min(last_column - first_column + 1, GRID_COLUMNS)
+    if (last_row - first_row + 1) * columns > MAX_QUERY_CELLS:
+        return None
+    return [
+        row * GRID_COLUMNS + (first_column + offset) % GRID_COLUMNS
+        for row in range(first_row, last_row + 1)
+        for offset in range(columns)
+    ]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def apply_geocode(instance, text):
+    """Set latitude, longitude and (if the model has one) geo_cell from text"""
+    point = geocode(text)
+    if point is None:
+        instance.latitude = instance.longitude = None
+    else:
+        instance.latitude, instance.longitude = point
+    if hasattr(instance, 'geo_cell'):
+        instance.geo_cell = cell_for(*point) if point else None
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Filter on the latitude and longitude of rows in the box around a circle"""
+    lat_span, lon_span = spans(latitude, radius_km)
+    box = Q(latitude__range=(latitude - lat_span, latitude + lat_span), longitude__isnull=False)
+    west, east = longitude - lon_span, longitude + lon_span
+    if lon_span >= 180:
+        return box
+    # Boxes across the antimeridian are two ranges
+    if west < -180:
+        return box & (Q(longitude__gte=west + 360) | Q(longitude__lte=east))
+    if east > 180:
+        return box & (Q(longitude__gte=west) | Q(longitude__lte=east - 360))
+    return box & Q(longitude__range=(west, east))
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit=None):
+    """
+    Rows of `queryset` within `radius_km` of a point, nearest first. Each
+    row gets a `distance_km` attribute. The model must have a geo_cell field
+    and a (latitude, longitude) index, used for radii covering more than
+    MAX_QUERY_CELLS cells.
+
+    Rows are geocoded to a gazetteer place (a city), so those in the same
+    place are equally near, and keep the order of `queryset`.
+    """
+    cells = cells_within(latitude, longitude, radius_km)
+    if cells is None:
+        queryset = queryset.filter(bounding_box(latitude, longitude, radius_km))
+    else:
+        queryset = queryset.filter(geo_cell__in=cells)
+
+    results = []
+    for obj in queryset:
+        distance = haversine_km(latitude, longitude, obj.latitude, obj.longitude)
+        if distance <= radius_km:
+            obj.distance_km = distance
+            results.append(obj)
+    # Stable, so ties keep the queryset's order
+    results.sort(key=lambda obj: obj.distance_km)
+    if limit is not None:
+        results = results[:limit]
+    return results
@@ -0,0 +1,156 @@
+"""
+Resized variants of uploaded donation photos and profile pictures.
+
+Each upload is re-encoded at a few widths as WebP with a JPEG fallback
+and stored next to the original ("photo.jpg" -> "photo.480w.webp"). The
+stored names go in the `<field>_variants` JSON field of the row, together
+with the name of the original they were made from, and the
+{% responsive_image %} tag turns them into a srcset. Rows without
+variants, or whose image has changed since, are served the original.
+
+Variants are not made by the view that uploads the image: saving the row
+calls process_image (core.tasks), run by a run_worker process or, with
+TASKS_RUN_INLINE, by the web process once the response has been sent.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+# Output formats: extension -> (Pillow format, MIME type)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def variant_name(name, width, ext):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{ext}'
+
+
+def target_widths(width):
+    """Variant widths for an original `width` px wide, never upscaling"""
+    widths = [w for w in settings.IMAGE_VARIANT_WIDTHS if w < width]
+    if width < max(settings.IMAGE_VARIANT_WIDTHS):
+        # Still re-encode small originals, which strips EXIF and recompresses
+        widths.append(width)
+    return widths
+
+
+def make_variants(field_file):
+    """
+    Write the variants of `field_file` to its storage and return the
+    description stored in the variants field, or {} if the file cannot be
+    read as an image.
+    """
+    # Only imported by processes that resize images: workers, or web
+    # processes running tasks inline
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with field_file.open('rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning("Could not create variants of %s: %s", field_file.name, e)
+        return {}
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    storage = field_file.storage
+    variants = {'source': field_file.name, 'width': image.width, 'height': image.height}
+    variants.update({ext: {} for ext in VARIANT_FORMATS})
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for ext, (pil_format, _) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=True)
+            name = variant_name(field_file.name, width, ext)
+            storage.delete(name)
+            # JSON object keys are strings
+            variants[ext][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(storage, variants):
+    for ext in VARIANT_FORMATS:
+        for name in (variants or {}).get(ext, {}).values():
+            storage.delete(name)
+
+
+def variants_are_current(field_file, variants):
+    """Whether `variants` were made from the file currently in `field_file`"""
+    return bool(field_file) and (variants or {}).get('source') == field_file.name
+
+
+def needs_variants(instance, field_name):
+    """Whether the variants of `instance.<field_name>` are missing or stale"""
+    field_file = getattr(instance, field_name)
+    old = getattr(instance, variants_field(field_name)) or {}
+    return not variants_are_current(field_file, old) and bool(field_file or old)
+
+
+def refresh_variants(instance, field_name):
+    """
+    (Re)create the variants of `instance.<field_name>` unless they are
+    current, dropping those of a replaced image.
+    """
+    if not needs_variants(instance, field_name):
+        return
+    field_file = getattr(instance, field_name)
+    name = variants_field(field_name)
+    delete_variants(field_file.storage, getattr(instance, name))
+    variants = make_variants(field_file) if field_file else {}
+    setattr(instance, name, variants)
+    changes = {name: variants}
+    if any(field.name == 'updated_at' for field in instance._meta.concrete_fields):
+        # update() leaves auto_now alone; the pages showing the row changed
+        changes['updated_at'] = timezone.now()
+    # Through update() so the model's post_save handlers don't run again,
+    # and only while the row still holds the image the variants were made of
+    type(instance)._base_manager.filter(
+        pk=instance.pk, **{field_name: field_file.name or ''}
+    ).update(**changes)
+
+
+# Unique: runs of the same image would delete and rewrite each other's files
+@task(atomic=False, unique=True)
+def process_image(model_label, object_id, field_name):
+    """Make the variants of an uploaded image and refresh the sections showing it"""
+    instance = apps.get_model(model_label)._base_manager.filter(pk=object_id).first()
+    if instance is None or not needs_variants(instance, field_name):
+        return
+    refresh_variants(instance, field_name)
+    invalidate_fragments(instance)
+
+
+def queue_variants(instance, field_name):
+    """Queue the resizing of `instance.<field_name>` unless its variants are current"""
+    if needs_variants(instance, field_name):
+        process_image.delay(instance._meta.label_lower, instance.pk, field_name)
+
+
+def invalidate_fragments(instance):
+    """Cached sections showing the image, as the save signals of the row would"""
+    from . import signals
+    from .models import FoodDonation
+
+    if isinstance(instance, FoodDonation):
+        signals.invalidate_donation_fragments(type(instance), instance)
+    else:
+        signals.invalidate_profile_fragments(type(instance), instance)
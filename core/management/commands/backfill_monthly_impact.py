@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from core.models import Collaboration, FoodDonation, MonthlyImpact
+
+
+class Command(BaseCommand):
+    help = "Rebuild the MonthlyImpact rollup from FoodDonation and Collaboration history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of rollup rows written per bulk statement (default: 1000)",
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help="Delete existing rollup rows before rebuilding",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rollup = defaultdict(lambda: dict.fromkeys(MonthlyImpact.COUNTER_FIELDS, 0))
+
+        # One grouped query per source instead of a scan per user and month
+        donations = (
+            FoodDonation.objects
+            .annotate(year=ExtractYear('posted_at'), month=ExtractMonth('posted_at'))
+            .values('donor', 'year', 'month')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for row in donations:
+            rollup[row['donor'], row['year'], row['month']]['donations_made'] = row['total']
+
+        completed = (
+            Collaboration.objects
+            .filter(status='COMPLETED', completion_date__isnull=False)
+            .annotate(year=ExtractYear('completion_date'), month=ExtractMonth('completion_date'))
+        )
+        for row in completed.values('ngo', 'year', 'month').annotate(
+            total=Count('id'), people=Sum('people_served')
+        ).order_by():
+            counters = rollup[row['ngo'], row['year'], row['month']]
+            counters['collaborations_completed'] += row['total']
+            counters['people_served'] += row['people'] or 0
+        for row in completed.values('donor', 'year', 'month').annotate(total=Count('id')).order_by():
+            rollup[row['donor'], row['year'], row['month']]['collaborations_completed'] += row['total']
+
+        rows = [
+            MonthlyImpact(user_id=user_id, year=year, month=month, **counters)
+            for (user_id, year, month), counters in rollup.items()
+        ]
+
+        with transaction.atomic():
+            if options['clear']:
+                MonthlyImpact.objects.all().delete()
+            for start in range(0, len(rows), batch_size):
+                MonthlyImpact.objects.bulk_create(
+                    rows[start:start + batch_size],
+                    update_conflicts=True,
+                    unique_fields=['user', 'year', 'month'],
+                    update_fields=list(MonthlyImpact.COUNTER_FIELDS),
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {len(rows)} monthly impact rows."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from grace_bites_project.warmup import compile_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile every template, so that a deployment with a broken one fails before "
+        "any request renders it. Server processes compile them all again as they start "
+        "(PRECOMPILE_TEMPLATES)"
+    )
+
+    def handle(self, *args, **options):
+        compiled, seconds, errors = compile_templates()
+        for name, error in errors:
+            self.stderr.write(f"{name}: {error}")
+        if errors:
+            raise CommandError(f"{len(errors)} templates failed to compile.")
+        self.stdout.write(self.style.SUCCESS(f"Compiled {compiled} templates in {seconds * 1000:.0f} ms."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.tiers import refresh_donor_tiers
+
+
+class Command(BaseCommand):
+    help = "Recompute donation-frequency tiers and leaderboard ranks for all donors"
+
+    def handle(self, *args, **options):
+        # Also makes the leaderboard show the new ranking on its next request
+        computed_at, count = refresh_donor_tiers()
+        self.stdout.write(self.style.SUCCESS(f"Computed tiers for {count} donors at {computed_at:%Y-%m-%d %H:%M:%S}."))
@@ -0,0 +1,55 @@
+import argparse
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core import exports
+
+
+def iso_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Stream donation, request or collaboration history as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--user', help="Only export rows of this username")
+        parser.add_argument('--since', type=iso_date, help="First day included (YYYY-MM-DD)")
+        parser.add_argument('--until', type=iso_date, help="Last day included (YYYY-MM-DD)")
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write to (default: standard output)",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.DEFAULT_CHUNK_SIZE,
+            help=f"Rows fetched and written per chunk (default: {exports.DEFAULT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        stream = exports.stream_export(
+            options['dataset'], options['format'],
+            user=user, since=options['since'], until=options['until'],
+            chunk_size=options['chunk_size'],
+        )
+        if not options['output']:
+            for text in stream:
+                self.stdout.write(text, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(stream)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['dataset']} export to {options['output']}."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.matching import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the donation/request matching index from all open donations and requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows read and written per batch (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} tokens."))
@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+def run_task(claimed):
+    try:
+        return tasks.run(claimed)
+    finally:
+        # Pool threads each hold their own connection
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks (core.tasks). Required wherever TASKS_RUN_INLINE "
+        "is False. Runs until interrupted; use --once from cron where no long-running "
+        "process is available."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=2,
+            help="Tasks run in parallel threads (default: 2)",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to wait when no task is due (default: 2)",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once no task is due",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    claimed = tasks.claim(concurrency * 2)
+                    if not claimed:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    for ok in pool.map(run_task, claimed):
+                        done += ok
+                        failed += not ok
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} tasks, {failed} failed."))
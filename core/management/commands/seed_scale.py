@@ -0,0 +1,434 @@
+import math
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from accounts.models import User
+from core import fragments, signals
+from core.geo import cell_for, load_gazetteer
+from core.matching import rebuild_index
+from core.models import (
+    Analysis, Collaboration, EventPlannerProfile, FoodDonation, FoodRequest,
+    LoginHistory, NGOProfile, RestaurantProfile, UserProfile, badge_level_for,
+    current_month_start,
+)
+
+FOODS = [
+    'rice', 'dal', 'roti', 'chapati', 'biryani', 'pulao', 'sambar', 'idli', 'dosa',
+    'paneer curry', 'chole', 'rajma', 'khichdi', 'poha', 'upma', 'sabzi', 'bread',
+    'sandwiches', 'fruits', 'bananas', 'milk', 'curd', 'sweets', 'halwa', 'pasta',
+    'noodles', 'soup', 'vegetable curry', 'chicken curry', 'egg curry', 'parathas',
+]
+QUALIFIERS = ['veg', 'non-veg', 'jain', 'mild', 'spicy', 'home style', 'leftover buffet', 'packed']
+UNITS = ['kg', 'plates', 'boxes', 'litres', 'servings']
+
+ROLE_PROFILES = {
+    User.Role.RESTAURANT: (RestaurantProfile, 'restaurant_name', 'Kitchen'),
+    User.Role.NGO: (NGOProfile, 'organization_name', 'Foundation'),
+    User.Role.EVENTPLANNER: (EventPlannerProfile, 'company_name', 'Events'),
+}
+
+
+@contextmanager
+def backdated(*fields):
+    """Let bulk_create write explicit values into auto_now_add fields"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+# The post_delete receivers of core.signals, by sender
+DELETE_RECEIVERS = [
+    (signals.uncount_deleted_donation, FoodDonation),
+    (signals.invalidate_donation_fragments, FoodDonation),
+    (signals.publish_donation_removal, FoodDonation),
+    (signals.invalidate_request_fragments, FoodRequest),
+    (signals.invalidate_collaboration_fragments, Collaboration),
+    (signals.invalidate_analysis_fragments, Analysis),
+    (signals.invalidate_profile_fragments, RestaurantProfile),
+    (signals.invalidate_profile_fragments, NGOProfile),
+    (signals.invalidate_profile_fragments, EventPlannerProfile),
+    (signals.invalidate_profile_fragments, UserProfile),
+    (signals.invalidate_directory_on_account_deletion, User),
+]
+
+
+@contextmanager
+def disconnected(signal, receivers):
+    """Disconnect (receiver, sender) pairs from `signal` for the duration of the block"""
+    removed = [
+        (receiver, sender) for receiver, sender in receivers
+        if signal.disconnect(receiver, sender=sender)
+    ]
+    try:
+        yield
+    finally:
+        for receiver, sender in removed:
+            signal.connect(receiver, sender=sender)
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a large, deterministic synthetic dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--admins', type=int, default=2)
+        parser.add_argument('--restaurants', type=int, default=500)
+        parser.add_argument('--ngos', type=int, default=200)
+        parser.add_argument('--eventplanners', type=int, default=100)
+        parser.add_argument('--donations', type=int, default=50000)
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--collaborations', type=int, default=15000)
+        parser.add_argument('--logins', type=int, default=50000)
+        parser.add_argument(
+            '--legacy-share', type=float, default=0.1,
+            help="Share of users with a legacy UserProfile instead of a role profile (default: 0.1)",
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help="Spread the activity over this many past days (default: 365)",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of rows written per bulk statement (default: 5000)",
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help="Username prefix of the generated users (default: seed)",
+        )
+        parser.add_argument('--password', default='password', help="Password of every generated user")
+        parser.add_argument(
+            '--clear', action='store_true',
+            help="Delete previously seeded users with the same prefix and everything they own first",
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help="Do not rebuild Analysis counters, the monthly rollup and the match index",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = options['days']
+        self.now = timezone.now()
+        prefix = options['prefix']
+
+        seeded = User.objects.filter(username__startswith=f'{prefix}_')
+        if seeded.exists():
+            if not options['clear']:
+                raise CommandError(f"Users prefixed '{prefix}_' already exist, pass --clear to replace them.")
+            self.stdout.write("Deleting previously seeded data...")
+            self.clear(seeded)
+
+        places = list(load_gazetteer().items())
+        # A few big cities see most of the activity
+        self.places = places
+        self.place_weights = self.zipf_weights(len(places), 1.1)
+
+        users = self.create_users(prefix, options)
+        self.create_profiles(users, options['legacy_share'])
+
+        donors = users[User.Role.RESTAURANT] + users[User.Role.EVENTPLANNER]
+        ngos = users[User.Role.NGO]
+        if options['donations'] and not donors:
+            raise CommandError("Donations need at least one restaurant or event planner.")
+        if (options['requests'] or options['collaborations']) and not ngos:
+            raise CommandError("Requests and collaborations need at least one NGO.")
+
+        donations = self.create_donations(donors, options['donations'])
+        self.create_requests(ngos, options['requests'])
+        self.create_collaborations(donations, ngos, options['collaborations'])
+        self.create_logins([pk for ids in users.values() for pk in ids], options['logins'])
+
+        if not options['skip_derived']:
+            self.stdout.write("Rebuilding derived data...")
+            self.rebuild_analysis(seeded)
+            call_command('backfill_monthly_impact', batch_size=self.batch_size, stdout=self.stdout)
+            rebuild_index(batch_size=self.batch_size)
+
+        self.stdout.write(self.style.SUCCESS("Seeding complete."))
+
+    # Distributions
+
+    def clear(self, seeded):
+        """
+        Delete the seeded users and everything they own without the delete
+        signals: the receivers would publish an event, bump fragments and
+        update counters for every row, while without them Django deletes
+        each table in a single query. The caches are invalidated once
+        instead, the feeds and directory as well as the other users who
+        collaborated with seeded ones.
+        """
+        collaborators = set()
+        for donor_id, ngo_id in Collaboration.objects.filter(
+            Q(donor__in=seeded) | Q(ngo__in=seeded)
+        ).values_list('donor', 'ngo').distinct().iterator():
+            collaborators.update((donor_id, ngo_id))
+        collaborators -= set(seeded.values_list('id', flat=True))
+
+        with transaction.atomic(), disconnected(post_delete, DELETE_RECEIVERS):
+            seeded.delete()
+        fragments.bump(fragments.DIRECTORY, fragments.DONATIONS, fragments.REQUESTS)
+        fragments.bump_users(*collaborators)
+
+    def zipf_weights(self, count, exponent):
+        """Cumulative weights of a Zipf distribution over `count` items"""
+        weights, total = [], 0.0
+        for rank in range(1, count + 1):
+            total += 1 / rank ** exponent
+            weights.append(total)
+        return weights
+
+    def pick(self, items, cum_weights, k):
+        return self.random.choices(items, cum_weights=cum_weights, k=k)
+
+    def past_time(self):
+        """A moment in the last `days` days, recent activity being more likely"""
+        return self.now - timedelta(days=self.days * self.random.random() ** 2)
+
+    def place(self):
+        """A free-text location and its coordinates, jittered within a few km"""
+        name, (latitude, longitude) = self.pick(self.places, self.place_weights, 1)[0]
+        latitude += self.random.uniform(-0.05, 0.05)
+        longitude += self.random.uniform(-0.05, 0.05)
+        text = f"{self.random.randint(1, 300)} Main Road, {name.title()}"
+        return text, latitude, longitude
+
+    def food(self):
+        items = self.random.sample(FOODS, self.random.choice((1, 1, 2, 3)))
+        food_type = ' and '.join(items).capitalize()
+        description = f"{self.random.choice(QUALIFIERS).capitalize()} {', '.join(items)}"
+        quantity = f"{self.random.randint(1, 50)} {self.random.choice(UNITS)}"
+        return food_type, description, quantity
+
+    # Writers
+
+    def write(self, model, rows, label):
+        """bulk_create `rows` (an iterable) in batches, returns the created pks"""
+        pks = array('q')
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        self.stdout.write(f"  {len(pks)} {label}")
+        return pks
+
+    def create_users(self, prefix, options):
+        password = make_password(options['password'])
+        counts = {
+            User.Role.ADMIN: options['admins'],
+            User.Role.RESTAURANT: options['restaurants'],
+            User.Role.NGO: options['ngos'],
+            User.Role.EVENTPLANNER: options['eventplanners'],
+        }
+        users = {}
+        for role, count in counts.items():
+            users[role] = list(self.write(User, (
+                User(
+                    username=f'{prefix}_{role.lower()}_{i}',
+                    email=f'{prefix}_{role.lower()}_{i}@example.com',
+                    password=password,
+                    role=role,
+                    is_staff=role == User.Role.ADMIN,
+                    date_joined=self.now - timedelta(days=self.days + self.random.random() * 180),
+                )
+                for i in range(count)
+            ), f"{role.label.lower()} users"))
+        return users
+
+    def create_profiles(self, users, legacy_share):
+        legacy = []
+        for role, (model, name_field, suffix) in ROLE_PROFILES.items():
+            profiles = []
+            for i, user_id in enumerate(users[role]):
+                address, latitude, longitude = self.place()
+                fields = {
+                    'user_id': user_id,
+                    'address': address,
+                    'contact_number': f'9{self.random.randint(0, 999999999):09d}',
+                    'latitude': latitude,
+                    'longitude': longitude,
+                }
+                if self.random.random() < legacy_share:
+                    legacy.append(UserProfile(organization_name=f'{role.label} {i}', **fields))
+                else:
+                    profiles.append(model(**{name_field: f'{role.label} {i} {suffix}'}, **fields))
+            self.write(model, profiles, f"{model._meta.verbose_name_plural}")
+        self.write(UserProfile, legacy, "legacy user profiles")
+
+    def create_donations(self, donors, count):
+        """Returns the (pk, donor, posted_at timestamp) columns of the donations"""
+        donor_weights = self.zipf_weights(len(donors), 0.8)
+        donor_ids = array('q')
+        posted = array('d')
+
+        def rows():
+            for donor_id in self.pick(donors, donor_weights, count):
+                posted_at = self.past_time()
+                expiry_date = posted_at + timedelta(hours=self.random.uniform(4, 72))
+                expired = expiry_date <= self.now
+                accepted = self.random.random() < (0.6 if expired else 0.1)
+                location, latitude, longitude = self.place()
+                food_type, description, quantity = self.food()
+                donor_ids.append(donor_id)
+                posted.append(posted_at.timestamp())
+                yield FoodDonation(
+                    donor_id=donor_id,
+                    food_type=food_type,
+                    quantity=quantity,
+                    description=description,
+                    expiry_date=expiry_date,
+                    location=location,
+                    latitude=latitude,
+                    longitude=longitude,
+                    geo_cell=cell_for(latitude, longitude),
+                    posted_at=posted_at,
+                    is_accepted=accepted,
+                    # As left behind by the expiry sweeper
+                    is_available=not (accepted or expired),
+                )
+
+        with backdated(FoodDonation._meta.get_field('posted_at')):
+            pks = self.write(FoodDonation, rows(), "food donations")
+        return pks, donor_ids, posted
+
+    def create_requests(self, ngos, count):
+        ngo_weights = self.zipf_weights(len(ngos), 0.7)
+
+        def rows():
+            for ngo_id in self.pick(ngos, ngo_weights, count):
+                requested_at = self.past_time()
+                required_timing = requested_at + timedelta(hours=self.random.uniform(2, 96))
+                if required_timing <= self.now:
+                    status = self.pick(['FULFILLED', 'EXPIRED', 'CANCELLED'], [0.5, 0.9, 1.0], 1)[0]
+                else:
+                    status = 'PENDING' if self.random.random() < 0.85 else 'ACCEPTED'
+                location, latitude, longitude = self.place()
+                food_type, description, quantity = self.food()
+                yield FoodRequest(
+                    requester_id=ngo_id,
+                    food_type=food_type,
+                    quantity_required=quantity,
+                    location=location,
+                    required_timing=required_timing,
+                    latitude=latitude,
+                    longitude=longitude,
+                    geo_cell=cell_for(latitude, longitude),
+                    description=description,
+                    status=status,
+                    is_fulfilled=status == 'FULFILLED',
+                    requested_at=requested_at,
+                )
+
+        with backdated(FoodRequest._meta.get_field('requested_at')):
+            self.write(FoodRequest, rows(), "food requests")
+
+    def create_collaborations(self, donations, ngos, count):
+        pks, donor_ids, posted = donations
+        if not pks:
+            return
+        count = min(count, len(pks))
+
+        def rows():
+            for index in self.random.sample(range(len(pks)), count):
+                collaboration_date = datetime.fromtimestamp(
+                    posted[index], tz=dt_timezone.utc
+                ) + timedelta(hours=self.random.uniform(0.5, 12))
+                status = self.pick(['COMPLETED', 'ACTIVE', 'PENDING', 'CANCELLED'], [0.6, 0.75, 0.9, 1.0], 1)[0]
+                if status in ('ACTIVE', 'PENDING') and collaboration_date < self.now - timedelta(days=7):
+                    # Old collaborations have long been settled
+                    status = 'COMPLETED'
+                completed = status == 'COMPLETED'
+                completion_date = None
+                if completed:
+                    completion_date = min(
+                        collaboration_date + timedelta(hours=self.random.uniform(1, 48)), self.now
+                    )
+                yield Collaboration(
+                    donor_id=donor_ids[index],
+                    ngo_id=self.random.choice(ngos),
+                    food_donation_id=pks[index],
+                    status=status,
+                    collaboration_date=min(collaboration_date, self.now),
+                    people_served=int(math.exp(self.random.gauss(3.5, 0.8))) if completed else None,
+                    completion_date=completion_date,
+                )
+
+        with backdated(Collaboration._meta.get_field('collaboration_date')):
+            self.write(Collaboration, rows(), "collaborations")
+
+    def create_logins(self, user_ids, count):
+        if not user_ids:
+            return
+        user_weights = self.zipf_weights(len(user_ids), 0.9)
+
+        def rows():
+            for user_id in self.pick(user_ids, user_weights, count):
+                yield LoginHistory(
+                    user_id=user_id,
+                    login_timestamp=self.past_time(),
+                    ip_address=f'10.{self.random.randint(0, 255)}.{self.random.randint(0, 255)}.{self.random.randint(1, 254)}',
+                )
+
+        with backdated(LoginHistory._meta.get_field('login_timestamp')):
+            self.write(LoginHistory, rows(), "logins")
+
+    def rebuild_analysis(self, users):
+        """Set the counters core.signals would have maintained for the seeded users"""
+        month_start = current_month_start()
+        roles = dict(users.values_list('id', 'role'))
+        counters = {user_id: {} for user_id in roles}
+
+        donations = FoodDonation.objects.filter(donor__in=users).values('donor').annotate(
+            total=Count('id'), monthly=Count('id', filter=Q(posted_at__gte=month_start)),
+        ).order_by()
+        for row in donations.iterator():
+            counters[row['donor']].update(food_donated_count=row['total'], monthly_donations_made=row['monthly'])
+
+        completed = Collaboration.objects.filter(status='COMPLETED')
+        for row in completed.filter(donor__in=users).values('donor').annotate(total=Count('id')).order_by():
+            counters[row['donor']].update(ngos_helped_count=row['total'], collaborations_count=row['total'])
+        for row in completed.filter(ngo__in=users).values('ngo').annotate(
+            total=Count('id'),
+            people=Sum('people_served'),
+            monthly=Sum('people_served', filter=Q(completion_date__gte=month_start)),
+        ).order_by():
+            counters[row['ngo']].update(
+                requests_fulfilled_count=row['total'],
+                total_people_served=row['people'] or 0,
+                monthly_people_served=row['monthly'] or 0,
+            )
+
+        rows = [
+            Analysis(
+                user_id=user_id,
+                stats_month=month_start.date(),
+                badge_level=badge_level_for(
+                    roles[user_id],
+                    people_served=values.get('monthly_people_served', 0),
+                    donations_made=values.get('monthly_donations_made', 0),
+                ),
+                **values,
+            )
+            for user_id, values in counters.items()
+        ]
+        with transaction.atomic():
+            Analysis.objects.filter(user__in=users).delete()
+            self.write(Analysis, rows, "analysis rows")
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from core import fragments
+from core.models import ChangeEvent, FoodDonation, FoodRequest, MatchToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark expired donations unavailable and past-due pending requests expired, "
+        "and prune the live update change log"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of rows updated per bulk statement (default: 1000)",
+        )
+
+    def sweep(self, queryset, batch_size, token_field, owner_field, scope, on_batch=None, **changes):
+        """
+        Apply `changes` to the rows of `queryset` in batches of bounded size,
+        dropping them from the match index and invalidating their owners'
+        cached dashboard sections. `on_batch` is also given the (id, owner id)
+        pairs of each batch. Returns the number of rows updated.
+        """
+        model = queryset.model
+        total = 0
+        while True:
+            with transaction.atomic():
+                rows = list(queryset.order_by().values_list('id', owner_field)[:batch_size])
+                if not rows:
+                    return total
+                ids = [row_id for row_id, _ in rows]
+                # Bulk UPDATE skips save signals, so their work is done here
+                MatchToken.objects.filter(**{f'{token_field}__in': ids}).delete()
+                total += model.objects.filter(id__in=ids).update(**changes)
+                fragments.bump_users(*{owner_id for _, owner_id in rows})
+                fragments.bump(scope)
+                if on_batch is not None:
+                    on_batch(rows)
+
+    def record_withdrawals(self, rows):
+        """Change log entries for the live updates of NGO dashboards"""
+        ChangeEvent.objects.bulk_create([
+            ChangeEvent(
+                kind=ChangeEvent.DONATION_WITHDRAWN,
+                data={'id': donation_id, 'donor_id': donor_id, 'reason': 'expired'},
+                audience_role=User.Role.NGO,
+                user_ids=[donor_id],
+            )
+            for donation_id, donor_id in rows
+        ])
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        donations = self.sweep(
+            FoodDonation.objects.expired(now), batch_size, 'food_donation', 'donor_id', fragments.DONATIONS,
+            on_batch=self.record_withdrawals, is_available=False,
+        )
+        requests = self.sweep(
+            FoodRequest.objects.stale(now), batch_size, 'food_request', 'requester_id', fragments.REQUESTS,
+            status='EXPIRED',
+        )
+
+        cutoff = now - timedelta(hours=settings.EVENTS_RETENTION_HOURS)
+        pruned, _ = ChangeEvent.objects.filter(created_at__lt=cutoff).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {donations} donations and {requests} requests, "
+            f"pruned {pruned} change log events."
+        ))
@@ -0,0 +1,227 @@
+"""
+Matching of food donations to NGO food requests.
+
+The food_type and description of every open donation and request are
+normalized into tokens and stored in the MatchToken inverted index. To
+suggest matches, candidates sharing tokens are looked up through the index
+(never by scanning the open feeds) and ranked by token overlap, whether the
+donation keeps until the food is required, and recency.
+"""
+import math
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import FoodDonation, FoodRequest, MatchToken
+
+WORD_RE = re.compile(r'[a-z]+')
+
+STOPWORDS = frozenset("""
+    a an and any are as at be by for from has have in is it its of on or our
+    per the to we with some fresh food foods item items meal meals packed
+    available approx about kg kgs g gm gms ltr ltrs litre litres pcs pieces
+    plate plates box boxes pack packs serving servings people
+""".split())
+
+# Ranking weights
+OVERLAP_WEIGHT = 0.6
+TIMING_WEIGHT = 0.25
+RECENCY_WEIGHT = 0.15
+
+# Recency score halves for every RECENCY_HALF_LIFE_DAYS of age
+RECENCY_HALF_LIFE_DAYS = 3
+
+# Most-overlapping candidates fetched from the index before exact ranking
+CANDIDATE_LIMIT = 200
+
+
+def normalize_token(word):
+    """Crude singularization so that 'rotis' matches 'roti'"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('es') and word[-3] in 'sxz':
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(*texts):
+    """Normalized, de-duplicated tokens of the given texts"""
+    tokens = set()
+    for text in texts:
+        for word in WORD_RE.findall((text or '').lower()):
+            if len(word) < 2 or word in STOPWORDS:
+                continue
+            tokens.add(normalize_token(word)[:50])
+    return tokens
+
+
+def donation_tokens(donation):
+    return tokenize(donation.food_type, donation.description)
+
+
+def request_tokens(food_request):
+    return tokenize(food_request.food_type, food_request.description)
+
+
+def is_open_donation(donation):
+    return donation.is_available and not donation.is_accepted
+
+
+def is_open_request(food_request):
+    return food_request.status == 'PENDING'
+
+
+def index_donation(donation):
+    """(Re)index a donation, dropping it from the index once it is no longer available"""
+    with transaction.atomic():
+        MatchToken.objects.filter(food_donation=donation).delete()
+        if is_open_donation(donation):
+            MatchToken.objects.bulk_create([
+                MatchToken(token=token, food_donation=donation)
+                for token in donation_tokens(donation)
+            ])
+
+
+def index_request(food_request):
+    """(Re)index a request, dropping it from the index once it is no longer pending"""
+    with transaction.atomic():
+        MatchToken.objects.filter(food_request=food_request).delete()
+        if is_open_request(food_request):
+            MatchToken.objects.bulk_create([
+                MatchToken(token=token, food_request=food_request)
+                for token in request_tokens(food_request)
+            ])
+
+
+def rebuild_index(batch_size=1000):
+    """Rebuild the whole index from the open donations and requests"""
+    with transaction.atomic():
+        MatchToken.objects.all().delete()
+        rows = []
+        donations = FoodDonation.objects.open().filter(is_accepted=False).only(
+            'id', 'food_type', 'description'
+        )
+        for donation in donations.iterator(chunk_size=batch_size):
+            rows.extend(MatchToken(token=t, food_donation_id=donation.id) for t in donation_tokens(donation))
+        requests = FoodRequest.objects.open().only('id', 'food_type', 'description')
+        for food_request in requests.iterator(chunk_size=batch_size):
+            rows.extend(MatchToken(token=t, food_request_id=food_request.id) for t in request_tokens(food_request))
+        MatchToken.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def overlap_score(tokens_a, tokens_b):
+    """Cosine similarity of two token sets"""
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / math.sqrt(len(tokens_a) * len(tokens_b))
+
+
+def recency_score(timestamp, now):
+    age_days = max((now - timestamp).total_seconds(), 0) / 86400
+    return 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def match_score(donation, food_request, tokens_d, tokens_r, now):
+    """
+    Score of a donation/request pair in [0, 1], or None if the donation
+    expires before the food is required or the request is already past due.
+    """
+    if food_request.required_timing < now or donation.expiry_date < now:
+        return None
+    if donation.expiry_date < food_request.required_timing:
+        return None
+    overlap = overlap_score(tokens_d, tokens_r)
+    if not overlap:
+        return None
+    # Less slack between expiry and the required time means less waste
+    slack_days = (donation.expiry_date - food_request.required_timing).total_seconds() / 86400
+    timing = 1 / (1 + slack_days)
+    recency = max(recency_score(donation.posted_at, now), recency_score(food_request.requested_at, now))
+    return OVERLAP_WEIGHT * overlap + TIMING_WEIGHT * timing + RECENCY_WEIGHT * recency
+
+
+def _candidate_ids(tokens, field):
+    """Ids of indexed objects sharing the most tokens with `tokens`"""
+    if not tokens:
+        return []
+    return list(
+        MatchToken.objects.filter(token__in=tokens, **{f'{field}__isnull': False})
+        .values(field)
+        .annotate(overlap=Count('id'))
+        .order_by('-overlap')
+        .values_list(field, flat=True)[:CANDIDATE_LIMIT]
+    )
+
+
+def _tokens_by_object(ids, field):
+    tokens = defaultdict(set)
+    for object_id, token in MatchToken.objects.filter(**{f'{field}__in': ids}).values_list(field, 'token'):
+        tokens[object_id].add(token)
+    return tokens
+
+
+def _rank(sources, source_tokens, candidates, candidate_tokens, score, limit):
+    """Best (source, candidate, score) triples, at most one per candidate"""
+    best = {}
+    for candidate in candidates:
+        for source in sources:
+            value = score(source, candidate, source_tokens[source.id], candidate_tokens[candidate.id])
+            if value is not None and value > best.get(candidate.id, (None, None, 0))[2]:
+                best[candidate.id] = (source, candidate, value)
+    return sorted(best.values(), key=lambda match: match[2], reverse=True)[:limit]
+
+
+def suggest_requests_for_donor(user, limit=5):
+    """
+    Pending requests that best match the donor's available donations, as
+    dicts with the request, the matching donation and the score.
+    """
+    now = timezone.now()
+    donations = list(FoodDonation.objects.open().filter(donor=user)[:50])
+    if not donations:
+        return []
+    tokens_d = _tokens_by_object([d.id for d in donations], 'food_donation')
+    candidate_ids = _candidate_ids(set().union(*tokens_d.values()), 'food_request')
+    if not candidate_ids:
+        return []
+    requests = list(
+        FoodRequest.objects.open().filter(id__in=candidate_ids).select_related('requester')
+    )
+    tokens_r = _tokens_by_object(candidate_ids, 'food_request')
+    matches = _rank(
+        donations, tokens_d, requests, tokens_r,
+        lambda d, r, td, tr: match_score(d, r, td, tr, now),
+        limit,
+    )
+    return [{'food_request': r, 'donation': d, 'score': s} for d, r, s in matches]
+
+
+def suggest_donations_for_ngo(user, limit=5):
+    """
+    Available donations that best match the NGO's pending requests, as
+    dicts with the donation, the matching request and the score.
+    """
+    now = timezone.now()
+    requests = list(FoodRequest.objects.open().filter(requester=user)[:50])
+    if not requests:
+        return []
+    tokens_r = _tokens_by_object([r.id for r in requests], 'food_request')
+    candidate_ids = _candidate_ids(set().union(*tokens_r.values()), 'food_donation')
+    if not candidate_ids:
+        return []
+    donations = list(
+        FoodDonation.objects.open().filter(id__in=candidate_ids).select_related('donor')
+    )
+    tokens_d = _tokens_by_object(candidate_ids, 'food_donation')
+    matches = _rank(
+        requests, tokens_r, donations, tokens_d,
+        lambda r, d, tr, td: match_score(d, r, td, tr, now),
+        limit,
+    )
+    return [{'donation': d, 'food_request': r, 'score': s} for r, d, s in matches]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Seed the incrementally maintained counters from existing rows.
+    Until now food_donated_count was never updated and the monthly
+    counters were recomputed on every dashboard view.
+    """
+    Analysis = apps.get_model('core', 'Analysis')
+    FoodDonation = apps.get_model('core', 'FoodDonation')
+    Collaboration = apps.get_model('core', 'Collaboration')
+    User = apps.get_model('accounts', 'User')
+
+    start_of_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    donations = {
+        row['donor']: row
+        for row in FoodDonation.objects.values('donor').annotate(
+            total=Count('id'),
+            monthly=Count('id', filter=Q(posted_at__gte=start_of_month)),
+        )
+    }
+    people_served = {
+        row['ngo']: row['monthly'] or 0
+        for row in Collaboration.objects.filter(
+            status='COMPLETED',
+            people_served__isnull=False,
+            completion_date__gte=start_of_month,
+        ).values('ngo').annotate(monthly=Sum('people_served'))
+    }
+
+    user_ids = set(donations) | set(people_served) | set(Analysis.objects.values_list('user_id', flat=True))
+    roles = dict(User.objects.filter(id__in=user_ids).values_list('id', 'role'))
+    existing = set(Analysis.objects.values_list('user_id', flat=True))
+    Analysis.objects.bulk_create([Analysis(user_id=user_id) for user_id in user_ids - existing])
+
+    for analysis in Analysis.objects.all():
+        donation_row = donations.get(analysis.user_id, {})
+        analysis.food_donated_count = donation_row.get('total', 0)
+        analysis.monthly_donations_made = donation_row.get('monthly', 0)
+        analysis.monthly_people_served = people_served.get(analysis.user_id, 0)
+        analysis.stats_month = start_of_month.date()
+        analysis.badge_level = _badge_level(roles.get(analysis.user_id), analysis)
+        analysis.save(update_fields=[
+            'food_donated_count', 'monthly_donations_made', 'monthly_people_served',
+            'stats_month', 'badge_level',
+        ])
+
+
+def _badge_level(role, analysis):
+    # Frozen copy of Analysis.get_badge_level() at the time of this migration
+    if role == 'NGO':
+        value, thresholds = analysis.monthly_people_served, (1700, 1500, 1000, 500)
+    else:
+        value, thresholds = analysis.monthly_donations_made, (20, 15, 10, 5)
+    for level, threshold in zip(('DIAMOND', 'GOLD', 'SILVER', 'BRONZE'), thresholds):
+        if value >= threshold:
+            return level
+    return None
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_delete_userprofile'),
+        ('core', '0009_analysis_monthly_donations_made'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysis',
+            name='stats_month',
+            field=models.DateField(blank=True, help_text='First day of the month the monthly counters refer to', null=True),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
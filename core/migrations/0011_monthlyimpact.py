@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_analysis_stats_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyImpact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('donations_made', models.PositiveIntegerField(default=0)),
+                ('collaborations_completed', models.PositiveIntegerField(default=0)),
+                ('people_served', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_impact', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyimpact',
+            constraint=models.UniqueConstraint(fields=('user', 'year', 'month'), name='unique_monthly_impact'),
+        ),
+    ]
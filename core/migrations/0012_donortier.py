@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_monthlyimpact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(blank=True, choices=[('GOLD', 'Gold'), ('PLATINUM', 'Platinum'), ('SILVER', 'Silver')], max_length=20, null=True)),
+                ('tier_label', models.CharField(max_length=100)),
+                ('rank', models.PositiveIntegerField(db_index=True, help_text='Position on the donor leaderboard, 1 is best')),
+                ('donation_count', models.PositiveIntegerField(default=0, help_text='Recent donations considered, at most 10')),
+                ('avg_days_between', models.FloatField(blank=True, null=True)),
+                ('last_donation_at', models.DateTimeField()),
+                ('computed_at', models.DateTimeField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='donor_tier', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
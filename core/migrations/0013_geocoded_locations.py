@@ -0,0 +1,108 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+from core.geo import apply_geocode
+
+# Model name and the free-text field it is geocoded from
+GEOCODED_MODELS = [
+    ('FoodDonation', 'location'),
+    ('FoodRequest', 'location'),
+    ('RestaurantProfile', 'address'),
+    ('NGOProfile', 'address'),
+    ('EventPlannerProfile', 'address'),
+    ('UserProfile', 'address'),
+]
+
+
+def geocode_existing_rows(apps, schema_editor):
+    for model_name, text_field in GEOCODED_MODELS:
+        model = apps.get_model('core', model_name)
+        fields = ['latitude', 'longitude']
+        if model_name in ('FoodDonation', 'FoodRequest'):
+            fields.append('geo_cell')
+        rows = list(model.objects.only('pk', text_field))
+        for row in rows:
+            apply_geocode(row, getattr(row, text_field))
+        model.objects.bulk_update(rows, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_donortier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventplannerprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='eventplannerprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='fooddonation',
+            name='geo_cell',
+            field=models.PositiveIntegerField(blank=True, db_index=True, help_text='Grid cell of the geocoded location, see core.geo', null=True),
+        ),
+        migrations.AddField(
+            model_name='fooddonation',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from location when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='fooddonation',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from location when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='geo_cell',
+            field=models.PositiveIntegerField(blank=True, db_index=True, help_text='Grid cell of the geocoded location, see core.geo', null=True),
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from location when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from location when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='ngoprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='ngoprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurantprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurantprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Geocoded from address when saved', null=True),
+        ),
+        migrations.RunPython(geocode_existing_rows, migrations.RunPython.noop),
+    ]
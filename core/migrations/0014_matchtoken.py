@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.matching import tokenize
+
+
+def index_open_rows(apps, schema_editor):
+    MatchToken = apps.get_model('core', 'MatchToken')
+    FoodDonation = apps.get_model('core', 'FoodDonation')
+    FoodRequest = apps.get_model('core', 'FoodRequest')
+    rows = []
+    for donation in FoodDonation.objects.filter(is_available=True, is_accepted=False).iterator():
+        rows.extend(
+            MatchToken(token=token, food_donation_id=donation.id)
+            for token in tokenize(donation.food_type, donation.description)
+        )
+    for food_request in FoodRequest.objects.filter(status='PENDING').iterator():
+        rows.extend(
+            MatchToken(token=token, food_request_id=food_request.id)
+            for token in tokenize(food_request.food_type, food_request.description)
+        )
+    MatchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_geocoded_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('food_donation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='match_tokens', to='core.fooddonation')),
+                ('food_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='match_tokens', to='core.foodrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'food_donation'], name='match_token_donation_idx'), models.Index(fields=['token', 'food_request'], name='match_token_request_idx')],
+            },
+        ),
+        migrations.RunPython(index_open_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_matchtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodrequest',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('ACCEPTED', 'Accepted'), ('FULFILLED', 'Fulfilled'), ('CANCELLED', 'Cancelled'), ('EXPIRED', 'Expired')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['is_available', 'expiry_date'], name='donation_available_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['status', 'required_timing'], name='request_status_timing_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='fooddonation',
+            name='donation_available_expiry_idx',
+        ),
+        migrations.AddIndex(
+            model_name='collaboration',
+            index=models.Index(fields=['donor', 'collaboration_date'], name='collab_donor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collaboration',
+            index=models.Index(fields=['ngo', 'collaboration_date'], name='collab_ngo_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collaboration',
+            index=models.Index(fields=['donor', 'status', 'completion_date'], name='collab_donor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collaboration',
+            index=models.Index(fields=['ngo', 'status', 'completion_date'], name='collab_ngo_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['expiry_date'], name='donation_available_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['posted_at'], name='donation_available_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['donor', 'posted_at'], name='donation_donor_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['status', 'requested_at'], name='request_status_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['requester', 'requested_at'], name='request_requester_idx'),
+        ),
+    ]
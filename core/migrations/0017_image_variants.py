@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventplannerprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the profile picture, see core.images'),
+        ),
+        migrations.AddField(
+            model_name='fooddonation',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the image, see core.images'),
+        ),
+        migrations.AddField(
+            model_name='ngoprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the profile picture, see core.images'),
+        ),
+        migrations.AddField(
+            model_name='restaurantprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the profile picture, see core.images'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the profile picture, see core.images'),
+        ),
+    ]
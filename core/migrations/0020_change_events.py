@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:50
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('donation.posted', 'Donation posted'), ('donation.withdrawn', 'Donation withdrawn'), ('collaboration.status', 'Collaboration status changed')], max_length=30)),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('audience_role', models.CharField(blank=True, help_text='Every user with this role receives the event', max_length=50)),
+                ('user_ids', models.JSONField(blank=True, default=list, help_text='Users receiving the event whatever their role')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_change_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['latitude', 'longitude'], name='donation_lat_lon_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['latitude', 'longitude'], name='request_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_geo_bounding_box_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooddonation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last saved, see core.conditional'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last saved, see core.conditional'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,5 +1,59 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
+from django.utils import timezone
+
+from . import fragments
+
+
+def current_month_start():
+    """Start of the current month, which the monthly Analysis counters cover"""
+    return timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def badge_level_for(role, people_served=0, donations_made=0):
+    """Badge level earned in a month from that month's performance"""
+    # For NGOs: based on people served
+    if role == 'NGO':
+        if people_served >= 1700:
+            return 'DIAMOND'
+        elif people_served >= 1500:
+            return 'GOLD'
+        elif people_served >= 1000:
+            return 'SILVER'
+        elif people_served >= 500:
+            return 'BRONZE'
+    # For Restaurants and Event Planners: based on donations made
+    else:
+        if donations_made >= 20:
+            return 'DIAMOND'
+        elif donations_made >= 15:
+            return 'GOLD'
+        elif donations_made >= 10:
+            return 'SILVER'
+        elif donations_made >= 5:
+            return 'BRONZE'
+    return None
+
+
+class FoodDonationQuerySet(models.QuerySet):
+    def open(self):
+        """Donations that can still be claimed: available and not yet expired"""
+        return self.filter(is_available=True, expiry_date__gt=timezone.now())
+
+    def expired(self, now=None):
+        """Available donations whose expiry date has passed"""
+        return self.filter(is_available=True, expiry_date__lte=now or timezone.now())
+
+
+class FoodRequestQuerySet(models.QuerySet):
+    def open(self):
+        """Pending requests whose required timing is still ahead"""
+        return self.filter(status='PENDING', required_timing__gt=timezone.now())
+
+    def stale(self, now=None):
+        """Pending requests whose required timing has passed"""
+        return self.filter(status='PENDING', required_timing__lte=now or timezone.now())
 
 class FoodDonation(models.Model):
     donor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='food_donations')
@@ -9,16 +63,35 @@ class FoodDonation(models.Model):
     expiry_date = models.DateTimeField()
     location = models.CharField(max_length=255)
     image = models.ImageField(upload_to='food_donations/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of the image, see core.images")
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from location when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from location when saved")
+    geo_cell = models.PositiveIntegerField(null=True, blank=True, db_index=True, help_text="Grid cell of the geocoded location, see core.geo")
     posted_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last saved, see core.conditional")
     is_accepted = models.BooleanField(default=False)
     is_available = models.BooleanField(default=True)
 
+    objects = FoodDonationQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.food_type} by {self.donor.username}"
 
     class Meta:
         # Ensure fresh data is always fetched
         ordering = ['-posted_at']
+        indexes = [
+            # Partial on is_available: SQLite only uses an index for a bare
+            # boolean filter when it matches the index condition exactly
+            # Open feed filter and the expiry sweeper
+            models.Index(fields=['expiry_date'], name='donation_available_expiry_idx', condition=models.Q(is_available=True)),
+            # Donation feed, newest first
+            models.Index(fields=['posted_at'], name='donation_available_posted_idx', condition=models.Q(is_available=True)),
+            # Donor dashboards and per-donor tier windows
+            models.Index(fields=['donor', 'posted_at'], name='donation_donor_posted_idx'),
+            # Nearby donations over a radius too wide for the grid (core.geo)
+            models.Index(fields=['latitude', 'longitude'], name='donation_lat_lon_idx'),
+        ]
 
 class FoodRequest(models.Model):
     STATUS_CHOICES = [
@@ -26,6 +99,7 @@ class FoodRequest(models.Model):
         ('ACCEPTED', 'Accepted'),
         ('FULFILLED', 'Fulfilled'),
         ('CANCELLED', 'Cancelled'),
+        ('EXPIRED', 'Expired'),
     ]
     
     requester = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='requests_made')
@@ -33,14 +107,32 @@ class FoodRequest(models.Model):
     quantity_required = models.CharField(max_length=50)
     location = models.CharField(max_length=255)
     required_timing = models.DateTimeField()
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from location when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from location when saved")
+    geo_cell = models.PositiveIntegerField(null=True, blank=True, db_index=True, help_text="Grid cell of the geocoded location, see core.geo")
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     is_fulfilled = models.BooleanField(default=False)
     requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last saved, see core.conditional")
+
+    objects = FoodRequestQuerySet.as_manager()
 
     def __str__(self):
         return f"Request for {self.food_type} by {self.requester.username}"
 
+    class Meta:
+        indexes = [
+            # Open feed filter and the stale request sweeper
+            models.Index(fields=['status', 'required_timing'], name='request_status_timing_idx'),
+            # Request feed, newest first
+            models.Index(fields=['status', 'requested_at'], name='request_status_requested_idx'),
+            # NGO dashboard, own requests newest first
+            models.Index(fields=['requester', 'requested_at'], name='request_requester_idx'),
+            # Nearby requests over a radius too wide for the grid (core.geo)
+            models.Index(fields=['latitude', 'longitude'], name='request_lat_lon_idx'),
+        ]
+
 class Collaboration(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -59,6 +151,16 @@ class Collaboration(models.Model):
     people_served = models.PositiveIntegerField(null=True, blank=True, help_text="Number of people served when donation is completed")
     completion_date = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard collaboration lists, newest first
+            models.Index(fields=['donor', 'collaboration_date'], name='collab_donor_date_idx'),
+            models.Index(fields=['ngo', 'collaboration_date'], name='collab_ngo_date_idx'),
+            # Status filtered lists and completed history
+            models.Index(fields=['donor', 'status', 'completion_date'], name='collab_donor_status_idx'),
+            models.Index(fields=['ngo', 'status', 'completion_date'], name='collab_ngo_status_idx'),
+        ]
+
     def __str__(self):
         return f"Collaboration between {self.donor.username} and {self.ngo.username}"
 
@@ -80,9 +182,68 @@ class Analysis(models.Model):
     monthly_people_served = models.PositiveIntegerField(default=0, help_text="Number of people served in current month")
     monthly_donations_made = models.PositiveIntegerField(default=0, help_text="Number of donations made in current month")
     badge_level = models.CharField(max_length=20, blank=True, null=True, help_text="Current badge level based on monthly performance")
+    stats_month = models.DateField(null=True, blank=True, help_text="First day of the month the monthly counters refer to")
+
+    MONTHLY_FIELDS = ('monthly_people_served', 'monthly_donations_made')
 
     def __str__(self):
         return f"Analysis for {self.user.username}"
+
+    @classmethod
+    def bump(cls, user, when=None, **deltas):
+        """
+        Atomically add `deltas` to the counters of `user` with in-database
+        increments. Deltas for monthly_* counters are only applied when
+        `when` (default: now) falls in the current month.
+        """
+        from django.db.models import F
+        from django.db.models.functions import Greatest
+
+        month_start = current_month_start()
+        analysis, created = cls.objects.get_or_create(
+            user=user, defaults={'stats_month': month_start.date()}
+        )
+        analysis.roll_over_month()
+
+        if when is not None and when < month_start:
+            deltas = {f: d for f, d in deltas.items() if f not in cls.MONTHLY_FIELDS}
+        deltas = {f: d for f, d in deltas.items() if d}
+        if not deltas:
+            return analysis
+
+        cls.objects.filter(pk=analysis.pk).update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        })
+        analysis.refresh_from_db(fields=list(deltas))
+
+        # Badge levels only depend on the monthly counters
+        if any(f in cls.MONTHLY_FIELDS for f in deltas):
+            badge_level = analysis.get_badge_level()
+            if badge_level != analysis.badge_level:
+                analysis.badge_level = badge_level
+                analysis.save(update_fields=['badge_level'])
+        return analysis
+
+    def roll_over_month(self):
+        """Reset the monthly counters once they belong to a past month"""
+        month = current_month_start().date()
+        if self.stats_month == month:
+            return False
+        reset = Analysis.objects.filter(pk=self.pk).exclude(stats_month=month).update(
+            monthly_people_served=0,
+            monthly_donations_made=0,
+            badge_level=None,
+            stats_month=month,
+        )
+        if reset:
+            # update() sends no post_save, so the cached badge and counters
+            # of the user's dashboard are invalidated here
+            fragments.bump_users(self.user_id)
+        self.monthly_people_served = 0
+        self.monthly_donations_made = 0
+        self.badge_level = None
+        self.stats_month = month
+        return True
     
     def recalculate_total_people_served(self):
         """Recalculate total people served from completed collaborations"""
@@ -97,64 +258,200 @@ class Analysis(models.Model):
         return total
     
     def recalculate_monthly_people_served(self):
-        """Recalculate people served in current month from completed collaborations"""
-        from django.db.models import Sum
-        from datetime import datetime, date
-        from django.utils import timezone
-        
+        """Recalculate people served in current month from the monthly rollup"""
         now = timezone.now()
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        monthly_total = Collaboration.objects.filter(
-            ngo=self.user,
-            status='COMPLETED',
-            people_served__isnull=False,
-            completion_date__gte=start_of_month
-        ).aggregate(total=Sum('people_served'))['total'] or 0
+        impact = MonthlyImpact.for_month(self.user, start_of_month)
+        monthly_total = impact.people_served if impact else 0
         
         self.monthly_people_served = monthly_total
+        self.stats_month = start_of_month.date()
         self.save()
         return monthly_total
     
     def recalculate_monthly_donations_made(self):
-        """Recalculate donations made in current month"""
-        from django.utils import timezone
-        
+        """Recalculate donations made in current month from the monthly rollup"""
         now = timezone.now()
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        monthly_count = FoodDonation.objects.filter(
-            donor=self.user,
-            posted_at__gte=start_of_month
-        ).count()
+        impact = MonthlyImpact.for_month(self.user, start_of_month)
+        monthly_count = impact.donations_made if impact else 0
         
         self.monthly_donations_made = monthly_count
+        self.stats_month = start_of_month.date()
         self.save()
         return monthly_count
     
     def get_badge_level(self):
         """Get badge level based on monthly performance"""
-        # For NGOs: based on people served
-        if hasattr(self.user, 'role') and self.user.role == self.user.Role.NGO:
-            if self.monthly_people_served >= 1700:
-                return 'DIAMOND'
-            elif self.monthly_people_served >= 1500:
-                return 'GOLD'
-            elif self.monthly_people_served >= 1000:
-                return 'SILVER'
-            elif self.monthly_people_served >= 500:
-                return 'BRONZE'
-        # For Restaurants and Event Planners: based on donations made
-        else:
-            if self.monthly_donations_made >= 20:
-                return 'DIAMOND'
-            elif self.monthly_donations_made >= 15:
-                return 'GOLD'
-            elif self.monthly_donations_made >= 10:
-                return 'SILVER'
-            elif self.monthly_donations_made >= 5:
-                return 'BRONZE'
-        return None
+        return badge_level_for(
+            getattr(self.user, 'role', None),
+            people_served=self.monthly_people_served,
+            donations_made=self.monthly_donations_made,
+        )
+
+class MonthlyImpact(models.Model):
+    """Per-user rollup of donations, collaborations and people served in one calendar month"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='monthly_impact')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    donations_made = models.PositiveIntegerField(default=0)
+    collaborations_completed = models.PositiveIntegerField(default=0)
+    people_served = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('donations_made', 'collaborations_completed', 'people_served')
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year', 'month'], name='unique_monthly_impact'),
+        ]
+
+    def __str__(self):
+        return f"Impact for {self.user.username} in {self.year}-{self.month:02d}"
+
+    @property
+    def month_start(self):
+        from datetime import date
+        return date(self.year, self.month, 1)
+
+    def get_badge_level(self, role):
+        """Badge level earned in this month"""
+        return badge_level_for(role, people_served=self.people_served, donations_made=self.donations_made)
+
+    @classmethod
+    def record(cls, user, when, **deltas):
+        """Atomically add `deltas` to the rollup row of the month containing `when`"""
+        from django.db.models import F
+        from django.db.models.functions import Greatest
+
+        deltas = {f: d for f, d in deltas.items() if d}
+        if not deltas or when is None:
+            return
+        when = timezone.localtime(when) if timezone.is_aware(when) else when
+        impact, created = cls.objects.get_or_create(user=user, year=when.year, month=when.month)
+        cls.objects.filter(pk=impact.pk).update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        })
+
+    @classmethod
+    def for_month(cls, user, when):
+        """Rollup row for the month containing `when`, or None"""
+        return cls.objects.filter(user=user, year=when.year, month=when.month).first()
+
+    @classmethod
+    def history(cls, user, months=6):
+        """
+        The last `months` months for `user`, newest first, in a single query.
+        Months without activity are filled in with empty rows.
+        """
+        now = current_month_start()
+        keys = []
+        year, month = now.year, now.month
+        for _ in range(months):
+            keys.append((year, month))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        oldest_year, oldest_month = keys[-1]
+        rows = cls.objects.filter(user=user).filter(
+            models.Q(year__gt=oldest_year) | models.Q(year=oldest_year, month__gte=oldest_month)
+        )
+        by_month = {(row.year, row.month): row for row in rows}
+        history = []
+        for year, month in keys:
+            row = by_month.get((year, month)) or cls(user=user, year=year, month=month)
+            row.badge_level = row.get_badge_level(user.role)
+            history.append(row)
+        return history
+
+class MatchToken(models.Model):
+    """Inverted index entry linking a normalized token to an open donation or request"""
+    token = models.CharField(max_length=50)
+    food_donation = models.ForeignKey(FoodDonation, on_delete=models.CASCADE, null=True, blank=True, related_name='match_tokens')
+    food_request = models.ForeignKey(FoodRequest, on_delete=models.CASCADE, null=True, blank=True, related_name='match_tokens')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'food_donation'], name='match_token_donation_idx'),
+            models.Index(fields=['token', 'food_request'], name='match_token_request_idx'),
+        ]
+
+    def __str__(self):
+        return self.token
+
+class Task(models.Model):
+    """Deferred function call, run by the run_worker command, see core.tasks"""
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200, help_text="Dotted path of the @task function")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not run before this time")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker started the current attempt")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers polling for due and lost tasks
+            models.Index(fields=['status', 'run_at'], name='task_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+class ChangeEvent(models.Model):
+    """Change pushed to open dashboards through the /events/ stream, see core.events"""
+    DONATION_POSTED = 'donation.posted'
+    DONATION_WITHDRAWN = 'donation.withdrawn'
+    COLLABORATION_STATUS = 'collaboration.status'
+    KIND_CHOICES = [
+        (DONATION_POSTED, 'Donation posted'),
+        (DONATION_WITHDRAWN, 'Donation withdrawn'),
+        (COLLABORATION_STATUS, 'Collaboration status changed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    audience_role = models.CharField(max_length=50, blank=True, help_text="Every user with this role receives the event")
+    user_ids = models.JSONField(default=list, blank=True, help_text="Users receiving the event whatever their role")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+class DonorTier(models.Model):
+    """Donation-frequency tier of a donor, recomputed in bulk by core.tiers"""
+    TIER_CHOICES = [
+        ('GOLD', 'Gold'),
+        ('PLATINUM', 'Platinum'),
+        ('SILVER', 'Silver'),
+    ]
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='donor_tier')
+    tier = models.CharField(max_length=20, choices=TIER_CHOICES, null=True, blank=True)
+    tier_label = models.CharField(max_length=100)
+    rank = models.PositiveIntegerField(db_index=True, help_text="Position on the donor leaderboard, 1 is best")
+    donation_count = models.PositiveIntegerField(default=0, help_text="Recent donations considered, at most 10")
+    avg_days_between = models.FloatField(null=True, blank=True)
+    last_donation_at = models.DateTimeField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"{self.tier or 'No tier'} for {self.user.username}"
 
 # Separate profile models for each user type
 class RestaurantProfile(models.Model):
@@ -162,7 +459,10 @@ class RestaurantProfile(models.Model):
     restaurant_name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     contact_number = models.CharField(max_length=20)
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
     profile_picture = models.ImageField(upload_to='restaurant_profile_pics/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of the profile picture, see core.images")
     cuisine_type = models.CharField(max_length=100, blank=True)
     description = models.TextField(blank=True)
     operating_hours = models.CharField(max_length=100, blank=True)
@@ -175,7 +475,10 @@ class NGOProfile(models.Model):
     organization_name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     contact_number = models.CharField(max_length=20)
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
     profile_picture = models.ImageField(upload_to='ngo_profile_pics/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of the profile picture, see core.images")
     mission_statement = models.TextField(blank=True)
     description = models.TextField(blank=True)
     target_beneficiaries = models.CharField(max_length=255, blank=True)
@@ -188,7 +491,10 @@ class EventPlannerProfile(models.Model):
     company_name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     contact_number = models.CharField(max_length=20)
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
     profile_picture = models.ImageField(upload_to='eventplanner_profile_pics/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of the profile picture, see core.images")
     specialization = models.CharField(max_length=255, blank=True)
     description = models.TextField(blank=True)
     years_of_experience = models.PositiveIntegerField(default=0)
@@ -201,7 +507,10 @@ class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='userprofile')
     address = models.CharField(max_length=255)
     contact_number = models.CharField(max_length=20)
+    latitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
+    longitude = models.FloatField(null=True, blank=True, help_text="Geocoded from address when saved")
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of the profile picture, see core.images")
     organization_name = models.CharField(max_length=255, blank=True)
     description = models.TextField(blank=True)
 
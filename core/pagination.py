@@ -0,0 +1,115 @@
+import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """One page of a feed ordered newest first on (timestamp, id)"""
+
+    def __init__(self, items, next_cursor, page_size, cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (timestamp, pk), or None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, TypeError):
+        return None
+    if timestamp is None:
+        return None
+    return timestamp, pk
+
+
+def get_page_size(request, maximum=None):
+    """Page size from ?page_size=, clamped to `maximum` (default FEED_MAX_PAGE_SIZE)"""
+    if maximum is None:
+        maximum = settings.FEED_MAX_PAGE_SIZE
+    try:
+        size = int(request.GET.get('page_size', settings.FEED_PAGE_SIZE))
+    except ValueError:
+        size = settings.FEED_PAGE_SIZE
+    return max(1, min(size, maximum))
+
+
+def keyset_filter(queryset, timestamp_field, cursor=None):
+    """
+    Order `queryset` newest first on (timestamp_field, id) and keep the rows
+    after `cursor`. Returns the queryset and the decoded position, which is
+    None when there is no valid cursor.
+    """
+    queryset = queryset.order_by(f'-{timestamp_field}', '-id')
+    position = decode_cursor(cursor)
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{timestamp_field}__lt': timestamp}) |
+            Q(**{timestamp_field: timestamp, 'id__lt': pk})
+        )
+    return queryset, position
+
+
+def keyset_paginate(queryset, timestamp_field, cursor=None, page_size=None):
+    """
+    Return the page of `queryset` that follows `cursor`, newest first.
+
+    Rows are ordered on (timestamp_field, id) and the next page is selected
+    with a range condition on that pair, so every page costs the same
+    regardless of how deep into the feed it is.
+    """
+    if page_size is None:
+        page_size = settings.FEED_PAGE_SIZE
+    queryset, position = keyset_filter(queryset, timestamp_field, cursor)
+    if position is None:
+        cursor = None
+
+    # Fetch one extra row to learn whether another page exists
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_field), last.pk)
+    return KeysetPage(items, next_cursor, page_size, cursor)
+
+
+def paginate_feed(request, queryset, timestamp_field):
+    """Paginate a feed from the ?cursor= and ?page_size= query parameters"""
+    return keyset_paginate(
+        queryset,
+        timestamp_field,
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request),
+    )
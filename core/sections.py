@@ -0,0 +1,130 @@
+"""
+Concurrent loading of the independent sections of a dashboard.
+
+A dashboard shows half a dozen unrelated lists (donations, requests,
+collaborations, analysis, directory...). Queried one after another their
+latencies add up, which hurts most against a remote database.
+load_sections() runs the loader of every section at once in a small
+thread pool, each thread on its own database connection, so the page
+waits about as long as its slowest section. Like those of request
+threads, pool connections are kept for CONN_MAX_AGE, and reused by the
+sections of later requests.
+
+Django's async ORM runs every query of a request on the same thread, one
+after another, so the concurrency has to come from the pool.
+
+A section rendered inside a {% cached_fragment %} names it: while the
+fragment is cached its loader doesn't run, and the template gets a lazy
+value that only queries should the fragment expire before it renders.
+
+Inside a transaction (ATOMIC_REQUESTS, tests) the other connections
+could not see its uncommitted rows, so the sections are then loaded one
+after another on the request's connection.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connection
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
+
+from grace_bites_project.middleware import current_timer
+
+from . import fragments
+
+_executor = None
+
+
+class Section:
+    """
+    A dashboard section: `load` returns its fully evaluated value (lists,
+    not lazy querysets, so that the queries run in the pool). `fragment`
+    and `scopes` are those of the {% cached_fragment %} showing it, if any.
+    """
+
+    def __init__(self, load, fragment=None, scopes=('user',)):
+        self.load = load
+        self.fragment = fragment
+        self.scopes = scopes
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DASHBOARD_QUERY_THREADS, thread_name_prefix='dashboard',
+        )
+    return _executor
+
+
+def authenticated_user(request):
+    """The logged-in user or None. Loads the session, which async code may not do directly."""
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def async_login_required(view):
+    """login_required for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await sync_to_async(authenticated_user)(request) is None:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _plan(user, sections):
+    """Names of the sections shown by a cached fragment, and whether the request is in a transaction"""
+    shown_by = {}
+    for name, section in sections.items():
+        if section.fragment:
+            fragment, scopes = fragments.for_user(section.fragment, section.scopes, user)
+            shown_by[fragment, tuple(scopes)] = name
+    cached = fragments.cached(list(shown_by))
+    return {shown_by[fragment] for fragment in cached}, connection.in_atomic_block
+
+
+def _load_in_pool(load):
+    # What request_started and request_finished do for request threads:
+    # drop the connection once it is past CONN_MAX_AGE or unusable
+    close_old_connections()
+    # Run in a copy of the request's context, so its timer (if sampled)
+    # counts the section's queries too
+    timer = current_timer.get()
+    try:
+        with connection.execute_wrapper(timer) if timer else nullcontext():
+            return load()
+    finally:
+        close_old_connections()
+
+
+def _load_in_order(loads):
+    return {name: load() for name, load in loads.items()}
+
+
+async def load_sections(user, sections):
+    """Context values of `sections` (a dict of Section), loaded concurrently"""
+    cached, in_transaction = await sync_to_async(_plan)(user, sections)
+    values = {name: SimpleLazyObject(sections[name].load) for name in cached}
+    loads = {name: section.load for name, section in sections.items() if name not in cached}
+    if in_transaction or len(loads) < 2:
+        values.update(await sync_to_async(_load_in_order)(loads))
+        return values
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(get_executor(), contextvars.copy_context().run, _load_in_pool, load)
+        for load in loads.values()
+    ))
+    values.update(zip(loads, results))
+    return values
+
+
+async def render_async(request, template_name, context):
+    # Rendering can still query (lazy values) and reads the fragment cache
+    return await sync_to_async(render)(request, template_name, context)
@@ -0,0 +1,243 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import events, fragments
+from .geo import apply_geocode
+from .images import queue_variants
+from .matching import index_donation, index_request
+from .tasks import task
+from .models import (
+    Analysis, ChangeEvent, Collaboration, EventPlannerProfile, FoodDonation, FoodRequest,
+    MonthlyImpact, NGOProfile, RestaurantProfile, UserProfile,
+)
+
+
+@receiver(post_save, sender=FoodDonation)
+def count_new_donation(sender, instance, created, **kwargs):
+    """Count a newly posted donation towards the donor's totals"""
+    if created:
+        Analysis.bump(
+            instance.donor,
+            when=instance.posted_at,
+            food_donated_count=1,
+            monthly_donations_made=1,
+        )
+        MonthlyImpact.record(instance.donor, instance.posted_at, donations_made=1)
+
+
+@receiver(post_delete, sender=FoodDonation)
+def uncount_deleted_donation(sender, instance, origin=None, **kwargs):
+    """Take a removed donation back out of the donor's totals"""
+    if getattr(origin, 'model', type(origin)) is not FoodDonation:
+        # Cascaded from deleting the donor, whose counters go with them
+        return
+    Analysis.bump(
+        instance.donor,
+        when=instance.posted_at,
+        food_donated_count=-1,
+        monthly_donations_made=-1,
+    )
+    MonthlyImpact.record(instance.donor, instance.posted_at, donations_made=-1)
+
+
+@receiver(pre_save, sender=Collaboration)
+def detect_collaboration_completion(sender, instance, **kwargs):
+    """Remember the stored status, and flag collaborations moving to COMPLETED"""
+    instance._previous_status = None
+    if instance.pk is not None:
+        instance._previous_status = (
+            Collaboration.objects.filter(pk=instance.pk)
+            .values_list('status', flat=True)
+            .first()
+        )
+    instance._just_completed = (
+        instance.status == 'COMPLETED' and instance._previous_status != 'COMPLETED'
+    )
+
+
+@receiver(post_save, sender=Collaboration)
+def count_completed_collaboration(sender, instance, **kwargs):
+    """Credit both sides of a collaboration once it is completed"""
+    if not getattr(instance, '_just_completed', False):
+        return
+    instance._just_completed = False
+    record_completion.delay(instance.pk)
+
+
+@task
+def record_completion(collaboration_id):
+    """Analysis and MonthlyImpact counters of a completed collaboration"""
+    instance = Collaboration.objects.select_related('donor', 'ngo').filter(pk=collaboration_id).first()
+    if instance is None:
+        return
+
+    Analysis.bump(
+        instance.donor,
+        ngos_helped_count=1,
+        collaborations_count=1,
+    )
+    people_served = instance.people_served or 0
+    completed_at = instance.completion_date or timezone.now()
+    Analysis.bump(
+        instance.ngo,
+        when=completed_at,
+        requests_fulfilled_count=1,
+        total_people_served=people_served,
+        monthly_people_served=people_served,
+    )
+
+    MonthlyImpact.record(instance.donor, completed_at, collaborations_completed=1)
+    MonthlyImpact.record(
+        instance.ngo,
+        completed_at,
+        collaborations_completed=1,
+        people_served=people_served,
+    )
+    # Counted after the save signals invalidated the dashboards
+    fragments.bump_users(instance.donor_id, instance.ngo_id)
+
+
+@receiver(pre_save, sender=FoodDonation)
+@receiver(pre_save, sender=FoodRequest)
+def geocode_location(sender, instance, **kwargs):
+    """Geocode the free-text location once, at save time"""
+    apply_geocode(instance, instance.location)
+
+
+@receiver(pre_save, sender=RestaurantProfile)
+@receiver(pre_save, sender=NGOProfile)
+@receiver(pre_save, sender=EventPlannerProfile)
+@receiver(pre_save, sender=UserProfile)
+def geocode_address(sender, instance, **kwargs):
+    """Geocode the profile address once, at save time"""
+    apply_geocode(instance, instance.address)
+
+
+@receiver(post_save, sender=FoodDonation)
+def index_donation_tokens(sender, instance, **kwargs):
+    """Keep the donation in the matching index while it is available"""
+    index_donation(instance)
+
+
+@receiver(post_save, sender=FoodRequest)
+def index_request_tokens(sender, instance, **kwargs):
+    """Keep the request in the matching index while it is pending"""
+    index_request(instance)
+
+
+@receiver(post_save, sender=FoodDonation)
+def resize_donation_image(sender, instance, **kwargs):
+    """Queue the resizing of a newly uploaded donation photo"""
+    queue_variants(instance, 'image')
+
+
+@receiver(post_save, sender=RestaurantProfile)
+@receiver(post_save, sender=NGOProfile)
+@receiver(post_save, sender=EventPlannerProfile)
+@receiver(post_save, sender=UserProfile)
+def resize_profile_picture(sender, instance, **kwargs):
+    """Queue the resizing of a newly uploaded profile picture"""
+    queue_variants(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=FoodDonation)
+@receiver(post_delete, sender=FoodDonation)
+def invalidate_donation_fragments(sender, instance, **kwargs):
+    """Donor's sections, those of NGOs collaborating on the donation and the feed"""
+    ngo_ids = Collaboration.objects.filter(food_donation=instance).values_list('ngo_id', flat=True)
+    fragments.bump_users(instance.donor_id, *ngo_ids)
+    fragments.bump(fragments.DONATIONS)
+
+
+@receiver(post_save, sender=FoodRequest)
+@receiver(post_delete, sender=FoodRequest)
+def invalidate_request_fragments(sender, instance, **kwargs):
+    """Requester's sections, those of donors collaborating on the request and the feed"""
+    donor_ids = Collaboration.objects.filter(food_request=instance).values_list('donor_id', flat=True)
+    fragments.bump_users(instance.requester_id, *donor_ids)
+    fragments.bump(fragments.REQUESTS)
+
+
+@receiver(post_save, sender=Collaboration)
+@receiver(post_delete, sender=Collaboration)
+def invalidate_collaboration_fragments(sender, instance, **kwargs):
+    fragments.bump_users(instance.donor_id, instance.ngo_id)
+
+
+@receiver(post_save, sender=Analysis)
+@receiver(post_delete, sender=Analysis)
+def invalidate_analysis_fragments(sender, instance, **kwargs):
+    fragments.bump_users(instance.user_id)
+
+
+@receiver(post_save, sender=RestaurantProfile)
+@receiver(post_save, sender=NGOProfile)
+@receiver(post_save, sender=EventPlannerProfile)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=RestaurantProfile)
+@receiver(post_delete, sender=NGOProfile)
+@receiver(post_delete, sender=EventPlannerProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.DIRECTORY)
+    fragments.bump_users(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_directory_on_signup(sender, instance, created, **kwargs):
+    # Not on every save: last_login is updated on each login
+    if created:
+        fragments.bump(fragments.DIRECTORY)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_directory_on_account_deletion(sender, instance, **kwargs):
+    fragments.bump(fragments.DIRECTORY)
+
+
+@receiver(pre_save, sender=FoodDonation)
+def detect_donation_withdrawal(sender, instance, **kwargs):
+    """Flag donations that stop being available in this save"""
+    instance._withdrawn = False
+    # Only withdrawals need the stored value
+    if instance.pk is not None and not instance.is_available:
+        instance._withdrawn = FoodDonation.objects.filter(pk=instance.pk, is_available=True).exists()
+
+
+@receiver(post_save, sender=FoodDonation)
+def publish_donation_change(sender, instance, created, **kwargs):
+    """Tell NGO dashboards about new donations and withdrawn ones"""
+    if created and instance.is_available:
+        kind = ChangeEvent.DONATION_POSTED
+    elif getattr(instance, '_withdrawn', False):
+        kind = ChangeEvent.DONATION_WITHDRAWN
+    else:
+        return
+    events.record(kind, events.donation_data(instance), role=User.Role.NGO, user_ids=[instance.donor_id])
+
+
+@receiver(post_delete, sender=FoodDonation)
+def publish_donation_removal(sender, instance, **kwargs):
+    if instance.is_available:
+        events.record(
+            ChangeEvent.DONATION_WITHDRAWN, events.donation_data(instance),
+            role=User.Role.NGO, user_ids=[instance.donor_id],
+        )
+
+
+@receiver(post_save, sender=Collaboration)
+def publish_collaboration_status(sender, instance, created, **kwargs):
+    """Tell both sides when a collaboration is created or changes status"""
+    previous_status = getattr(instance, '_previous_status', None)
+    if not created and previous_status == instance.status:
+        return
+    events.record(ChangeEvent.COLLABORATION_STATUS, {
+        'id': instance.id,
+        'status': instance.status,
+        'previous_status': previous_status,
+        'food_donation_id': instance.food_donation_id,
+        'food_request_id': instance.food_request_id,
+    }, user_ids=[instance.donor_id, instance.ngo_id])
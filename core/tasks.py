@@ -0,0 +1,221 @@
+"""
+Deferred work stored in the database and run by the run_worker command.
+
+    @task
+    def record_completion(collaboration_id):
+        ...
+
+    record_completion.delay(collaboration.pk)
+
+.delay() stores the call as a Task row, in the caller's transaction, so
+the work only becomes visible to workers once the data it is about has
+been committed. Arguments must be JSON-serializable; pass ids, not model
+instances.
+
+With TASKS_RUN_INLINE (the default), for deployments that have no worker
+process, nothing is queued. A call made while handling a request runs once
+the request's transaction has committed and its response has been sent,
+when the server closes it (InlineTasksMiddleware); elsewhere (commands,
+the shell) it runs right away. The work still takes up the process, and
+on Vercel the function only returns once the response is closed, so the
+client waits for it there. Wherever TASKS_RUN_INLINE is off, the
+run_worker command must be running, or queued tasks never run.
+
+Workers claim due tasks with SELECT ... FOR UPDATE SKIP LOCKED where the
+database supports it, and with a conditional UPDATE per task elsewhere
+(SQLite). Failed tasks are retried with exponential backoff, up to
+max_attempts, and are then kept as FAILED for inspection. Atomic tasks
+(the default) delete their row in the transaction that does their work,
+so their database writes happen exactly once even if a worker dies.
+"""
+import json
+import logging
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Inline calls of the request being handled, see InlineTasksMiddleware
+deferred_calls = ContextVar('deferred_calls', default=None)
+
+
+def task(func=None, *, max_attempts=None, atomic=True, unique=False):
+    """
+    Give `func` a .delay() that queues the call. Non-atomic tasks (e.g.
+    long file processing) run outside a transaction and must be safe to
+    run more than once.
+
+    A unique call is not queued again while the same call (same arguments)
+    is still queued, and is not started while the same call is running:
+    the queued one will see whatever changed since.
+    """
+    def decorate(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_atomic = atomic
+        func.task_unique = unique
+
+        def delay(*args, **kwargs):
+            if settings.TASKS_RUN_INLINE:
+                defer(func, list(args), kwargs)
+                return None
+            if unique and same_call(func.task_name, list(args), kwargs).filter(status=Task.QUEUED).exists():
+                return None
+            return Task.objects.create(
+                name=func.task_name,
+                args=list(args),
+                kwargs=kwargs,
+                max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+            )
+
+        func.delay = delay
+        return func
+
+    return decorate(func) if func is not None else decorate
+
+
+def defer(func, args, kwargs):
+    """Run an inline call after the response of the current request, or now outside one"""
+    calls = deferred_calls.get()
+    if calls is None:
+        func(*args, **kwargs)
+        return
+
+    def add():
+        if func.task_unique and (func, args, kwargs) in calls:
+            return
+        calls.append((func, args, kwargs))
+    # Not at all if the transaction making the call is rolled back
+    transaction.on_commit(add)
+
+
+def run_deferred(calls):
+    """Run the inline calls deferred by a request, each failure logged on its own"""
+    for func, args, kwargs in calls:
+        try:
+            if func.task_atomic:
+                with transaction.atomic():
+                    func(*args, **kwargs)
+            else:
+                func(*args, **kwargs)
+        except Exception:
+            logger.exception("Inline task %s failed", func.task_name)
+
+
+class InlineTasksMiddleware:
+    """
+    Collect the task calls made while handling a request with
+    TASKS_RUN_INLINE, and run them once the response is closed, after its
+    content has been sent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        calls = []
+        token = deferred_calls.set(calls)
+        try:
+            response = self.get_response(request)
+        finally:
+            deferred_calls.reset(token)
+        # Run by response.close(), which the server calls once it is sent
+        response._resource_closers.append(lambda: run_deferred(calls))
+        return response
+
+
+def same_call(name, args, kwargs):
+    return Task.objects.filter(name=name, args=args, kwargs=kwargs)
+
+
+def is_unique(name):
+    try:
+        return getattr(import_string(name), 'task_unique', False)
+    except ImportError:
+        # Fails in run(), where it is recorded
+        return False
+
+
+def runnable(candidates):
+    """`candidates` but the unique calls that must wait for the same call to finish first"""
+    selected, calls = [], set()
+    for candidate in candidates:
+        if is_unique(candidate.name):
+            call = (candidate.name, json.dumps([candidate.args, candidate.kwargs], sort_keys=True))
+            if call in calls or same_call(candidate.name, candidate.args, candidate.kwargs).filter(
+                status=Task.RUNNING,
+            ).exclude(pk=candidate.pk).exists():
+                continue
+            calls.add(call)
+        selected.append(candidate)
+    return selected
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt after `attempts` failed ones"""
+    return timedelta(seconds=settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def claim(limit):
+    """
+    Claim up to `limit` due tasks, oldest first, including running ones
+    whose worker seems to have died (claimed over TASK_TIMEOUT ago).
+    """
+    now = timezone.now()
+    lost = now - timedelta(seconds=settings.TASK_TIMEOUT)
+    due = Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, claimed_at__lt=lost)
+    ).order_by('run_at')
+    claimed = []
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            claimed = runnable(due.select_for_update(skip_locked=True)[:limit])
+            Task.objects.filter(pk__in=[t.pk for t in claimed]).update(
+                status=Task.RUNNING, claimed_at=now, attempts=F('attempts') + 1,
+            )
+    else:
+        # No row locks to skip: whichever worker's UPDATE matches first wins
+        for candidate in runnable(due[:limit]):
+            if Task.objects.filter(
+                pk=candidate.pk, status=candidate.status, claimed_at=candidate.claimed_at,
+            ).update(status=Task.RUNNING, claimed_at=now, attempts=F('attempts') + 1):
+                claimed.append(candidate)
+    for t in claimed:
+        t.status = Task.RUNNING
+        t.claimed_at = now
+        t.attempts += 1
+    return claimed
+
+
+def run(claimed):
+    """Run a claimed task, then delete it or schedule its retry. True on success."""
+    # Only while the claim is still ours, see claim()
+    mine = Task.objects.filter(pk=claimed.pk, claimed_at=claimed.claimed_at)
+    try:
+        func = import_string(claimed.name)
+        if getattr(func, 'task_atomic', True):
+            with transaction.atomic():
+                func(*claimed.args, **claimed.kwargs)
+                if not mine.delete()[0]:
+                    # Taken over by another worker, which will redo the work
+                    transaction.set_rollback(True)
+        else:
+            func(*claimed.args, **claimed.kwargs)
+            mine.delete()
+    except Exception as e:
+        logger.exception("Task %s failed (attempt %d of %d)", claimed, claimed.attempts, claimed.max_attempts)
+        changes = {'claimed_at': None, 'last_error': f'{type(e).__name__}: {e}'}
+        if claimed.attempts >= claimed.max_attempts:
+            changes['status'] = Task.FAILED
+        else:
+            changes.update(status=Task.QUEUED, run_at=timezone.now() + retry_delay(claimed.attempts))
+        mine.update(**changes)
+        return False
+    return True
@@ -0,0 +1,46 @@
+from django import template
+
+from core.fragments import for_user, get_or_render
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, scopes):
+        self.nodelist = nodelist
+        self.name = name
+        self.scopes = scopes
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        scopes = [scope.resolve(context) for scope in self.scopes]
+        if 'user' in scopes:
+            request = context.get('request')
+            user = getattr(request, 'user', None)
+            if user is None or not user.is_authenticated:
+                return self.nodelist.render(context)
+            name, scopes = for_user(name, scopes, user)
+        return get_or_render(name, scopes, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    Cache the enclosed template until one of the listed scopes changes:
+
+        {% cached_fragment "ngo_dashboard.collaborations" "user" %}
+            ...
+        {% endcached_fragment %}
+
+    "user" stands for the scope of the viewing user, see core.fragments.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and at least one scope")
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,49 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.images import VARIANT_FORMATS, variants_are_current, variants_field
+
+register = template.Library()
+
+# Food cards are at most ~320px wide, full width on phones
+DEFAULT_SIZES = '(max-width: 600px) 100vw, 320px'
+# Width of the JPEG served to browsers without srcset support
+FALLBACK_WIDTH = 480
+
+
+def _srcset(storage, names):
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in names)
+
+
+@register.simple_tag
+def responsive_image(image, sizes=DEFAULT_SIZES, **attrs):
+    """
+    <picture> for an uploaded image with a WebP and a JPEG srcset of its
+    resized variants (core.images), or a plain <img> of the original
+    while there are none:
+
+        {% responsive_image donation.image alt=donation.food_type class="food-image" %}
+    """
+    if not image:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    attributes = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+
+    variants = getattr(image.instance, variants_field(image.field.name), None)
+    if not variants_are_current(image, variants):
+        return format_html('<img src="{}"{}>', image.url, attributes)
+
+    storage = image.storage
+    by_format = {
+        ext: sorted((int(width), name) for width, name in variants[ext].items())
+        for ext in VARIANT_FORMATS
+    }
+    jpegs = by_format['jpeg']
+    fallback = next((name for width, name in jpegs if width >= FALLBACK_WIDTH), jpegs[-1][1])
+    return format_html(
+        '<picture><source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        VARIANT_FORMATS['webp'][1], _srcset(storage, by_format['webp']), sizes,
+        storage.url(fallback), _srcset(storage, jpegs), sizes, attributes,
+    )
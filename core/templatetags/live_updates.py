@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def live_updates(context):
+    """
+    <script> subscribing the page to the live update stream (core.events),
+    left out under WSGI unless EVENTS_WSGI_POLLING is on:
+
+        {% block scripts %}{% live_updates %}{% endblock %}
+    """
+    request = context.get('request')
+    if not isinstance(request, ASGIRequest) and not settings.EVENTS_WSGI_POLLING:
+        return ''
+    return format_html(
+        '<script src="{}" data-events-url="{}"></script>',
+        static('js/live_updates.js'), reverse('event_stream'),
+    )
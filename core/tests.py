@@ -1,3 +1,1269 @@
-from django.test import TestCase
+import base64
+import csv
+import importlib.util
+import io
+import json
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from grace_bites_project.middleware import RequestTimer, current_timer
+
+from . import events, fragments, sections, tasks
+from .geo import cells_within, nearby
+from .management.commands.seed_scale import DELETE_RECEIVERS, disconnected
+from .matching import suggest_donations_for_ngo, suggest_requests_for_donor
+from .models import (
+    Analysis, ChangeEvent, Collaboration, DonorTier, FoodDonation, FoodRequest, MonthlyImpact,
+    MatchToken, NGOProfile, RestaurantProfile, Task, UserProfile, current_month_start,
+)
+from .pagination import encode_cursor
+from .sections import Section, load_sections
+from .tasks import InlineTasksMiddleware, task
+from .tiers import LEADERBOARD_VERSION_KEY, compute_donor_tiers, get_leaderboard_page, leaderboard_version
+
+# Calls of the tasks below, see TaskQueueTests
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(unique=True)
+def remember_once(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode(message):
+    raise ValueError(message)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN on every query issued by the dashboards and feeds and fail
+    when one of them falls back to a full table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.restaurants = [
+            User.objects.create_user(f'restaurant{i}', password='pw', role=User.Role.RESTAURANT)
+            for i in range(5)
+        ]
+        cls.ngos = [
+            User.objects.create_user(f'ngo{i}', password='pw', role=User.Role.NGO)
+            for i in range(5)
+        ]
+        cls.eventplanner = User.objects.create_user('planner', password='pw', role=User.Role.EVENTPLANNER)
+        for i, user in enumerate(cls.restaurants):
+            RestaurantProfile.objects.create(
+                user=user, restaurant_name=f'Restaurant {i}', address='Andheri, Mumbai', contact_number='1',
+            )
+        for i, user in enumerate(cls.ngos):
+            NGOProfile.objects.create(
+                user=user, organization_name=f'NGO {i}', address='Bandra, Mumbai', contact_number='1',
+            )
+
+        donors = cls.restaurants + [cls.eventplanner]
+        for i in range(60):
+            donation = FoodDonation.objects.create(
+                donor=donors[i % len(donors)],
+                food_type='rice and dal' if i % 2 else 'bread rolls',
+                quantity='5 kg',
+                description='veg meal',
+                # A third of the rows are already expired
+                expiry_date=now + timedelta(days=2 if i % 3 else -1),
+                location='Mumbai',
+                is_available=i % 5 != 0,
+            )
+            FoodRequest.objects.create(
+                requester=cls.ngos[i % len(cls.ngos)],
+                food_type='rice',
+                quantity_required='3 kg',
+                location='Mumbai',
+                required_timing=now + timedelta(days=1 if i % 3 else -1),
+            )
+            if i % 4 == 0:
+                Collaboration.objects.create(
+                    donor=donation.donor,
+                    ngo=cls.ngos[i % len(cls.ngos)],
+                    food_donation=donation,
+                    status=('PENDING', 'ACTIVE', 'COMPLETED')[i % 3],
+                    completion_date=now if i % 3 == 2 else None,
+                )
+
+    def setUp(self):
+        # Cached dashboard fragments would hide the queries behind them
+        cache.clear()
+
+    def full_scans(self, sql):
+        """Tables read by a full scan in the plan of `sql`"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                # "SCAN t USING INDEX i" is an ordered index walk, a bare "SCAN t" is not
+                return [
+                    row[-1] for row in cursor.fetchall()
+                    if row[-1].startswith('SCAN ') and ' USING ' not in row[-1]
+                ]
+            if connection.vendor == 'postgresql':
+                # Small test tables always favour a sequential scan, so only
+                # report the ones that remain when any index would do
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0].strip() for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+        self.skipTest(f'No query plan check for {connection.vendor}')
+
+    def assertNoFullScans(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        scans = {
+            query['sql']: scans
+            for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            for scans in [self.full_scans(query['sql'])]
+            if scans
+        }
+        self.assertEqual(scans, {}, f'Full table scans while rendering {url}')
+
+    def test_restaurant_dashboard(self):
+        self.assertNoFullScans(self.restaurants[0], reverse('restaurant_dashboard'))
+
+    def test_ngo_dashboard(self):
+        self.assertNoFullScans(self.ngos[0], reverse('ngo_dashboard'))
+
+    def test_eventplanner_dashboard(self):
+        self.assertNoFullScans(self.eventplanner, reverse('eventplanner_dashboard'))
+
+    def test_donation_feed(self):
+        self.assertNoFullScans(self.ngos[0], reverse('view_all_donations'))
+
+    def test_donation_feed_next_page(self):
+        donation = FoodDonation.objects.open().order_by('-posted_at', '-id')[5]
+        cursor = encode_cursor(donation.posted_at, donation.id)
+        self.assertNoFullScans(self.ngos[0], f"{reverse('view_all_donations')}?cursor={cursor}")
+
+    def test_donation_feed_by_distance(self):
+        self.assertNoFullScans(self.ngos[0], f"{reverse('view_all_donations')}?sort=distance")
+        # Too many grid cells, searched by bounding box
+        self.assertNoFullScans(self.ngos[0], f"{reverse('view_all_donations')}?sort=distance&radius=200")
+
+    def test_request_feeds(self):
+        self.assertNoFullScans(self.restaurants[0], reverse('view_all_requests'))
+        self.assertNoFullScans(self.eventplanner, reverse('view_all_requests_from_event'))
+
+    def test_directories(self):
+        self.assertNoFullScans(self.restaurants[0], reverse('view_all_ngos'))
+        self.assertNoFullScans(self.ngos[0], reverse('view_all_restaurants'))
+
+    def test_api_listings(self):
+        self.assertNoFullScans(self.ngos[0], reverse('api_donations'))
+        self.assertNoFullScans(self.ngos[0], reverse('api_requests'))
+        self.assertNoFullScans(self.ngos[0], reverse('api_collaborations'))
+        self.assertNoFullScans(self.restaurants[0], reverse('api_collaborations'))
+        for role in ('restaurants', 'ngos', 'eventplanners'):
+            self.assertNoFullScans(self.ngos[0], reverse('api_directory', args=[role]))
+
+    def test_history_exports(self):
+        self.assertNoFullScans(self.restaurants[0], reverse('export_history', args=['donations']))
+        self.assertNoFullScans(self.restaurants[0], reverse('export_history', args=['collaborations']))
+        self.assertNoFullScans(self.ngos[0], f"{reverse('export_history', args=['requests'])}?format=ndjson")
+        self.assertNoFullScans(self.ngos[0], f"{reverse('export_history', args=['collaborations'])}?since=2020-01-01")
+
+    def test_event_stream(self):
+        self.assertNoFullScans(self.ngos[0], reverse('event_stream'))
+        self.assertNoFullScans(self.ngos[0], f"{reverse('event_stream')}?last_event_id=0")
+
+
+class SessionQueryTests(TestCase):
+    """Page views of a logged-in user don't query django_session while the session is cached"""
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_session(self):
+        user = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        self.client.force_login(user)
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('restaurant_profile'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([q['sql'] for q in queries.captured_queries if 'django_session' in q['sql']], [])
+
+
+class SectionLoadingTests(TransactionTestCase):
+    """Dashboard sections outside a transaction, loaded concurrently by the pool (TestCase never is)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+
+    def test_concurrent_sections(self):
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            values = async_to_sync(load_sections)(self.user, {
+                'usernames': Section(lambda: list(User.objects.values_list('username', flat=True))),
+                'count': Section(User.objects.count),
+                'thread': Section(lambda: threading.current_thread().name),
+            })
+        finally:
+            current_timer.reset(token)
+        self.assertEqual(values['usernames'], ['restaurant'])
+        self.assertEqual(values['count'], 1)
+        self.assertTrue(values['thread'].startswith('dashboard'))
+        # Queries of the pool threads are counted for the request
+        self.assertEqual(timer.queries, 2)
+
+    def test_connections_per_request(self):
+        opened, closed = [], []
+        wrapper_class = type(connections['default'])
+        close = wrapper_class.close
+
+        def record_close(wrapper):
+            closed.append(threading.current_thread().name)
+            close(wrapper)
+
+        def record_open(sender, **kwargs):
+            opened.append(threading.current_thread().name)
+
+        def load():
+            return async_to_sync(load_sections)(self.user, {
+                name: Section(User.objects.count) for name in ('first', 'second', 'third')
+            })
+
+        # Fresh pool threads, connecting with a CONN_MAX_AGE
+        with mock.patch.object(sections, '_executor', None), \
+                mock.patch.dict(connections.settings['default'], CONN_MAX_AGE=60), \
+                mock.patch.object(wrapper_class, 'close', record_close):
+            connection_created.connect(record_open)
+            try:
+                for _ in range(3):
+                    load()
+            finally:
+                connection_created.disconnect(record_open)
+                sections.get_executor().shutdown()
+        # One per pool thread, reused by the following requests
+        self.assertEqual(len(opened), len(set(opened)))
+        self.assertLessEqual(len(opened), settings.DASHBOARD_QUERY_THREADS)
+        self.assertEqual([name for name in closed if name.startswith('dashboard')], [])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('grace_bites.timing'):
+            response = self.client.get(reverse('restaurant_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        # Not just those of the request's own thread (session, user)
+        queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreater(queries, 5)
+
+
+@override_settings(EVENTS_POLL_INTERVAL=0.01, EVENTS_HEARTBEAT_SECONDS=1, EVENTS_MAX_STREAM_SECONDS=5)
+class EventStreamTests(TestCase):
+    """The /events/ change log, polled (WSGI) and streamed through the broadcaster (ASGI)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+
+    def event(self, role=User.Role.NGO):
+        return ChangeEvent.objects.create(kind=ChangeEvent.DONATION_POSTED, data={'id': 1}, audience_role=role)
+
+    def test_poll_waits_for_rows_still_committing(self):
+        first, missing, last = self.event(), self.event(), self.event()
+        missing.delete()
+        # The gap may be a row that commits later: the cursor stays before it
+        self.assertNotIn(f'id: {last.id}', events.poll_once(self.ngo, first.id))
+        # Long enough after, the row is taken to be rolled back
+        ChangeEvent.objects.filter(pk=last.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+        self.assertIn(f'id: {last.id}\nevent: donation.posted', events.poll_once(self.ngo, first.id))
+
+    def test_stream_replays_then_broadcasts(self):
+        missed = self.event()
+        hidden = self.event(User.Role.RESTAURANT)
+
+        async def read():
+            body = events.stream(self.ngo, last_id=missed.id - 1)
+            received = [await anext(body), await anext(body)]
+            live = await ChangeEvent.objects.acreate(
+                kind=ChangeEvent.DONATION_WITHDRAWN, data={'id': 1}, audience_role=User.Role.NGO,
+            )
+            received.append(await anext(body))
+            await body.aclose()
+            # The poller stops once the last stream is gone
+            await events.broadcaster.poller
+            return received, live
+
+        received, live = async_to_sync(read)()
+        self.assertTrue(received[0].startswith('retry:'))
+        self.assertTrue(received[1].startswith(f'id: {missed.id}\nevent: donation.posted'))
+        # Not `hidden`, meant for restaurants
+        self.assertTrue(received[2].startswith(f'id: {live.id}\nevent: donation.withdrawn'))
+        self.assertNotIn(f'id: {hidden.id}', ''.join(received))
+
+    def test_dashboards_subscribe_under_asgi_only(self):
+        self.client.force_login(self.ngo)
+        script = f'data-events-url="{reverse("event_stream")}"'
+        # The test client is WSGI, where subscribing means polling
+        self.assertNotContains(self.client.get(reverse('ngo_dashboard')), script)
+        with override_settings(EVENTS_WSGI_POLLING=True):
+            self.assertContains(self.client.get(reverse('ngo_dashboard')), script)
+        self.async_client.force_login(self.ngo)
+        response = async_to_sync(self.async_client.get)(reverse('ngo_dashboard'))
+        self.assertContains(response, script)
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+class RequestTimingTests(TestCase):
+    """What RequestTimingMiddleware records of a sampled request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_page(self):
+        with self.assertLogs('grace_bites.timing') as logs:
+            response = self.client.get(reverse('restaurant_profile'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertEqual(logs.records[0].path, reverse('restaurant_profile'))
+
+    def test_streamed_response(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertNoLogs('grace_bites.timing'):
+                response = self.client.get(reverse('export_history', args=['donations']))
+            with self.assertLogs('grace_bites.timing') as logs:
+                b''.join(response.streaming_content)
+        self.assertNotIn('Server-Timing', response)
+        # Including the export query, run while the body was sent
+        self.assertEqual(logs.records[0].queries, len(queries))
+
+
+class CounterTests(TestCase):
+    """Analysis and MonthlyImpact counters kept up to date by core.signals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+
+    def donate(self):
+        return FoodDonation.objects.create(
+            donor=self.restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+            expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+        )
+
+    def test_posting_and_deleting_donations(self):
+        donation = self.donate()
+        self.donate()
+        analysis = Analysis.objects.get(user=self.restaurant)
+        self.assertEqual((analysis.food_donated_count, analysis.monthly_donations_made), (2, 2))
+        self.assertEqual(MonthlyImpact.for_month(self.restaurant, timezone.localtime()).donations_made, 2)
+
+        donation.delete()
+        analysis.refresh_from_db()
+        self.assertEqual((analysis.food_donated_count, analysis.monthly_donations_made), (1, 1))
+        self.assertEqual(MonthlyImpact.for_month(self.restaurant, timezone.localtime()).donations_made, 1)
+
+    def test_completing_a_collaboration(self):
+        collaboration = Collaboration.objects.create(
+            donor=self.restaurant, ngo=self.ngo, food_donation=self.donate(),
+        )
+        self.assertFalse(Analysis.objects.filter(user=self.ngo).exists())
+
+        collaboration.status = 'COMPLETED'
+        collaboration.people_served = 40
+        collaboration.completion_date = timezone.now()
+        collaboration.save()
+        # Saving it again doesn't count it twice
+        collaboration.save()
+
+        donor = Analysis.objects.get(user=self.restaurant)
+        self.assertEqual((donor.ngos_helped_count, donor.collaborations_count), (1, 1))
+        ngo = Analysis.objects.get(user=self.ngo)
+        self.assertEqual(
+            (ngo.requests_fulfilled_count, ngo.total_people_served, ngo.monthly_people_served), (1, 40, 40),
+        )
+        impact = MonthlyImpact.for_month(self.ngo, timezone.localtime())
+        self.assertEqual((impact.collaborations_completed, impact.people_served), (1, 40))
+
+    def test_monthly_counters_roll_over(self):
+        self.donate()
+        last_month = current_month_start() - timedelta(days=1)
+        Analysis.objects.filter(user=self.restaurant).update(stats_month=last_month.date())
+        self.donate()
+        analysis = Analysis.objects.get(user=self.restaurant)
+        # Only this month's donation is left in the monthly counter
+        self.assertEqual((analysis.food_donated_count, analysis.monthly_donations_made), (2, 1))
+        self.assertEqual(analysis.stats_month, current_month_start().date())
+
+
+@override_settings(TASKS_RUN_INLINE=False, TASK_RETRY_BACKOFF=30)
+class TaskQueueTests(TestCase):
+    """Tasks queued with .delay(), then claimed and run as run_worker does"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_queued_then_run(self):
+        queued = remember.delay('a')
+        self.assertEqual(calls, [])
+        self.assertEqual((queued.name, queued.args, queued.status), ('core.tests.remember', ['a'], Task.QUEUED))
+
+        claimed = tasks.claim(10)
+        self.assertEqual([t.pk for t in claimed], [queued.pk])
+        self.assertEqual(Task.objects.get(pk=queued.pk).status, Task.RUNNING)
+        # Nothing left to claim
+        self.assertEqual(tasks.claim(10), [])
+
+        self.assertTrue(tasks.run(claimed[0]))
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_RUN_INLINE=True)
+    def test_inline(self):
+        self.assertIsNone(remember.delay('a'))
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_retried_with_backoff_then_failed(self):
+        queued = explode.delay('boom')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(tasks.claim(10)[0]))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), (Task.QUEUED, 1, 'ValueError: boom'))
+        self.assertGreater(queued.run_at, timezone.now() + timedelta(seconds=25))
+        # Not due before the backoff is over
+        self.assertEqual(tasks.claim(10), [])
+
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(tasks.claim(10)[0]))
+        queued.refresh_from_db()
+        # Out of attempts, kept for inspection
+        self.assertEqual((queued.status, queued.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_lost_task_claimed_again(self):
+        remember.delay('a')
+        claimed = tasks.claim(10)[0]
+        Task.objects.filter(pk=claimed.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        reclaimed = tasks.claim(10)[0]
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (claimed.pk, 2))
+        # The first worker's claim is over: its transaction is rolled back, the task kept
+        tasks.run(claimed)
+        self.assertTrue(Task.objects.filter(pk=claimed.pk).exists())
+        self.assertTrue(tasks.run(reclaimed))
+        self.assertFalse(Task.objects.exists())
+
+    def test_unique_calls(self):
+        for _ in range(3):
+            remember_once.delay('a')
+        remember_once.delay('b')
+        self.assertEqual(Task.objects.count(), 2)
+
+        running = [t for t in tasks.claim(10) if t.args == ['a']]
+        # Queued again while running, but not started before it is done
+        remember_once.delay('a')
+        self.assertEqual(tasks.claim(10), [])
+        self.assertTrue(tasks.run(running[0]))
+        again = tasks.claim(10)
+        self.assertEqual([t.args for t in again], [['a']])
+
+
+@override_settings(TASKS_RUN_INLINE=True)
+class InlineTaskTests(TestCase):
+    """Task calls run in the web process, once the response of the request making them is sent"""
+
+    def setUp(self):
+        calls.clear()
+
+    def handle(self, view):
+        with self.captureOnCommitCallbacks(execute=True):
+            return InlineTasksMiddleware(view)(RequestFactory().get('/'))
+
+    def test_run_when_the_response_is_closed(self):
+        def view(request):
+            remember.delay('a')
+            for value in ('b', 'b', 'c'):
+                remember_once.delay(value)
+            return HttpResponse()
+
+        response = self.handle(view)
+        self.assertEqual(calls, [])
+        response.close()
+        self.assertEqual(calls, ['a', 'b', 'c'])
+
+    def test_rolled_back(self):
+        def view(request):
+            try:
+                with transaction.atomic():
+                    remember.delay('a')
+                    raise ValueError
+            except ValueError:
+                pass
+            return HttpResponse()
+
+        self.handle(view).close()
+        self.assertEqual(calls, [])
+
+    def test_failures(self):
+        def view(request):
+            explode.delay('boom')
+            remember.delay('a')
+            return HttpResponse()
+
+        response = self.handle(view)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            response.close()
+        # Not held up by the failed one
+        self.assertEqual(calls, ['a'])
+
+    def test_outside_requests(self):
+        remember.delay('a')
+        self.assertEqual(calls, ['a'])
+
+
+class FeedPaginationTests(TestCase):
+    """Walking the donation feed page by page with ?cursor="""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        for i in range(8):
+            FoodDonation.objects.create(
+                donor=restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+                expiry_date=timezone.now() + timedelta(days=1), location='Mumbai', is_available=i != 3,
+            )
+        # Ties on posted_at across page boundaries, broken by id
+        posted_at = timezone.now() - timedelta(hours=1)
+        FoodDonation.objects.filter(id__in=FoodDonation.objects.order_by('id').values('id')[2:6]).update(
+            posted_at=posted_at,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.ngo)
+
+    def page(self, **params):
+        response = self.client.get(reverse('view_all_donations'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['all_food_donations']
+
+    def test_pages_follow_each_other(self):
+        expected = list(FoodDonation.objects.open().order_by('-posted_at', '-id').values_list('id', flat=True))
+        seen = []
+        page = self.page(page_size=3)
+        self.assertTrue(page.is_first)
+        while True:
+            self.assertLessEqual(len(page), 3)
+            seen += [donation.id for donation in page]
+            if not page.has_next:
+                break
+            page = self.page(page_size=3, cursor=page.next_cursor)
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursor(self):
+        page = self.page(page_size=3, cursor='not-a-cursor')
+        self.assertTrue(page.is_first)
+        self.assertEqual([d.id for d in page], [d.id for d in self.page(page_size=3)])
+
+
+class MatchingTests(TestCase):
+    """Suggestions of core.matching, from the token index kept by core.signals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        now = timezone.now()
+        cls.rice = FoodDonation.objects.create(
+            donor=cls.restaurant, food_type='Rice and dal', quantity='5 kg', description='veg meals',
+            expiry_date=now + timedelta(days=1), location='Mumbai',
+        )
+        cls.bread = FoodDonation.objects.create(
+            donor=cls.restaurant, food_type='Bread', quantity='20', description='buns',
+            expiry_date=now + timedelta(days=1), location='Mumbai',
+        )
+        cls.request = FoodRequest.objects.create(
+            requester=cls.ngo, food_type='rice', quantity_required='3 kg', description='veg meal',
+            location='Mumbai', required_timing=now + timedelta(hours=12),
+        )
+
+    def test_suggestions(self):
+        [match] = suggest_donations_for_ngo(self.ngo)
+        self.assertEqual((match['donation'], match['food_request']), (self.rice, self.request))
+        [match] = suggest_requests_for_donor(self.restaurant)
+        self.assertEqual((match['food_request'], match['donation']), (self.request, self.rice))
+        self.assertGreater(match['score'], 0)
+
+    def test_closed_objects_leave_the_index(self):
+        self.rice.is_available = False
+        self.rice.save()
+        self.assertEqual(suggest_donations_for_ngo(self.ngo), [])
+
+        self.rice.is_available = True
+        self.rice.save()
+        self.request.status = 'FULFILLED'
+        self.request.save()
+        self.assertEqual(suggest_requests_for_donor(self.restaurant), [])
+
+
+class NearbyTests(TestCase):
+    """The donation feed sorted by distance from the NGO's address"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        cls.profile = NGOProfile.objects.create(
+            user=cls.ngo, organization_name='NGO', address='Bandra, Mumbai', contact_number='1',
+        )
+        restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.donations = {
+            city: FoodDonation.objects.create(
+                donor=restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+                expiry_date=timezone.now() + timedelta(days=1), location=f'Main road, {city}',
+            )
+            for city in ('Pune', 'Delhi', 'Thane', 'Nashik', 'Mumbai')
+        }
+
+    def setUp(self):
+        self.client.force_login(self.ngo)
+
+    def feed(self, **params):
+        response = self.client.get(reverse('view_all_donations'), {'sort': 'distance', **params})
+        return response.context['sort'], [d.location.split(', ')[1] for d in response.context['all_food_donations']]
+
+    def test_nearest_first(self):
+        self.assertEqual(self.feed(), ('distance', ['Mumbai', 'Thane']))
+        # Searched by bounding box rather than grid cells
+        self.assertIsNone(cells_within(self.profile.latitude, self.profile.longitude, 200))
+        self.assertEqual(self.feed(radius=200), ('distance', ['Mumbai', 'Thane', 'Pune', 'Nashik']))
+
+    def test_distances(self):
+        donations = nearby(FoodDonation.objects.all(), self.profile.latitude, self.profile.longitude, 200)
+        self.assertEqual(donations[0].distance_km, 0)
+        self.assertAlmostEqual(donations[2].distance_km, 120, delta=5)
+
+    def test_address_not_geocoded(self):
+        NGOProfile.objects.filter(pk=self.profile.pk).update(latitude=None, longitude=None)
+        sort, cities = self.feed()
+        self.assertEqual(sort, 'newest')
+        self.assertEqual(cities, ['Mumbai', 'Nashik', 'Thane', 'Delhi', 'Pune'])
+
+
+@override_settings(FRAGMENT_CACHE_ENABLED=True)
+class FragmentCacheTests(TestCase):
+    """Dashboard sections served from the cache until a change bumps their scopes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.other = User.objects.create_user('other', password='pw', role=User.Role.RESTAURANT)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.restaurant)
+
+    def donate(self, donor, food_type):
+        return FoodDonation.objects.create(
+            donor=donor, food_type=food_type, quantity='5 kg', description='veg meal',
+            expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+        )
+
+    def dashboard(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('restaurant_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_cached_sections(self):
+        _, first = self.dashboard()
+        _, second = self.dashboard()
+        self.assertLess(second, first)
+
+    def test_own_changes_invalidate(self):
+        self.dashboard()
+        self.donate(self.restaurant, 'Mango pulp')
+        self.assertIn('Mango pulp', self.dashboard()[0])
+
+    def test_directory_changes_invalidate(self):
+        self.dashboard()
+        ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        NGOProfile.objects.create(user=ngo, organization_name='Roti Bank', address='Mumbai', contact_number='1')
+        self.assertIn('Roti Bank', self.dashboard()[0])
+
+    def test_scopes_of_other_users(self):
+        scope = fragments.user_scope(self.restaurant.pk)
+        version = fragments.get_versions([scope])[scope]
+        self.donate(self.other, 'Bread')
+        self.assertEqual(fragments.get_versions([scope])[scope], version)
+        self.donate(self.restaurant, 'Bread')
+        self.assertGreater(fragments.get_versions([scope])[scope], version)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag and Last-Modified of the feeds, and 304 Not Modified while they hold"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.donation = FoodDonation.objects.create(
+            donor=cls.restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+            expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.ngo)
+        self.url = reverse('view_all_donations')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(3):
+            # Session, user and the aggregate, not the feed
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        # Neither the count nor the newest timestamp changes
+        self.donation.description = 'veg meal, packed'
+        self.donation.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_needing_a_shared_cache(self):
+        url = reverse('view_restaurant_details', args=[self.restaurant.pk])
+        # Profile edits are only seen through the fragment versions
+        self.assertNotIn('ETag', self.client.get(url))
+        self.assertNotIn('ETag', self.client.get(self.url, {'sort': 'distance'}))
+        with self.settings(FRAGMENT_CACHE_ENABLED=True):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            RestaurantProfile.objects.create(
+                user=self.restaurant, restaurant_name='Kitchen', address='Mumbai', contact_number='1',
+            )
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+        other = User.objects.create_user('other', password='pw', role=User.Role.NGO)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class JsonApiTests(TestCase):
+    """Listings of the read-only JSON API: ?fields=, ?cursor= and who sees what"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        other_ngo = User.objects.create_user('other', password='pw', role=User.Role.NGO)
+        cls.donations = [
+            FoodDonation.objects.create(
+                donor=cls.restaurant, food_type=f'rice {i}', quantity='5 kg', description='veg meal',
+                expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+            )
+            for i in range(5)
+        ]
+        cls.collaboration = Collaboration.objects.create(
+            donor=cls.restaurant, ngo=cls.ngo, food_donation=cls.donations[0],
+        )
+        Collaboration.objects.create(donor=cls.restaurant, ngo=other_ngo, food_donation=cls.donations[1])
+
+    def setUp(self):
+        self.client.force_login(self.ngo)
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        if response.streaming:
+            return response.status_code, json.loads(b''.join(response.streaming_content))
+        return response.status_code, response.json()
+
+    def test_fields(self):
+        status, body = self.get('api_donations', fields='food_type,id, donor_username')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['results'][0], {
+            'food_type': 'rice 4', 'id': self.donations[4].id, 'donor_username': 'restaurant',
+        })
+        status, body = self.get('api_donations', fields='id,password')
+        self.assertEqual((status, body), (400, {'error': 'Unknown field(s): password'}))
+
+    def test_pages(self):
+        ids, params = [], {'fields': 'id', 'page_size': 2}
+        while True:
+            status, body = self.get('api_donations', **params)
+            self.assertEqual(status, 200)
+            self.assertLessEqual(len(body['results']), 2)
+            ids += [row['id'] for row in body['results']]
+            if body['next'] is None:
+                break
+            params['cursor'] = body['next']
+        self.assertEqual(ids, [donation.id for donation in reversed(self.donations)])
+        self.assertEqual(self.get('api_donations', cursor='not-a-cursor')[0], 400)
+
+    def test_own_collaborations(self):
+        status, body = self.get('api_collaborations', fields='id')
+        self.assertEqual((status, body['results']), (200, [{'id': self.collaboration.id}]))
+
+    def test_directory_profiles(self):
+        # Not geocoded, unlike the legacy profile's address
+        NGOProfile.objects.create(user=self.ngo, organization_name='Feed All', address='Nowhere', contact_number='111')
+        UserProfile.objects.create(
+            user=self.ngo, organization_name='Old name', address='18.52, 73.85', contact_number='222',
+        )
+        other = User.objects.get(username='other')
+        UserProfile.objects.create(user=other, organization_name='Other', address='15.49, 73.82', contact_number='333')
+        status, body = self.get('api_directory', 'ngos', fields='username,name,contact_number,latitude')
+        self.assertEqual(status, 200)
+        # All from the role profile where there is one, even null fields
+        self.assertCountEqual(body['results'], [
+            {'username': 'ngo', 'name': 'Feed All', 'contact_number': '111', 'latitude': None},
+            {'username': 'other', 'name': 'Other', 'contact_number': '333', 'latitude': 15.49},
+        ])
+
+    def test_anonymous(self):
+        self.client.logout()
+        self.assertEqual(self.get('api_donations'), (401, {'error': 'Authentication required'}))
+
+
+class ExportTests(TestCase):
+    """Content of the streamed history exports"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        cls.ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        other = User.objects.create_user('other', password='pw', role=User.Role.RESTAURANT)
+        cls.donations = [
+            FoodDonation.objects.create(
+                donor=donor, food_type=food_type, quantity='5 kg', description='veg, "fresh"',
+                expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+            )
+            for donor, food_type in [(cls.restaurant, 'rice'), (other, 'bread'), (cls.restaurant, 'dal')]
+        ]
+        FoodDonation.objects.filter(pk=cls.donations[0].pk).update(posted_at=timezone.now() - timedelta(days=30))
+        cls.collaboration = Collaboration.objects.create(
+            donor=cls.restaurant, ngo=cls.ngo, food_donation=cls.donations[2], people_served=12,
+        )
+
+    def export(self, user, dataset, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('export_history', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, content = self.export(self.restaurant, 'donations')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="donations-restaurant.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'donor', 'food_type'])
+        # Own donations only, oldest first, quoting intact
+        self.assertEqual([row[2] for row in rows[1:]], ['rice', 'dal'])
+        self.assertEqual(rows[1][4], 'veg, "fresh"')
+
+    def test_ndjson_since(self):
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+        _, content = self.export(self.restaurant, 'donations', format='ndjson', since=since)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(row['id'], row['food_type']) for row in rows], [(self.donations[2].id, 'dal')])
+
+    def test_collaborations_of_either_side(self):
+        for user in (self.restaurant, self.ngo):
+            _, content = self.export(user, 'collaborations', format='ndjson')
+            [row] = [json.loads(line) for line in content.splitlines()]
+            self.assertEqual(
+                (row['id'], row['donor'], row['ngo'], row['food_type'], row['people_served']),
+                (self.collaboration.id, 'restaurant', 'ngo', 'dal', 12),
+            )
+
+    def test_bad_parameters(self):
+        self.client.force_login(self.restaurant)
+        url = reverse('export_history', args=['donations'])
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_history', args=['logins'])).status_code, 404)
+
+
+class VercelAdapterTests(TestCase):
+    """api/index.py: request dicts of the Vercel runtime to WSGI calls, and responses back"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        spec = importlib.util.spec_from_file_location('vercel_index', Path(settings.BASE_DIR) / 'api' / 'index.py')
+        cls.adapter = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(cls.adapter)
+
+    def call(self, request, headers=(('Content-Type', 'text/plain; charset=utf-8'),), body=b''):
+        """handler() with an application answering `headers` and `body`, and the environ it got"""
+        environ = {}
+
+        def app(env, start_response):
+            environ.update(env, body=env['wsgi.input'].read())
+            start_response('200 OK', list(headers))
+            return [body]
+
+        with mock.patch.object(self.adapter, '_django_app', app):
+            return self.adapter.handler({'method': 'GET', 'headers': {'host': 'testserver'}, **request}), environ
+
+    def test_base64_request_body(self):
+        form = 'name=café&note=a+b'.encode()
+        _, environ = self.call({
+            'method': 'POST', 'path': '/accounts/login/',
+            'body': base64.b64encode(form).decode(), 'isBase64Encoded': True,
+        })
+        self.assertEqual((environ['REQUEST_METHOD'], environ['body']), ('POST', form))
+        self.assertEqual(environ['CONTENT_LENGTH'], str(len(form)))
+
+    def test_binary_response(self):
+        image = bytes(range(256))
+        response, _ = self.call({'path': '/media/photo.480w.webp'}, [('Content-Type', 'image/webp')], image)
+        self.assertTrue(response['isBase64Encoded'])
+        self.assertEqual(base64.b64decode(response['body']), image)
+
+        response, _ = self.call({'path': '/'}, body='café'.encode())
+        self.assertEqual((response['body'], response['isBase64Encoded']), ('café', False))
+
+    def test_percent_encoded_path(self):
+        _, environ = self.call({'path': '/media/caf%C3%A9%20menu.jpg?size=480&q=a%26b'})
+        # As a WSGI server passes it: decoded, UTF-8 bytes as latin-1 characters
+        self.assertEqual(environ['PATH_INFO'], '/media/café menu.jpg'.encode().decode('latin-1'))
+        self.assertEqual(environ['QUERY_STRING'], 'size=480&q=a%26b')
+
+    def test_repeated_headers(self):
+        response, _ = self.call({'path': '/'}, [
+            ('Content-Type', 'text/html'), ('Set-Cookie', 'sessionid=1'), ('Set-Cookie', 'csrftoken=2'),
+        ])
+        self.assertEqual(response['multiValueHeaders'], {'Set-Cookie': ['sessionid=1', 'csrftoken=2']})
+        self.assertEqual(response['headers']['Content-Type'], 'text/html')
+
+    def test_django(self):
+        response = self.adapter.handler({'method': 'GET', 'path': '/accounts/login/', 'headers': {'host': 'testserver'}})
+        self.assertEqual(response['statusCode'], 200)
+        self.assertIn('<form', response['body'])
+
+
+class DonorTierTests(TestCase):
+    """Tiers and leaderboard ranks computed for every donor at once, and the cached leaderboard"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # Days between donations, and days since the last one
+        patterns = {'gold': (1, 0), 'platinum': (5, 1), 'silver': (12, 3), 'lapsed': (3, 40), 'weekly': (6, 0)}
+        cls.donors = {}
+        for name, (every, since) in patterns.items():
+            donor = cls.donors[name] = User.objects.create_user(name, password='pw', role=User.Role.RESTAURANT)
+            for i in range(4):
+                donation = FoodDonation.objects.create(
+                    donor=donor, food_type='rice', quantity='5 kg', description='veg meal',
+                    expiry_date=now + timedelta(days=1), location='Mumbai',
+                )
+                FoodDonation.objects.filter(pk=donation.pk).update(
+                    posted_at=now - timedelta(days=since + i * every, hours=1),
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tiers_and_ranks(self):
+        computed_at, count = compute_donor_tiers()
+        self.assertEqual(count, 5)
+        tiers = {t.user.username: t for t in DonorTier.objects.select_related('user')}
+        self.assertEqual(
+            {name: t.tier for name, t in tiers.items()},
+            {'gold': 'GOLD', 'platinum': 'PLATINUM', 'weekly': 'PLATINUM', 'silver': 'SILVER', 'lapsed': None},
+        )
+        self.assertEqual(tiers['platinum'].avg_days_between, 5)
+        # Best tier, then most frequent
+        self.assertEqual(
+            [t.user.username for t in sorted(tiers.values(), key=lambda t: t.rank)],
+            ['gold', 'platinum', 'weekly', 'silver', 'lapsed'],
+        )
+
+        FoodDonation.objects.filter(donor=self.donors['lapsed']).delete()
+        compute_donor_tiers()
+        self.assertFalse(DonorTier.objects.filter(user=self.donors['lapsed']).exists())
+
+    def test_leaderboard_pages(self):
+        pages = [get_leaderboard_page(number, per_page=2) for number in (1, 2, 3)]
+        self.assertEqual(pages[0].paginator.num_pages, 3)
+        self.assertEqual(
+            [[row['user__username'] for row in page.object_list] for page in pages],
+            [['gold', 'platinum'], ['weekly', 'silver'], ['lapsed']],
+        )
+        # Out of range pages give the last one
+        self.assertEqual(get_leaderboard_page(9, per_page=2).number, 3)
+
+    @override_settings(TASKS_RUN_INLINE=False)
+    def test_expired_leaderboard(self):
+        first = leaderboard_version()
+        # Computed in the request the very first time only
+        self.assertEqual(first['count'], 5)
+        self.assertFalse(Task.objects.exists())
+
+        cache.delete(LEADERBOARD_VERSION_KEY)
+        for _ in range(3):
+            self.assertEqual(leaderboard_version(), first)
+        # The stored tiers are served while a single refresh is queued
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['core.tiers.refresh_donor_tiers'])
+
+
+class SeedScaleTests(TestCase):
+    """seed_scale --clear, deleting the previous run without the delete receivers"""
+
+    def seed(self, **options):
+        call_command(
+            'seed_scale', restaurants=3, ngos=2, eventplanners=1, donations=20, requests=5,
+            collaborations=4, logins=5, skip_derived=True, stdout=io.StringIO(), **options,
+        )
+
+    def test_clear(self):
+        self.seed()
+        events_before = ChangeEvent.objects.count()
+        with mock.patch.object(fragments, 'bump_users', wraps=fragments.bump_users) as bump_users:
+            self.seed(clear=True, seed=1)
+        # No removal event per donation, one round of invalidation instead
+        self.assertEqual(ChangeEvent.objects.count(), events_before)
+        bump_users.assert_called_once()
+        self.assertEqual(FoodDonation.objects.count(), 20)
+        self.assertTrue(post_delete.has_listeners(FoodDonation))
+
+    def test_receivers_restored_on_error(self):
+        with self.assertRaises(RuntimeError), disconnected(post_delete, DELETE_RECEIVERS):
+            self.assertFalse(post_delete.has_listeners(FoodDonation))
+            raise RuntimeError
+        for receiver, sender in DELETE_RECEIVERS:
+            self.assertIn(receiver, post_delete._live_receivers(sender))
+
+
+class SweepExpiredTests(TestCase):
+    """The sweep_expired command, in batches smaller than the rows to sweep"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        # 5 expired donations: two full batches of 2 and a partial one
+        cls.expired = [
+            FoodDonation.objects.create(
+                donor=restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+                expiry_date=now - timedelta(hours=i + 1), location='Mumbai',
+            )
+            for i in range(5)
+        ]
+        cls.live = FoodDonation.objects.create(
+            donor=restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+            expiry_date=now + timedelta(days=1), location='Mumbai',
+        )
+        # 4 stale requests: exactly two batches
+        cls.stale = [
+            FoodRequest.objects.create(
+                requester=ngo, food_type='rice', quantity_required='3 kg', location='Mumbai',
+                required_timing=now - timedelta(hours=i + 1),
+            )
+            for i in range(4)
+        ]
+        cls.pending = FoodRequest.objects.create(
+            requester=ngo, food_type='rice', quantity_required='3 kg', location='Mumbai',
+            required_timing=now + timedelta(days=1),
+        )
+        ChangeEvent.objects.all().delete()
+        cls.old_event = ChangeEvent.objects.create(kind=ChangeEvent.DONATION_POSTED, data={'id': 1})
+        ChangeEvent.objects.filter(pk=cls.old_event.pk).update(created_at=now - timedelta(days=3))
+        cls.recent_event = ChangeEvent.objects.create(kind=ChangeEvent.DONATION_POSTED, data={'id': 2})
+
+    def sweep(self):
+        out = io.StringIO()
+        call_command('sweep_expired', batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_sweep(self):
+        self.assertIn('Expired 5 donations and 4 requests, pruned 1 change log events.', self.sweep())
+
+        self.assertEqual(
+            set(FoodDonation.objects.filter(is_available=False).values_list('id', flat=True)),
+            {donation.id for donation in self.expired},
+        )
+        self.assertEqual(set(FoodRequest.objects.filter(status='EXPIRED')), set(self.stale))
+        self.assertEqual(FoodRequest.objects.get(pk=self.pending.pk).status, 'PENDING')
+        # Only the live rows are left to match
+        self.assertEqual(
+            set(MatchToken.objects.values_list('food_donation', 'food_request')),
+            {(self.live.id, None), (None, self.pending.id)},
+        )
+        withdrawn = ChangeEvent.objects.filter(kind=ChangeEvent.DONATION_WITHDRAWN)
+        self.assertEqual(
+            sorted(event.data['id'] for event in withdrawn), sorted(donation.id for donation in self.expired),
+        )
+        self.assertFalse(ChangeEvent.objects.filter(pk=self.old_event.pk).exists())
+        self.assertTrue(ChangeEvent.objects.filter(pk=self.recent_event.pk).exists())
+
+    def test_idempotent(self):
+        self.sweep()
+        events_count = ChangeEvent.objects.count()
+        self.assertIn('Expired 0 donations and 0 requests, pruned 0 change log events.', self.sweep())
+        self.assertEqual(ChangeEvent.objects.count(), events_count)
+
+
+class BackfillMonthlyImpactTests(TestCase):
+    """backfill_monthly_impact rebuilds what MonthlyImpact.record adds up as things happen"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+        planner = User.objects.create_user('planner', password='pw', role=User.Role.EVENTPLANNER)
+        ngo = User.objects.create_user('ngo', password='pw', role=User.Role.NGO)
+        for i, donor in enumerate([restaurant, restaurant, planner, restaurant, planner]):
+            donation = FoodDonation.objects.create(
+                donor=donor, food_type='rice', quantity='5 kg', description='veg meal',
+                expiry_date=now + timedelta(days=1), location='Mumbai',
+            )
+            # Spread over the last months
+            FoodDonation.objects.filter(pk=donation.pk).update(posted_at=now - timedelta(days=35 * i + 1))
+            if i % 2 == 0:
+                Collaboration.objects.create(
+                    donor=donor, ngo=ngo, food_donation=donation, status='COMPLETED',
+                    people_served=10 * (i + 1), completion_date=now - timedelta(days=35 * i),
+                )
+        Collaboration.objects.create(donor=planner, ngo=ngo, status='ACTIVE')
+
+    def recorded(self):
+        """The rollup rows MonthlyImpact.record gives for the current history"""
+        MonthlyImpact.objects.all().delete()
+        for donation in FoodDonation.objects.all():
+            MonthlyImpact.record(donation.donor, donation.posted_at, donations_made=1)
+        for collaboration in Collaboration.objects.filter(status='COMPLETED'):
+            MonthlyImpact.record(collaboration.donor, collaboration.completion_date, collaborations_completed=1)
+            MonthlyImpact.record(
+                collaboration.ngo, collaboration.completion_date,
+                collaborations_completed=1, people_served=collaboration.people_served,
+            )
+        return self.rollup()
+
+    def rollup(self):
+        return set(MonthlyImpact.objects.values_list('user', 'year', 'month', *MonthlyImpact.COUNTER_FIELDS))
+
+    def test_matches_recorded_totals(self):
+        expected = self.recorded()
+        self.assertGreater(len(expected), 5)
+        MonthlyImpact.objects.all().delete()
+        call_command('backfill_monthly_impact', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(self.rollup(), expected)
+
+    def test_idempotent(self):
+        expected = self.recorded()
+        # Over existing rows, twice
+        for _ in range(2):
+            call_command('backfill_monthly_impact', stdout=io.StringIO())
+            self.assertEqual(self.rollup(), expected)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160, 480, 1024])
+class ImageVariantTests(TestCase):
+    """Resized variants of an uploaded donation photo, and the srcset {% responsive_image %} makes of them"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.TemporaryDirectory()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root.name))
+        cls.addClassCleanup(cls.media_root.cleanup)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = User.objects.create_user('restaurant', password='pw', role=User.Role.RESTAURANT)
+
+    def donate(self, width, height):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), 'orange').save(buffer, 'PNG')
+        # Saving it makes the variants, inline outside a request
+        return FoodDonation.objects.create(
+            donor=self.restaurant, food_type='rice', quantity='5 kg', description='veg meal',
+            expiry_date=timezone.now() + timedelta(days=1), location='Mumbai',
+            image=SimpleUploadedFile('rice.png', buffer.getvalue(), content_type='image/png'),
+        )
+
+    def render(self, donation):
+        return Template('{% load images %}{% responsive_image donation.image alt="Rice" %}').render(
+            Context({'donation': donation}),
+        )
+
+    def test_variants(self):
+        from PIL import Image
+
+        donation = FoodDonation.objects.get(pk=self.donate(1200, 600).pk)
+        variants = donation.image_variants
+        self.assertEqual((variants['source'], variants['width'], variants['height']), (donation.image.name, 1200, 600))
+        for ext, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            self.assertEqual(sorted(variants[ext], key=int), ['160', '480', '1024'])
+            for width, name in variants[ext].items():
+                with donation.image.storage.open(name) as f, Image.open(f) as image:
+                    self.assertEqual((image.format, image.size), (pil_format, (int(width), int(width) // 2)))
+
+        html = self.render(donation)
+        url = donation.image.storage.url
+        self.assertIn(
+            f'<source type="image/webp" srcset="{url(variants["webp"]["160"])} 160w, '
+            f'{url(variants["webp"]["480"])} 480w, {url(variants["webp"]["1024"])} 1024w"',
+            html,
+        )
+        self.assertIn(f'<img src="{url(variants["jpeg"]["480"])}" srcset="{url(variants["jpeg"]["160"])} 160w', html)
+        self.assertIn('alt="Rice"', html)
+
+    def test_small_image(self):
+        variants = FoodDonation.objects.get(pk=self.donate(100, 80).pk).image_variants
+        # Re-encoded, never upscaled
+        self.assertEqual((list(variants['webp']), list(variants['jpeg'])), (['100'], ['100']))
+
+    def test_without_variants(self):
+        donation = self.donate(300, 200)
+        FoodDonation.objects.filter(pk=donation.pk).update(image_variants={})
+        donation.refresh_from_db()
+        self.assertHTMLEqual(
+            self.render(donation),
+            f'<img src="{donation.image.url}" alt="Rice" decoding="async" loading="lazy">',
+        )
@@ -0,0 +1,198 @@
+"""
+Donor tiers based on donation frequency:
+- GOLD: Donates every 48 hours (2 days)
+- PLATINUM: Donates once every week (7 days)
+- SILVER: Donates once every 15 days
+- No tier: Doesn't donate more than 15 days
+
+Tiers for every donor are computed together from one windowed query over
+FoodDonation.posted_at and stored in DonorTier, which backs the leaderboard.
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import DonorTier, FoodDonation
+from .tasks import task
+
+# Number of most recent donations used to estimate a donor's frequency
+RECENT_DONATIONS = 10
+
+# Leaderboard order of the tiers, untiered donors come last
+TIER_ORDER = {'GOLD': 0, 'PLATINUM': 1, 'SILVER': 2, None: 3}
+
+LEADERBOARD_VERSION_KEY = 'donor_leaderboard:version'
+# Held while a refresh is queued or running, see leaderboard_version()
+LEADERBOARD_REFRESH_KEY = 'donor_leaderboard:refresh'
+
+
+def tier_from_dates(donation_dates, now=None):
+    """
+    Tier for a donor given their most recent donation dates, newest first.
+    Returns (tier, label, avg_days_between).
+    """
+    if not donation_dates:
+        return None, "No donations yet", None
+    if now is None:
+        now = timezone.now()
+
+    days_since_last = (now - donation_dates[0]).days
+
+    # Need at least 2 donations to determine pattern
+    if len(donation_dates) < 2:
+        if days_since_last <= 2:
+            return "GOLD", "Gold Tier - Recent donor!", None
+        elif days_since_last <= 7:
+            return "PLATINUM", "Platinum Tier - Weekly donor!", None
+        elif days_since_last <= 15:
+            return "SILVER", "Silver Tier - Bi-weekly donor!", None
+        return None, "No active tier", None
+
+    # Average days between consecutive donations
+    total_days = sum(
+        (newer - older).days
+        for newer, older in zip(donation_dates, donation_dates[1:])
+    )
+    avg_days_between = total_days / (len(donation_dates) - 1)
+
+    # Determine tier based on frequency and recency
+    if avg_days_between <= 2 and days_since_last <= 2:
+        return "GOLD", "Gold Tier - Donates every 2 days!", avg_days_between
+    elif avg_days_between <= 7 and days_since_last <= 7:
+        return "PLATINUM", "Platinum Tier - Weekly donor!", avg_days_between
+    elif avg_days_between <= 15 and days_since_last <= 15:
+        return "SILVER", "Silver Tier - Bi-weekly donor!", avg_days_between
+    return None, "No active tier", avg_days_between
+
+
+def recent_donation_dates(queryset=None):
+    """
+    The RECENT_DONATIONS newest posted_at values per donor, as
+    (donor_id, posted_at) pairs ordered by donor and newest first.
+    """
+    if queryset is None:
+        queryset = FoodDonation.objects.all()
+    return (
+        queryset
+        .annotate(recency=Window(
+            RowNumber(),
+            partition_by=[F('donor_id')],
+            order_by=F('posted_at').desc(),
+        ))
+        .filter(recency__lte=RECENT_DONATIONS)
+        .order_by('donor_id', 'recency')
+        .values_list('donor_id', 'posted_at')
+    )
+
+
+def compute_donor_tiers(now=None):
+    """
+    Recompute and store the tier and leaderboard rank of every donor.
+    Returns the computation timestamp and the number of ranked donors.
+    """
+    if now is None:
+        now = timezone.now()
+
+    tiers = []
+    for donor_id, rows in groupby(recent_donation_dates(), key=lambda row: row[0]):
+        dates = [posted_at for _, posted_at in rows]
+        tier, label, avg_days_between = tier_from_dates(dates, now)
+        tiers.append(DonorTier(
+            user_id=donor_id,
+            tier=tier,
+            tier_label=label,
+            donation_count=len(dates),
+            avg_days_between=avg_days_between,
+            last_donation_at=dates[0],
+            computed_at=now,
+        ))
+
+    # Best tier first, then most frequent, then most recently active
+    tiers.sort(key=lambda t: (
+        TIER_ORDER[t.tier],
+        t.avg_days_between if t.avg_days_between is not None else float('inf'),
+        -t.last_donation_at.timestamp(),
+        t.user_id,
+    ))
+    for rank, donor_tier in enumerate(tiers, start=1):
+        donor_tier.rank = rank
+
+    with transaction.atomic():
+        DonorTier.objects.bulk_create(
+            tiers,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'tier', 'tier_label', 'rank', 'donation_count',
+                'avg_days_between', 'last_donation_at', 'computed_at',
+            ],
+        )
+        # Donors whose donations have all been removed drop off the board
+        DonorTier.objects.exclude(computed_at=now).delete()
+    return now, len(tiers)
+
+
+def _store_version(computed_at, count):
+    version = {'computed_at': computed_at.isoformat(), 'count': count}
+    cache.set(LEADERBOARD_VERSION_KEY, version, settings.DONOR_TIER_REFRESH_SECONDS)
+    return version
+
+
+@task(unique=True)
+def refresh_donor_tiers():
+    """Recompute the tiers and point the leaderboard at the new ranking"""
+    computed_at, count = compute_donor_tiers()
+    _store_version(computed_at, count)
+    return computed_at, count
+
+
+def leaderboard_version():
+    """
+    Timestamp and size of the tiers currently shown on the leaderboard. Once
+    the cached version expires after DONOR_TIER_REFRESH_SECONDS, the stored
+    tiers keep being served while a background task recomputes them; they
+    are only computed inside the request the very first time.
+    """
+    version = cache.get(LEADERBOARD_VERSION_KEY)
+    if version is None:
+        stored = DonorTier.objects.aggregate(computed_at=Max('computed_at'), count=Count('id'))
+        if stored['computed_at'] is None:
+            return _store_version(*compute_donor_tiers())
+        version = _store_version(stored['computed_at'], stored['count'])
+        # One refresh per expiry, however many requests see it expired
+        if cache.add(LEADERBOARD_REFRESH_KEY, 1, settings.DONOR_TIER_REFRESH_SECONDS):
+            refresh_donor_tiers.delay()
+        # Set by the refresh if it ran inline
+        version = cache.get(LEADERBOARD_VERSION_KEY, version)
+    return version
+
+
+def get_leaderboard_page(page_number, per_page=None):
+    """One page of the donor leaderboard, cached per tier computation"""
+    if per_page is None:
+        per_page = settings.DONOR_LEADERBOARD_PAGE_SIZE
+    version = leaderboard_version()
+    paginator = Paginator(
+        DonorTier.objects.order_by('rank').values(
+            'rank', 'tier', 'tier_label', 'donation_count', 'avg_days_between',
+            'last_donation_at', 'user_id', 'user__username', 'user__role',
+        ),
+        per_page,
+    )
+    # The donor count is known from the computation, skip the COUNT query
+    paginator.count = version['count']
+    page = paginator.get_page(page_number)
+    cache_key = f"donor_leaderboard:{version['computed_at']}:{per_page}:{page.number}"
+    rows = cache.get(cache_key)
+    if rows is None:
+        rows = list(page.object_list)
+        cache.set(cache_key, rows, settings.DONOR_TIER_REFRESH_SECONDS)
+    page.object_list = rows
+    return page
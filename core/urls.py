@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
-] 
\ No newline at end of file
+    path('leaderboard/', views.donor_leaderboard, name='donor_leaderboard'),
+    path('export/<str:dataset>/', views.export_history, name='export_history'),
+    path('events/', views.event_stream, name='event_stream'),
+] 
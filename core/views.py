@@ -1,6 +1,68 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from . import events, exports
+from .sections import authenticated_user
+from .tiers import get_leaderboard_page
 
 # Create your views here.
 
 def home(request):
     return render(request, 'index.html')
+
+@login_required
+def donor_leaderboard(request):
+    """Donors ranked by donation frequency tier"""
+    page = get_leaderboard_page(request.GET.get('page'))
+    return render(request, 'leaderboard/donor_leaderboard.html', {'page': page})
+
+@login_required
+def export_history(request, dataset):
+    """Stream the user's own donation, request or collaboration history as CSV or NDJSON"""
+    if dataset not in exports.DATASETS:
+        raise Http404
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest(f"Unknown format: {fmt}")
+    dates = {}
+    for name in ('since', 'until'):
+        value = request.GET.get(name)
+        try:
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return HttpResponseBadRequest(f"{name} must be a YYYY-MM-DD date")
+
+    response = StreamingHttpResponse(
+        exports.stream_export(dataset, fmt, user=request.user, **dates),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{dataset}-{request.user.username}.{fmt}"'
+    return response
+
+
+async def event_stream(request):
+    """Server-Sent Events of donation and collaboration changes for the viewer, see core.events"""
+    user = await sync_to_async(authenticated_user)(request)
+    if user is None:
+        return HttpResponse(status=401)
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET['last_event_id'])
+    except (KeyError, ValueError):
+        last_id = None
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(events.stream(user, last_id), content_type='text/event-stream')
+    else:
+        # A WSGI worker can't hold a stream open: answer at once and let
+        # the browser reconnect, which turns the stream into slow polling
+        body = await sync_to_async(events.poll_once)(user, last_id)
+        response = HttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -2,129 +2,60 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from core.models import FoodDonation, FoodRequest, Collaboration, Analysis, EventPlannerProfile, NGOProfile, RestaurantProfile
+from django.utils.functional import SimpleLazyObject
+from core.models import FoodDonation, FoodRequest, Collaboration, Analysis, MonthlyImpact, EventPlannerProfile
+from core.directory import get_directory, get_profile
+from core.sections import Section, async_login_required, load_sections, render_async
+from core.matching import suggest_requests_for_donor
+from core.pagination import keyset_paginate, paginate_feed
+from core.conditional import conditional_page, ngo_details_fingerprint, request_feed_fingerprint
 from core.forms import FoodDonationForm, CollaborationForm, EventPlannerProfileForm
-from django.db.models import Count, Q
-from datetime import datetime, timedelta
+from django.db.models import Q
 
 User = get_user_model()
 
-def calculate_user_tier(user):
-    """
-    Calculate user tier based on donation frequency:
-    - GOLD: Donates every 48 hours (2 days)
-    - PLATINUM: Donates once every week (7 days)
-    - SILVER: Donates once every 15 days
-    - No tier: Doesn't donate more than 15 days
-    """
-    now = datetime.now()
-    
-    # Get all donations by the user
-    donations = FoodDonation.objects.filter(donor=user).order_by('-posted_at')
-    
-    if not donations.exists():
-        return None, "No donations yet"
-    
-    # Get the most recent donation
-    last_donation = donations.first()
-    days_since_last = (now - last_donation.posted_at.replace(tzinfo=None)).days
-    
-    # Check if user has been consistently donating
-    if donations.count() < 2:
-        # Need at least 2 donations to determine pattern
-        if days_since_last <= 2:
-            return "GOLD", "Gold Tier - Recent donor!"
-        elif days_since_last <= 7:
-            return "PLATINUM", "Platinum Tier - Weekly donor!"
-        elif days_since_last <= 15:
-            return "SILVER", "Silver Tier - Bi-weekly donor!"
-        else:
-            return None, "No active tier"
-    
-    # Calculate average donation frequency
-    donation_dates = [d.posted_at for d in donations[:10]]  # Last 10 donations
-    if len(donation_dates) < 2:
-        return None, "Need more donation history"
-    
-    # Calculate average days between donations
-    total_days = 0
-    for i in range(len(donation_dates) - 1):
-        days_diff = (donation_dates[i] - donation_dates[i + 1]).days
-        total_days += days_diff
-    
-    avg_days_between = total_days / (len(donation_dates) - 1)
-    
-    # Determine tier based on frequency and recency
-    if avg_days_between <= 2 and days_since_last <= 2:
-        return "GOLD", "Gold Tier - Donates every 2 days!"
-    elif avg_days_between <= 7 and days_since_last <= 7:
-        return "PLATINUM", "Platinum Tier - Weekly donor!"
-    elif avg_days_between <= 15 and days_since_last <= 15:
-        return "SILVER", "Silver Tier - Bi-weekly donor!"
-    else:
-        return None, "No active tier"
+@async_login_required
+async def eventplanner_dashboard(request):
+    user = request.user
+    pending_requests = FoodRequest.objects.open()
 
-@login_required
-def eventplanner_dashboard(request):
-    # Get user's donations (event planners can also donate food) (always fetch fresh data)
-    user_donations = FoodDonation.objects.filter(donor=request.user, is_available=True).order_by('-posted_at')
-    total_donations = FoodDonation.objects.filter(donor=request.user).count()
-    
-    # Get pending requests from NGOs (always fetch fresh data)
-    ngo_requests = FoodRequest.objects.filter(status='PENDING').order_by('-requested_at')
-    
-    # Get collaborations
-    collaborations = Collaboration.objects.filter(donor=request.user).order_by('-collaboration_date')
-    pending_donation_requests = Collaboration.objects.filter(donor=request.user, status='PENDING', food_donation__isnull=False).order_by('-collaboration_date')
-    completed_collaborations = Collaboration.objects.filter(donor=request.user, status='COMPLETED').order_by('-completion_date')
-    
-    # Get analysis data
-    analysis, created = Analysis.objects.get_or_create(user=request.user)
-    
-    # Recalculate monthly donations made and get badge level
-    analysis.recalculate_monthly_donations_made()
-    badge_level = analysis.get_badge_level()
-    analysis.badge_level = badge_level
-    analysis.save()
-    
-    # Get all NGOs with their updated profile information (always fetch fresh data)
-    all_ngos = []
-    ngo_users = User.objects.filter(role=User.Role.NGO)
-    for ngo_user in ngo_users:
-        try:
-            ngo_profile = NGOProfile.objects.get(user=ngo_user)
-            all_ngos.append({
-                'user': ngo_user,
-                'profile': ngo_profile
-            })
-        except NGOProfile.DoesNotExist:
-            # Fallback to old UserProfile if NGOProfile doesn't exist
-            try:
-                from core.models import UserProfile
-                old_profile = UserProfile.objects.get(user=ngo_user)
-                all_ngos.append({
-                    'user': ngo_user,
-                    'profile': old_profile
-                })
-            except:
-                # If no profile exists, create a minimal one
-                all_ngos.append({
-                    'user': ngo_user,
-                    'profile': None
-                })
-    
-    context = {
-        'user_donations': user_donations,
-        'total_donations': total_donations,
-        'ngo_requests': ngo_requests,
-        'collaborations': collaborations,
-        'analysis': analysis,
-        'badge_level': badge_level,
-        'pending_donation_requests': pending_donation_requests,
-        'completed_collaborations': completed_collaborations,
-        'all_ngos': all_ngos,
-    }
-    return render(request, 'dashboards/eventplanner_dashboard.html', context)
+    def load_analysis():
+        analysis, created = Analysis.objects.get_or_create(user=user)
+        # Counters are maintained by core.signals; only reset stale monthly figures
+        analysis.roll_over_month()
+        return analysis
+
+    # Independent sections, loaded concurrently (core.sections)
+    context = await load_sections(user, {
+        # Get user's donations (event planners can also donate food) (always fetch fresh data)
+        'user_donations': Section(
+            lambda: list(FoodDonation.objects.filter(donor=user, is_available=True).order_by('-posted_at')),
+            'eventplanner_dashboard.donations',
+        ),
+        # Get pending requests from NGOs (always fetch fresh data)
+        'ngo_requests': Section(lambda: keyset_paginate(pending_requests.select_related('requester'), 'requested_at')),
+        'pending_requests_count': Section(pending_requests.count),
+        'suggested_requests': Section(lambda: suggest_requests_for_donor(user)),
+        # Get collaborations
+        'collaborations': Section(
+            lambda: list(Collaboration.objects.filter(donor=user).select_related('ngo', 'food_donation', 'food_request').order_by('-collaboration_date')),
+            'eventplanner_dashboard.collaborations',
+        ),
+        'pending_donation_requests': Section(
+            lambda: list(Collaboration.objects.filter(donor=user, status='PENDING', food_donation__isnull=False).select_related('ngo', 'food_donation').order_by('-collaboration_date')),
+        ),
+        'completed_collaborations': Section(
+            lambda: list(Collaboration.objects.filter(donor=user, status='COMPLETED').select_related('ngo', 'food_donation').order_by('-completion_date')),
+            'eventplanner_dashboard.completed_collaborations',
+        ),
+        # Get analysis data
+        'analysis': Section(load_analysis),
+        'impact_history': Section(lambda: MonthlyImpact.history(user), 'eventplanner_dashboard.impact_history'),
+    })
+    analysis = context['analysis']
+    context['total_donations'] = analysis.food_donated_count
+    context['badge_level'] = analysis.badge_level
+    return await render_async(request, 'dashboards/eventplanner_dashboard.html', context)
 
 @login_required
 def add_event_food_donation(request):
@@ -193,6 +124,7 @@ def fulfill_ngo_request_from_event(request, request_id):
     })
 
 @login_required
+@conditional_page(ngo_details_fingerprint)
 def view_ngo_details_from_event(request, ngo_id):
     ngo = get_object_or_404(User, id=ngo_id, role=User.Role.NGO)
     ngo_requests = FoodRequest.objects.filter(requester=ngo)
@@ -201,15 +133,7 @@ def view_ngo_details_from_event(request, ngo_id):
     )
     
     # Get NGO profile information
-    try:
-        ngo_profile = NGOProfile.objects.get(user=ngo)
-    except NGOProfile.DoesNotExist:
-        # Fallback to old UserProfile if NGOProfile doesn't exist
-        try:
-            from core.models import UserProfile
-            ngo_profile = UserProfile.objects.get(user=ngo)
-        except:
-            ngo_profile = None
+    ngo_profile = get_profile(ngo)
     
     return render(request, 'eventplanner/ngo_details_from_event.html', {
         'ngo': ngo,
@@ -233,9 +157,14 @@ def eventplanner_profile(request):
     return render(request, 'eventplanner/profile.html', {'form': form, 'profile': profile})
 
 @login_required
+@conditional_page(request_feed_fingerprint)
 def view_all_requests_from_event(request):
     """View all NGO requests in a separate page for event planners"""
-    ngo_requests = FoodRequest.objects.filter(status='PENDING').order_by('-requested_at')
+    ngo_requests = paginate_feed(
+        request,
+        FoodRequest.objects.open().select_related('requester'),
+        'requested_at',
+    )
     return render(request, 'eventplanner/view_all_requests.html', {'ngo_requests': ngo_requests})
 
 @login_required
@@ -266,29 +195,6 @@ def reject_event_donation_request(request, collaboration_id):
 def view_all_ngos_from_event(request):
     """View all NGOs in a separate page for event planners"""
     # Get all NGOs with their updated profile information
-    all_ngos = []
-    ngo_users = User.objects.filter(role=User.Role.NGO)
-    for ngo_user in ngo_users:
-        try:
-            ngo_profile = NGOProfile.objects.get(user=ngo_user)
-            all_ngos.append({
-                'user': ngo_user,
-                'profile': ngo_profile
-            })
-        except NGOProfile.DoesNotExist:
-            # Fallback to old UserProfile if NGOProfile doesn't exist
-            try:
-                from core.models import UserProfile
-                old_profile = UserProfile.objects.get(user=ngo_user)
-                all_ngos.append({
-                    'user': ngo_user,
-                    'profile': old_profile
-                })
-            except:
-                # If no profile exists, create a minimal one
-                all_ngos.append({
-                    'user': ngo_user,
-                    'profile': None
-                })
+    all_ngos = SimpleLazyObject(lambda: get_directory(User.Role.NGO))
     
     return render(request, 'eventplanner/view_all_ngos.html', {'all_ngos': all_ngos})
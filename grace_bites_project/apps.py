@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.admin.apps import SimpleAdminConfig
+
+
+class AdminConfig(SimpleAdminConfig):
+    """
+    The admin site, whose admin.py modules are imported at startup unless
+    DEFER_ADMIN is set. They are then imported by the first request to
+    /admin/ instead (see grace_bites_project.urls), which keeps them out
+    of the cold start of serverless instances.
+    """
+
+    def ready(self):
+        super().ready()
+        if not settings.DEFER_ADMIN:
+            self.module.autodiscover()
@@ -3,14 +3,33 @@ ASGI config for grace_bites_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live update stream at /events/ (core.events) holds its connection
+open, which needs an ASGI server, e.g.:
+
+    uvicorn grace_bites_project.asgi:application
+
+Under WSGI the same URL answers each request at once and browsers poll it
+every EVENTS_WSGI_RETRY_MS instead, one request per open tab, so dashboards
+only subscribe to it there if EVENTS_WSGI_POLLING is on.
+
+The dashboards are async views too, loading their sections concurrently
+(core.sections). Under WSGI each of them runs in an event loop of its own.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grace_bites_project.settings')
 
 application = get_asgi_application()
+
+if settings.PRECOMPILE_TEMPLATES:
+    # Before the first request, rather than on it (broken templates still
+    # raise when rendered)
+    from grace_bites_project.warmup import compile_templates
+    compile_templates()
@@ -1,13 +1,161 @@
-class CSRFDebugMiddleware:
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.middleware.csrf import CSRF_SESSION_KEY
+
+logger = logging.getLogger('grace_bites.timing')
+csrf_logger = logging.getLogger('grace_bites.csrf')
+
+# Timer of the request being handled, if it was sampled
+current_timer = ContextVar('current_timer', default=None)
+
+
+class CSRFDiagnosticMiddleware:
+    """
+    Log what a sample of POST requests carried for CSRF validation: a token
+    in the form or header, a token in the session (or cookie), a session,
+    and the response status, to look into 403s in production. Tokens and
+    session keys themselves are never logged.
+
+    Off unless CSRF_DIAGNOSTICS_SAMPLE_RATE is above 0. Requests are looked
+    at after the view, which has usually parsed the form and loaded the
+    session already.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.sample_rate = settings.CSRF_DIAGNOSTICS_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
 
     def __call__(self, request):
-        # Debug CSRF token
-        if request.method == 'POST':
-            csrf_token = request.POST.get('csrfmiddlewaretoken', 'NOT FOUND')
-            print(f"CSRF Debug - Token: {csrf_token[:20] if len(csrf_token) > 20 else csrf_token}")
-            print(f"CSRF Debug - Session: {request.session.session_key}")
-        
         response = self.get_response(request)
-        return response 
\ No newline at end of file
+        if request.method != 'POST' or random.random() >= self.sample_rate:
+            return response
+
+        if settings.CSRF_USE_SESSIONS:
+            stored_token = CSRF_SESSION_KEY in request.session
+        else:
+            stored_token = settings.CSRF_COOKIE_NAME in request.COOKIES
+        diagnostics = {
+            'path': request.path,
+            'status': response.status_code,
+            'form_token': 'csrfmiddlewaretoken' in request.POST,
+            'header_token': settings.CSRF_HEADER_NAME in request.META,
+            'stored_token': stored_token,
+            'session': request.session.session_key is not None,
+        }
+        csrf_logger.log(
+            logging.WARNING if response.status_code == 403 else logging.INFO,
+            ' '.join(f'{name}=%s' for name in diagnostics),
+            *diagnostics.values(),
+            extra=diagnostics,
+        )
+        return response
+
+
+class RequestTimer:
+    """
+    Query count and time spent in the database and templates by one
+    request, including queries run for it on other threads (core.sections)
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+
+
+class RequestTimingMiddleware:
+    """
+    Record the number of queries, database time, template render time and
+    total view time of a sample of requests. They are sent back in a
+    Server-Timing header and logged as one line per request, so N+1 query
+    regressions show up in production logs and browser dev tools.
+
+    Streamed responses run most of their queries while the body is sent,
+    so they are logged once it has been, without the header. Async streams
+    (the live update stream) are long lived and not recorded.
+
+    REQUEST_TIMING_SAMPLE_RATE is the fraction of requests instrumented;
+    requests issuing more than REQUEST_TIMING_QUERY_WARNING queries are
+    logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        self.query_warning = settings.REQUEST_TIMING_QUERY_WARNING
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+
+        if response.streaming:
+            if not response.is_async:
+                response.streaming_content = self.timed_stream(
+                    request, response, timer, start, response.streaming_content,
+                )
+            return response
+
+        view_time = time.perf_counter() - start
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timer.db_time * 1000:.1f};desc="{timer.queries} queries"',
+            f'tpl;dur={timer.template_time * 1000:.1f}',
+            f'view;dur={view_time * 1000:.1f}',
+        ])
+        self.log(request, response, timer, view_time)
+        return response
+
+    def timed_stream(self, request, response, timer, start, content):
+        """`content`, counting the queries run to produce it, logged once it is sent"""
+        try:
+            with connection.execute_wrapper(timer):
+                yield from content
+        finally:
+            self.log(request, response, timer, time.perf_counter() - start)
+
+    def log(self, request, response, timer, view_time):
+        level = logging.WARNING if timer.queries > self.query_warning else logging.INFO
+        logger.log(
+            level,
+            'method=%s path=%s status=%s queries=%d db_ms=%.1f tpl_ms=%.1f view_ms=%.1f',
+            request.method, request.path, response.status_code, timer.queries,
+            timer.db_time * 1000, timer.template_time * 1000, view_time * 1000,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timer.queries,
+                'db_ms': round(timer.db_time * 1000, 1),
+                'tpl_ms': round(timer.template_time * 1000, 1),
+                'view_ms': round(view_time * 1000, 1),
+            },
+        )
@@ -60,7 +60,8 @@ else:
 
 INSTALLED_APPS = [
     # Django core apps (required)
-    'django.contrib.admin',
+    # The admin, see grace_bites_project.apps.AdminConfig
+    'grace_bites_project.apps.AdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -76,12 +77,17 @@ INSTALLED_APPS = [
     'restaurant',
     'ngo',
     'eventplanner',
+    'jsonapi',
 ]
 
 # Build middleware list - handle optional packages gracefully
 MIDDLEWARE = [
     # Core Django middleware (required)
     'django.middleware.security.SecurityMiddleware',
+    # Runs the request's inline tasks once the response is sent (core.tasks)
+    'core.tasks.InlineTasksMiddleware',
+    # Outermost after security so session and auth queries are counted
+    'grace_bites_project.middleware.RequestTimingMiddleware',
 ]
 
 # Add WhiteNoise middleware if available (for Vercel static file serving)
@@ -103,17 +109,28 @@ MIDDLEWARE.extend([
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
     # Custom middleware
-    'grace_bites_project.middleware.CSRFDebugMiddleware',
+    # Logs a sample of POSTs' CSRF inputs, only with CSRF_DIAGNOSTICS_SAMPLE_RATE
+    'grace_bites_project.middleware.CSRFDiagnosticMiddleware',
 ])
 
 ROOT_URLCONF = 'grace_bites_project.urls'
 
+# Template loaders (the project's templates/ directory, then those of the
+# apps). In production the cached loader keeps every template compiled in
+# memory, see PRECOMPILE_TEMPLATES; with DEBUG they are read again on every
+# render, so edits show at once.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to RequestTimingMiddleware
+        'BACKEND': 'grace_bites_project.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -251,3 +268,148 @@ if vercel_url:
     CSRF_TRUSTED_ORIGINS.append(f'https://{vercel_url}')
 CSRF_USE_SESSIONS = True
 CSRF_COOKIE_HTTPONLY = False
+# Fraction of POST requests whose CSRF inputs are logged (grace_bites.csrf),
+# to look into token failures; 0 disables the middleware altogether
+CSRF_DIAGNOSTICS_SAMPLE_RATE = float(os.environ.get('CSRF_DIAGNOSTICS_SAMPLE_RATE', '0'))
+
+# Sessions, which also hold the CSRF token (CSRF_USE_SESSIONS)
+# "cached_db" (the default with REDIS_URL) reads them from the cache and only
+# queries django_session on a miss. It needs a cache shared by all
+# instances: with a per-process cache, a session logged out or flushed on
+# one instance stays valid on the others until their copy expires.
+# "signed_cookies" keeps them in the browser and never queries, but a
+# session can't be revoked before it expires (logging out only clears the
+# cookie of that browser). "db" (the default otherwise) queries every time.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get(
+    'SESSION_BACKEND', 'cached_db' if os.environ.get('REDIS_URL') else 'db',
+)
+
+# Feed pagination
+# Number of donations/requests shown per page on the feeds and dashboards
+FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', '20'))
+FEED_MAX_PAGE_SIZE = int(os.environ.get('FEED_MAX_PAGE_SIZE', '100'))
+
+# Donor tiers and leaderboard
+# Tiers for all donors are recomputed at most this often (seconds)
+DONOR_TIER_REFRESH_SECONDS = int(os.environ.get('DONOR_TIER_REFRESH_SECONDS', '900'))
+DONOR_LEADERBOARD_PAGE_SIZE = int(os.environ.get('DONOR_LEADERBOARD_PAGE_SIZE', '50'))
+
+# Nearby donations
+# Default and maximum search radius (km) when NGOs sort donations by distance
+NEARBY_RADIUS_KM = float(os.environ.get('NEARBY_RADIUS_KM', '25'))
+NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', '200'))
+
+# Cache
+# Cached dashboard fragments are invalidated through version counters in
+# this cache, so production needs a cache shared by all instances
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Dashboard fragment caching
+# Off without a shared cache: a version bump would only reach the instance
+# making it, and the others would serve stale sections
+FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', str(bool(os.environ.get('REDIS_URL')))) == 'True'
+# Fragments are invalidated by version bumps, the timeout only bounds memory
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', '3600'))
+# How long one request may hold the right to re-render a missed fragment
+FRAGMENT_CACHE_LOCK_SECONDS = int(os.environ.get('FRAGMENT_CACHE_LOCK_SECONDS', '10'))
+
+# Request timing
+# Fraction of requests instrumented with query counts and a Server-Timing
+# header, e.g. 1.0 while profiling locally or 0.01 in production. Off unless set.
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0'))
+# Sampled requests issuing more queries than this are logged as warnings
+REQUEST_TIMING_QUERY_WARNING = int(os.environ.get('REQUEST_TIMING_QUERY_WARNING', '50'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'grace_bites.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'grace_bites.csrf': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# JSON API
+# Largest ?page_size= accepted by /api/v1/ listings
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '1000'))
+# Rows fetched from the database cursor and serialized per streamed chunk
+API_CHUNK_SIZE = int(os.environ.get('API_CHUNK_SIZE', '200'))
+
+# Image variants
+# Widths (px) of the resized copies made of every uploaded image
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '160,480,1024').split(',')]
+# WebP/JPEG encoder quality of the resized copies
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', '80'))
+
+# Background tasks (core.tasks)
+# Run tasks in the web process instead of queuing them, after the response
+# of the request making the call has been sent. No worker is needed, but
+# the work (e.g. resizing uploaded images) takes up the web process, and on
+# Vercel, whose function returns once the response is closed, it still
+# delays the response. Set it to False where a run_worker process is
+# deployed to take it off the web processes entirely; without one, queued
+# tasks are never run.
+TASKS_RUN_INLINE = os.environ.get('TASKS_RUN_INLINE', 'True') == 'True'
+# Tasks claimed by a worker this long ago (seconds) are presumed lost and run again
+TASK_TIMEOUT = int(os.environ.get('TASK_TIMEOUT', '300'))
+# Attempts before a failing task is left as FAILED
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', '3'))
+# Delay (seconds) before the first retry, doubled for every further one
+TASK_RETRY_BACKOFF = int(os.environ.get('TASK_RETRY_BACKOFF', '30'))
+
+# Live dashboard updates (core.events)
+# Seconds between polls of the change log, once per process for all open streams
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', '1.0'))
+# Idle streams send a comment this often (seconds) to keep proxies from closing them
+EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', '15'))
+# Streams are closed after this long (seconds); browsers reconnect where they left off
+EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('EVENTS_MAX_STREAM_SECONDS', '300'))
+# Without ASGI (e.g. on Vercel) the stream can't be held open, so dashboards
+# only subscribe if this is on, and then every open tab polls /events/ every
+# EVENTS_WSGI_RETRY_MS: a request and a change log query per tab
+EVENTS_WSGI_POLLING = os.environ.get('EVENTS_WSGI_POLLING', 'False') == 'True'
+# Without ASGI, clients are told to reconnect (poll) this often (milliseconds)
+EVENTS_WSGI_RETRY_MS = int(os.environ.get('EVENTS_WSGI_RETRY_MS', '15000'))
+# Change log rows older than this are deleted by sweep_expired
+EVENTS_RETENTION_HOURS = int(os.environ.get('EVENTS_RETENTION_HOURS', '24'))
+# Longest an event's row may take to commit after one with a higher id was
+# inserted; streams wait this long at most before skipping a gap in the ids
+EVENTS_COMMIT_WINDOW_SECONDS = float(os.environ.get('EVENTS_COMMIT_WINDOW_SECONDS', '5'))
+
+# Dashboard sections are loaded concurrently by this many threads per
+# process (core.sections), each holding its own database connection, kept
+# for CONN_MAX_AGE
+DASHBOARD_QUERY_THREADS = int(os.environ.get('DASHBOARD_QUERY_THREADS', '4'))
+
+# Import the admin.py modules on the first request to /admin/ rather than
+# at startup (set by api/index.py for serverless cold starts). Leave unset
+# where the admin system checks should run, e.g. in CI.
+DEFER_ADMIN = os.environ.get('DEFER_ADMIN', 'False') == 'True'
+
+# Compile every template when a WSGI or ASGI server process starts (see
+# grace_bites_project.warmup), rather than each on its first render. The
+# Vercel entry point only compiles those of the busiest pages.
+PRECOMPILE_TEMPLATES = os.environ.get('PRECOMPILE_TEMPLATES', str(not DEBUG)) == 'True'
@@ -0,0 +1,38 @@
+"""
+Django template backend that reports render time to the request timer of
+RequestTimingMiddleware.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from .middleware import current_timer
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timer = current_timer.get()
+        if timer is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Sections render on other threads (core.sections)
+            with timer.lock:
+                timer.template_time += elapsed
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
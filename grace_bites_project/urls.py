@@ -15,18 +15,38 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, URLResolver
+from django.urls.resolvers import RoutePattern
+from django.utils.functional import cached_property
 from django.conf import settings
-from django.conf.urls.static import static
+
+
+class AdminURLconf:
+    """
+    URLconf of the admin site, built when first needed: the resolver only
+    looks into a namespaced include to resolve a URL under it or reverse
+    one of its names, so admin.py modules deferred by DEFER_ADMIN are
+    imported by the first admin request rather than at startup.
+    """
+
+    @cached_property
+    def urlpatterns(self):
+        admin.autodiscover()
+        return admin.site.get_urls()
+
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    URLResolver(RoutePattern('admin/'), AdminURLconf(), app_name='admin', namespace=admin.site.name),
     path('', include('core.urls')),
     path('accounts/', include('accounts.urls')),
     path('restaurant/', include('restaurant.urls')),
     path('ngo/', include('ngo.urls')),
     path('eventplanner/', include('eventplanner.urls')),
+    path('api/v1/', include('jsonapi.urls')),
 ]
 
 if settings.DEBUG:
+    # Development only, so not imported otherwise
+    from django.conf.urls.static import static
+
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
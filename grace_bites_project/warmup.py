@@ -0,0 +1,79 @@
+"""
+Work done once per process that would otherwise fall on its first request.
+
+Django builds the URL resolver, compiles templates and imports the
+database driver lazily, the first time a request needs them. warm_up()
+does it up front, for entry points such as api/index.py where the whole
+startup happens while a cold instance's first visitor is waiting anyway.
+
+compile_templates() parses every template into the cached template loader
+(production settings), for long running processes to start with all of
+them compiled. The compile_templates management command runs it at deploy
+time, where a template that doesn't compile fails the deployment.
+"""
+import os
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template import TemplateSyntaxError, engines
+from django.template.loader import get_template
+from django.urls import reverse
+
+# Templates of the pages most visits start on; others compile on first use
+HOT_TEMPLATES = [
+    'base.html',
+    'index.html',
+    'registration/login.html',
+    'dashboards/restaurant_dashboard.html',
+    'dashboards/ngo_dashboard.html',
+    'dashboards/eventplanner_dashboard.html',
+]
+
+
+def warm_up():
+    # Any reverse() builds the lookup tables of the whole URLconf, importing
+    # every app's views (but not the admin's, see grace_bites_project.urls)
+    reverse('home')
+    # Compiled templates are kept by the cached template loader
+    for name in HOT_TEMPLATES:
+        get_template(name)
+    # Imports the database driver, without connecting
+    connections[DEFAULT_DB_ALIAS]
+
+
+def template_names(engine):
+    """Name of every template the loaders of `engine` (a DjangoTemplates backend) can find"""
+    loaders = list(engine.engine.template_loaders)
+    names = set()
+    while loaders:
+        loader = loaders.pop()
+        # The cached loader wraps the ones that read files
+        loaders.extend(getattr(loader, 'loaders', []))
+        for directory in getattr(loader, 'get_dirs', list)():
+            for root, dirs, files in os.walk(directory):
+                dirs[:] = [name for name in dirs if not name.startswith('.')]
+                for name in files:
+                    if not name.startswith('.'):
+                        names.add(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates():
+    """
+    Compile every template of every Django template engine. Returns the
+    number compiled, the seconds it took and a list of (name, error) for
+    those that failed.
+    """
+    compiled, errors = 0, []
+    start = time.perf_counter()
+    for engine in engines.all():
+        if not hasattr(engine, 'engine'):
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as error:
+                errors.append((name, error))
+            else:
+                compiled += 1
+    return compiled, time.perf_counter() - start, errors
@@ -9,9 +9,17 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grace_bites_project.settings')
 
 application = get_wsgi_application()
+
+if settings.PRECOMPILE_TEMPLATES:
+    # Before the first request, rather than on it (broken templates still
+    # raise when rendered)
+    from grace_bites_project.warmup import compile_templates
+    compile_templates()
+
 app = application
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Resources served by the JSON API.
+
+A resource maps each public field name to the lookup (or expression) that
+values() reads it from, so responses are projected in the database and
+never build model instances. ?fields= picks a subset of the public names.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import Case, When
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from core.directory import LEGACY_PROFILE_FIELD, ROLE_PROFILE_FIELDS
+
+
+class Resource:
+    def __init__(self, fields, timestamp_field, media_fields=()):
+        self.fields = fields
+        self.timestamp_field = timestamp_field
+        # Fields holding a storage path, served as URLs
+        self.media_fields = frozenset(media_fields)
+
+    def select(self, fields_param):
+        """
+        Public field names for a ?fields= value, all of them when it is
+        empty. Raises ValueError naming any unknown field.
+        """
+        if not fields_param:
+            return list(self.fields)
+        names = list(dict.fromkeys(name.strip() for name in fields_param.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return names or list(self.fields)
+
+    def _key(self, name):
+        spec = self.fields[name]
+        return spec if isinstance(spec, str) else name
+
+    def project(self, queryset, names):
+        """values() of `queryset` reading `names` and the keyset columns"""
+        lookups = {'id', self.timestamp_field}
+        expressions = {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, str):
+                lookups.add(spec)
+            else:
+                expressions[name] = spec
+        return queryset.values(*lookups, **expressions)
+
+    def serialize(self, row, names):
+        """Public representation of a projected row"""
+        item = {}
+        for name in names:
+            value = row[self._key(name)]
+            if name in self.media_fields:
+                value = default_storage.url(value) if value else None
+            item[name] = value
+        return item
+
+
+DONATIONS = Resource({
+    'id': 'id',
+    'food_type': 'food_type',
+    'quantity': 'quantity',
+    'description': 'description',
+    'location': 'location',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'expiry_date': 'expiry_date',
+    'posted_at': 'posted_at',
+    'image': 'image',
+    'donor': 'donor_id',
+    'donor_username': 'donor__username',
+}, 'posted_at', media_fields=['image'])
+
+REQUESTS = Resource({
+    'id': 'id',
+    'food_type': 'food_type',
+    'quantity_required': 'quantity_required',
+    'description': 'description',
+    'location': 'location',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'required_timing': 'required_timing',
+    'requested_at': 'requested_at',
+    'status': 'status',
+    'requester': 'requester_id',
+    'requester_username': 'requester__username',
+}, 'requested_at')
+
+COLLABORATIONS = Resource({
+    'id': 'id',
+    'status': 'status',
+    'food_type': Coalesce('food_donation__food_type', 'food_request__food_type'),
+    'food_donation': 'food_donation_id',
+    'food_request': 'food_request_id',
+    'donor': 'donor_id',
+    'donor_username': 'donor__username',
+    'ngo': 'ngo_id',
+    'ngo_username': 'ngo__username',
+    'notes': 'notes',
+    'people_served': 'people_served',
+    'collaboration_date': 'collaboration_date',
+    'completion_date': 'completion_date',
+}, 'collaboration_date')
+
+
+def _directory(role, name_field, extra_fields):
+    """
+    Directory resource of a role, falling back to the legacy UserProfile
+    for users without a role profile (as core.directory does): each row
+    reads every field from the same profile.
+    """
+    profile = ROLE_PROFILE_FIELDS[role]
+
+    def profile_field(field, legacy_field=None):
+        return Case(
+            When(**{f'{profile}__isnull': False}, then=f'{profile}__{field}'),
+            default=f'{LEGACY_PROFILE_FIELD}__{legacy_field or field}',
+        )
+
+    fields = {
+        'id': 'id',
+        'username': 'username',
+        'name': profile_field(name_field, 'organization_name'),
+        'address': profile_field('address'),
+        'contact_number': profile_field('contact_number'),
+        'latitude': profile_field('latitude'),
+        'longitude': profile_field('longitude'),
+        'description': profile_field('description'),
+        'profile_picture': profile_field('profile_picture'),
+    }
+    fields.update({field: f'{profile}__{field}' for field in extra_fields})
+    return Resource(fields, 'date_joined', media_fields=['profile_picture'])
+
+
+# Keyed by the role segment of /api/v1/directory/<role>/
+DIRECTORY = {
+    'restaurants': (User.Role.RESTAURANT, _directory(
+        User.Role.RESTAURANT, 'restaurant_name', ['cuisine_type', 'operating_hours'],
+    )),
+    'ngos': (User.Role.NGO, _directory(
+        User.Role.NGO, 'organization_name', ['mission_statement', 'target_beneficiaries'],
+    )),
+    'eventplanners': (User.Role.EVENTPLANNER, _directory(
+        User.Role.EVENTPLANNER, 'company_name', ['specialization', 'years_of_experience'],
+    )),
+}
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('donations/', views.donations, name='api_donations'),
+    path('requests/', views.food_requests, name='api_requests'),
+    path('collaborations/', views.collaborations, name='api_collaborations'),
+    path('directory/<str:role>/', views.directory, name='api_directory'),
+]
@@ -0,0 +1,114 @@
+"""
+Read-only JSON API, version 1.
+
+Every listing is a values() projection, keyset paginated newest first and
+serialized in chunks while rows stream out of the database cursor, so even
+the largest page never holds model instances or the whole body in memory.
+
+    GET /api/v1/donations/?fields=id,food_type,expiry_date&page_size=500
+
+returns {"results": [...], "next": "<cursor>"}; pass "next" back as
+?cursor= for the following page, it is null on the last one.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from accounts.models import User
+from core.models import Collaboration, FoodDonation, FoodRequest
+from core.pagination import encode_cursor, get_page_size, keyset_filter
+
+from . import resources
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+def api_view(view):
+    """GET-only view answering anonymous callers with a JSON 401"""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def stream_page(rows, resource, names, page_size):
+    """
+    Yield the JSON body of a page from `rows`, which hold up to one row
+    more than `page_size` to tell whether a next page exists.
+    """
+    chunk_size = settings.API_CHUNK_SIZE
+    chunk = []
+    separator = ''
+    last = None
+    next_cursor = None
+    yield '{"results":['
+    for count, row in enumerate(rows):
+        if count == page_size:
+            next_cursor = encode_cursor(last[resource.timestamp_field], last['id'])
+            break
+        chunk.append(encoder.encode(resource.serialize(row, names)))
+        last = row
+        if len(chunk) == chunk_size:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield f'],"next":{encoder.encode(next_cursor)}}}'
+
+
+def listing(request, resource, queryset):
+    """Streamed page of `queryset` as selected by ?fields=, ?cursor= and ?page_size="""
+    try:
+        names = resource.select(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    cursor = request.GET.get('cursor')
+    queryset, position = keyset_filter(queryset, resource.timestamp_field, cursor)
+    if cursor and position is None:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    page_size = get_page_size(request, maximum=settings.API_MAX_PAGE_SIZE)
+
+    rows = resource.project(queryset, names)[:page_size + 1].iterator(chunk_size=settings.API_CHUNK_SIZE)
+    return StreamingHttpResponse(
+        stream_page(rows, resource, names, page_size),
+        content_type='application/json',
+    )
+
+
+@api_view
+def donations(request):
+    """Open donations"""
+    return listing(request, resources.DONATIONS, FoodDonation.objects.open())
+
+
+@api_view
+def food_requests(request):
+    """Open food requests"""
+    return listing(request, resources.REQUESTS, FoodRequest.objects.open())
+
+
+@api_view
+def collaborations(request):
+    """Collaborations of the caller, as the NGO or as the donor"""
+    user = request.user
+    if user.role == User.Role.NGO:
+        queryset = Collaboration.objects.filter(ngo=user)
+    else:
+        queryset = Collaboration.objects.filter(donor=user)
+    return listing(request, resources.COLLABORATIONS, queryset)
+
+
+@api_view
+def directory(request, role):
+    """Restaurants, NGOs or event planners with their profile"""
+    if role not in resources.DIRECTORY:
+        return JsonResponse({'error': f'Unknown directory: {role}'}, status=404)
+    user_role, resource = resources.DIRECTORY[role]
+    return listing(request, resource, User.objects.filter(role=user_role))
@@ -2,71 +2,100 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from core.models import FoodDonation, FoodRequest, Collaboration, Analysis, NGOProfile, RestaurantProfile, EventPlannerProfile
+from django.utils.functional import SimpleLazyObject
+from core.models import FoodDonation, FoodRequest, Collaboration, Analysis, MonthlyImpact, NGOProfile
+from core import fragments
+from core.directory import get_directory, get_profile
+from core.sections import Section, async_login_required, load_sections, render_async
+from core.pagination import keyset_paginate, paginate_feed
+from core.conditional import conditional_page, donation_feed_fingerprint, restaurant_details_fingerprint
+from core.geo import nearby
+from core.matching import suggest_donations_for_ngo
+from django.conf import settings
 from core.forms import FoodRequestForm, CollaborationForm, NGOProfileForm, CollaborationCompletionForm
-from django.db.models import Count, Q
+from django.db.models import Q
 
 User = get_user_model()
 
-@login_required
-def ngo_dashboard(request):
-    # Get all food posted by restaurants (always fetch fresh data)
-    all_food_donations = FoodDonation.objects.filter(is_available=True).order_by('-posted_at')
-    
-    # Get user's requests
-    user_requests = FoodRequest.objects.filter(requester=request.user).order_by('-requested_at')
-    
-    # Get collaborations
-    collaborations = Collaboration.objects.filter(ngo=request.user).order_by('-collaboration_date')
-    active_collaborations = Collaboration.objects.filter(ngo=request.user, status='ACTIVE').order_by('-collaboration_date')
-    
-    # Get analysis data
-    analysis, created = Analysis.objects.get_or_create(user=request.user)
-    
-    # Recalculate monthly people served and get badge level
-    analysis.recalculate_monthly_people_served()
-    badge_level = analysis.get_badge_level()
-    analysis.badge_level = badge_level
-    analysis.save()
-    
-    # Get all restaurants with their updated profile information (always fetch fresh data)
-    all_restaurants = []
-    restaurant_users = User.objects.filter(role=User.Role.RESTAURANT)
-    
-    for restaurant_user in restaurant_users:
-        
-        try:
-            restaurant_profile = RestaurantProfile.objects.get(user=restaurant_user)
-            all_restaurants.append({
-                'user': restaurant_user,
-                'profile': restaurant_profile
-            })
-        except RestaurantProfile.DoesNotExist:
-            # Fallback to old UserProfile if RestaurantProfile doesn't exist
-            try:
-                from core.models import UserProfile
-                old_profile = UserProfile.objects.get(user=restaurant_user)
-                all_restaurants.append({
-                    'user': restaurant_user,
-                    'profile': old_profile
-                })
-            except:
-                # If no profile exists, create a minimal one
-                all_restaurants.append({
-                    'user': restaurant_user,
-                    'profile': None
-                })
-    
-    context = {
-        'all_food_donations': all_food_donations,
-        'user_requests': user_requests,
-        'collaborations': collaborations,
-        'active_collaborations': active_collaborations,
-        'analysis': analysis,
-        'badge_level': badge_level,
-        'all_restaurants': all_restaurants,
-    }
-    return render(request, 'dashboards/ngo_dashboard.html', context)
+def get_nearby_donations(request):
+    """
+    Available donations within ?radius= km of the NGO's address, nearest
+    first. Returns None when the NGO's address could not be geocoded.
+
+    Distances are between cities: addresses and locations are geocoded to
+    the city they name (core.geo), so donations in the same city are
+    equally near and listed newest first.
+    """
+    profile = get_profile(request.user)
+    if profile is None or profile.latitude is None:
+        return None
+    try:
+        radius = float(request.GET.get('radius', settings.NEARBY_RADIUS_KM))
+    except ValueError:
+        radius = settings.NEARBY_RADIUS_KM
+    radius = max(1.0, min(radius, settings.NEARBY_MAX_RADIUS_KM))
+    return nearby(
+        FoodDonation.objects.open().select_related('donor'),
+        profile.latitude,
+        profile.longitude,
+        radius,
+        limit=settings.FEED_MAX_PAGE_SIZE,
+    )
+
+def get_donation_feed(request, first_page_only=False):
+    """
+    Donation feed in the order chosen by ?sort=, returns (donations, sort).
+    Falls back to newest first when sorting by distance is not possible.
+    """
+    if request.GET.get('sort') == 'distance':
+        donations = get_nearby_donations(request)
+        if donations is not None:
+            return donations, 'distance'
+        messages.info(request, 'Add a recognisable city to your profile address to sort donations by distance.')
+    donations = FoodDonation.objects.open().select_related('donor')
+    if first_page_only:
+        return keyset_paginate(donations, 'posted_at'), 'newest'
+    return paginate_feed(request, donations, 'posted_at'), 'newest'
+
+@async_login_required
+async def ngo_dashboard(request):
+    user = request.user
+    user_requests = FoodRequest.objects.filter(requester=user)
+
+    def load_analysis():
+        analysis, created = Analysis.objects.get_or_create(user=user)
+        # Counters are maintained by core.signals; only reset stale monthly figures
+        analysis.roll_over_month()
+        return analysis
+
+    # Independent sections, loaded concurrently (core.sections)
+    context = await load_sections(user, {
+        # Get all food posted by restaurants (always fetch fresh data)
+        'feed': Section(lambda: get_donation_feed(request, first_page_only=True)),
+        'suggested_donations': Section(lambda: suggest_donations_for_ngo(user)),
+        # Get user's requests
+        'user_requests': Section(lambda: list(user_requests.order_by('-requested_at')), 'ngo_dashboard.requests'),
+        'user_requests_count': Section(user_requests.count),
+        # Get collaborations
+        'collaborations': Section(
+            lambda: list(Collaboration.objects.filter(ngo=user).select_related('donor', 'food_donation', 'food_request').order_by('-collaboration_date')),
+            'ngo_dashboard.collaborations',
+        ),
+        'active_collaborations': Section(
+            lambda: list(Collaboration.objects.filter(ngo=user, status='ACTIVE').select_related('donor', 'food_donation').order_by('-collaboration_date')),
+            'ngo_dashboard.active_collaborations',
+        ),
+        # Get analysis data
+        'analysis': Section(load_analysis),
+        'impact_history': Section(lambda: MonthlyImpact.history(user), 'ngo_dashboard.impact_history'),
+        # Get all restaurants with their updated profile information (always fetch fresh data)
+        'all_restaurants': Section(
+            lambda: get_directory(User.Role.RESTAURANT), 'ngo_dashboard.all_restaurants', scopes=(fragments.DIRECTORY,),
+        ),
+    })
+    context['all_food_donations'], context['sort'] = context.pop('feed')
+    context['badge_level'] = context['analysis'].badge_level
+    return await render_async(request, 'dashboards/ngo_dashboard.html', context)
 
 @login_required
 def add_food_request(request):
@@ -131,23 +160,16 @@ def request_food_from_donation(request, donation_id):
     })
 
 @login_required
+@conditional_page(restaurant_details_fingerprint)
 def view_restaurant_details(request, restaurant_id):
     restaurant = get_object_or_404(User, id=restaurant_id, role=User.Role.RESTAURANT)
-    restaurant_donations = FoodDonation.objects.filter(donor=restaurant, is_available=True)
+    restaurant_donations = FoodDonation.objects.open().filter(donor=restaurant)
     collaborations = Collaboration.objects.filter(
         Q(donor=restaurant, ngo=request.user) | Q(donor=request.user, ngo=restaurant)
     )
     
     # Get restaurant profile information
-    try:
-        restaurant_profile = RestaurantProfile.objects.get(user=restaurant)
-    except RestaurantProfile.DoesNotExist:
-        # Fallback to old UserProfile if RestaurantProfile doesn't exist
-        try:
-            from core.models import UserProfile
-            restaurant_profile = UserProfile.objects.get(user=restaurant)
-        except:
-            restaurant_profile = None
+    restaurant_profile = get_profile(restaurant)
     
     return render(request, 'ngo/restaurant_details.html', {
         'restaurant': restaurant,
@@ -171,39 +193,20 @@ def ngo_profile(request):
     return render(request, 'ngo/profile.html', {'form': form, 'profile': profile})
 
 @login_required
+@conditional_page(donation_feed_fingerprint)
 def view_all_donations(request):
     """View all food donations in a separate page"""
-    all_food_donations = FoodDonation.objects.filter(is_available=True).order_by('-posted_at')
-    return render(request, 'ngo/view_all_donations.html', {'all_food_donations': all_food_donations})
+    all_food_donations, sort = get_donation_feed(request)
+    return render(request, 'ngo/view_all_donations.html', {
+        'all_food_donations': all_food_donations,
+        'sort': sort,
+    })
 
 @login_required
 def view_all_restaurants(request):
     """View all restaurants in a separate page"""
     # Get all restaurants with their updated profile information
-    all_restaurants = []
-    restaurant_users = User.objects.filter(role=User.Role.RESTAURANT)
-    for restaurant_user in restaurant_users:
-        try:
-            restaurant_profile = RestaurantProfile.objects.get(user=restaurant_user)
-            all_restaurants.append({
-                'user': restaurant_user,
-                'profile': restaurant_profile
-            })
-        except RestaurantProfile.DoesNotExist:
-            # Fallback to old UserProfile if RestaurantProfile doesn't exist
-            try:
-                from core.models import UserProfile
-                old_profile = UserProfile.objects.get(user=restaurant_user)
-                all_restaurants.append({
-                    'user': restaurant_user,
-                    'profile': old_profile
-                })
-            except:
-                # If no profile exists, create a minimal one
-                all_restaurants.append({
-                    'user': restaurant_user,
-                    'profile': None
-                })
+    all_restaurants = SimpleLazyObject(lambda: get_directory(User.Role.RESTAURANT))
     
     return render(request, 'ngo/view_all_restaurants.html', {'all_restaurants': all_restaurants})
 
@@ -211,30 +214,7 @@ def view_all_restaurants(request):
 def view_all_eventplanners(request):
     """View all event planners in a separate page"""
     # Get all event planners with their updated profile information
-    all_eventplanners = []
-    eventplanner_users = User.objects.filter(role=User.Role.EVENTPLANNER)
-    for eventplanner_user in eventplanner_users:
-        try:
-            eventplanner_profile = EventPlannerProfile.objects.get(user=eventplanner_user)
-            all_eventplanners.append({
-                'user': eventplanner_user,
-                'profile': eventplanner_profile
-            })
-        except EventPlannerProfile.DoesNotExist:
-            # Fallback to old UserProfile if EventPlannerProfile doesn't exist
-            try:
-                from core.models import UserProfile
-                old_profile = UserProfile.objects.get(user=eventplanner_user)
-                all_eventplanners.append({
-                    'user': eventplanner_user,
-                    'profile': old_profile
-                })
-            except:
-                # If no profile exists, create a minimal one
-                all_eventplanners.append({
-                    'user': eventplanner_user,
-                    'profile': None
-                })
+    all_eventplanners = get_directory(User.Role.EVENTPLANNER)
     
     return render(request, 'ngo/view_all_eventplanners.html', {'all_eventplanners': all_eventplanners})
 
@@ -250,22 +230,9 @@ def complete_donation(request, collaboration_id):
             collaboration.status = 'COMPLETED'
             from django.utils import timezone
             collaboration.completion_date = timezone.now()
+            # Analysis counts for both sides are updated by core.signals
             collaboration.save()
             
-            # Update analysis counts
-            try:
-                donor_analysis, created = Analysis.objects.get_or_create(user=collaboration.donor)
-                donor_analysis.ngos_helped_count += 1
-                donor_analysis.collaborations_count += 1
-                donor_analysis.save()
-                
-                ngo_analysis, created = Analysis.objects.get_or_create(user=collaboration.ngo)
-                ngo_analysis.requests_fulfilled_count += 1
-                ngo_analysis.total_people_served += collaboration.people_served
-                ngo_analysis.save()
-            except:
-                pass  # Don't fail if analysis update fails
-            
             messages.success(request, f'Donation completed! You served {collaboration.people_served} people.')
             return redirect('ngo_dashboard')
     else:
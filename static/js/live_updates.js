@@ -0,0 +1,47 @@
+// Live updates for the dashboards, from the Server-Sent Events stream at
+// the script tag's data-events-url (core.events, included by the
+// {% live_updates %} tag). New donations and collaboration changes show a
+// banner offering to reload; withdrawn donations are greyed out in place.
+const eventsUrl = document.currentScript.dataset.eventsUrl;
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource(eventsUrl);
+    let banner = null;
+
+    function showBanner(message) {
+        if (!banner) {
+            banner = document.createElement('div');
+            banner.className = 'live-banner';
+            const text = document.createElement('span');
+            const reload = document.createElement('a');
+            reload.href = window.location.href;
+            reload.className = 'btn btn-small';
+            reload.textContent = 'Refresh';
+            banner.append(text, reload);
+            const main = document.querySelector('main');
+            main.insertBefore(banner, main.firstChild);
+        }
+        banner.firstChild.textContent = message;
+    }
+
+    source.addEventListener('donation.posted', (event) => {
+        const donation = JSON.parse(event.data);
+        showBanner(`New donation: ${donation.food_type} (${donation.quantity}) at ${donation.location}.`);
+    });
+
+    source.addEventListener('donation.withdrawn', (event) => {
+        const donation = JSON.parse(event.data);
+        document.querySelectorAll(`[data-donation-id="${donation.id}"]`).forEach((card) => {
+            card.classList.add('withdrawn');
+            card.querySelectorAll('.food-actions').forEach((actions) => actions.remove());
+        });
+    });
+
+    source.addEventListener('collaboration.status', (event) => {
+        const collaboration = JSON.parse(event.data);
+        showBanner(`A collaboration is now ${collaboration.status.toLowerCase()}.`);
+    });
+});